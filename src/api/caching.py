@@ -0,0 +1,91 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from store.cache import (
+    CATALOG_NAMESPACE,
+    get_cache_modified,
+    get_cache_version,
+    versioned_key,
+)
+
+CACHEABLE_METHODS = ("GET", "HEAD")
+
+
+class CatalogCacheMixin:
+    """
+    Кэш ответов публичных эндпоинтов каталога.
+
+    Ключ строится из адреса и нормализованных параметров запроса без учёта
+    пользователя: гости и авторизованные клиенты получают один и тот же ответ.
+    ETag и Last-Modified берутся из версии каталога, которую увеличивают
+    сигналы Book/Genre/Review, поэтому If-None-Match и If-Modified-Since
+    проверяются до аутентификации и без запросов к БД, а ответ 304 отдаётся
+    сразу из dispatch.
+    """
+
+    cache_timeout = 60 * 5
+    # Версии, от которых зависит ответ: изменение любой меняет ключ и ETag
+    cache_namespaces = (CATALOG_NAMESPACE,)
+
+    def get_cache_digest(self, request):
+        """Хэш адреса и параметров: порядок и пустые значения не важны."""
+        params = sorted(
+            (name, value)
+            for name, values in request.GET.lists()
+            for value in values
+            if value != ""
+        )
+        url = f"{request.build_absolute_uri(request.path)}?{urlencode(params)}"
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in CACHEABLE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+
+        # Версия читается один раз: ключ, ETag и данные относятся к ней
+        version = "-".join(
+            str(get_cache_version(namespace)) for namespace in self.cache_namespaces
+        )
+        digest = self.get_cache_digest(request)
+        self.cache_key = versioned_key(
+            CATALOG_NAMESPACE, "api", digest, version=version
+        )
+        self.etag = quote_etag(f"{version}-{digest[:16]}")
+        self.last_modified = int(
+            max(get_cache_modified(namespace) for namespace in self.cache_namespaces)
+        )
+
+        response = get_conditional_response(
+            request, etag=self.etag, last_modified=self.last_modified
+        )
+        if response is not None:
+            self.set_validators(response)
+            return response
+        return super().dispatch(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        data = cache.get(self.cache_key)
+        if data is not None:
+            return Response(data)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(self.cache_key, response.data, self.cache_timeout)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method in CACHEABLE_METHODS and response.status_code == 200:
+            self.set_validators(response)
+        return response
+
+    def set_validators(self, response):
+        response["ETag"] = self.etag
+        response["Last-Modified"] = http_date(self.last_modified)
+        # Клиенты и прокси хранят ответ, но перепроверяют его по ETag
+        patch_cache_control(response, public=True, no_cache=True)
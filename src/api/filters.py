@@ -1,12 +1,27 @@
 import django_filters
 from decimal import Decimal
+from django.db.models import Exists, OuterRef
 from store.models import Book
+from store.search_backends import get_search_backend
+from store.utils import GENRE_MATCH_ALL, GENRE_MATCH_ANY, resolve_genre_terms
+
+
+class CharListFilter(django_filters.BaseCSVFilter, django_filters.CharFilter):
+    """Список значений через запятую: ?genre=Drama,Poetry"""
 
 
 class BookFilter(django_filters.FilterSet):
+    # Полнотекстовый поиск: в ES — по индексу, в БД — через SEARCH_DB_BACKEND
+    q = django_filters.CharFilter(method="filter_query", label="Поиск")
     title = django_filters.CharFilter(lookup_expr="icontains")
     author = django_filters.CharFilter(lookup_expr="icontains")
-    genre = django_filters.CharFilter(field_name="genre__name", lookup_expr="icontains")
+    # Жанры: часть названия, несколько через запятую; genre_match — все или любой
+    genre = CharListFilter(method="filter_genre", label="Жанры")
+    genre_match = django_filters.ChoiceFilter(
+        choices=[(GENRE_MATCH_ANY, "Любой из жанров"), (GENRE_MATCH_ALL, "Все жанры")],
+        method="filter_noop",
+        label="Совпадение жанров",
+    )
 
     # Фильтры по цене
     min_price = django_filters.NumberFilter(field_name="price", lookup_expr="gte")
@@ -41,9 +56,11 @@ class BookFilter(django_filters.FilterSet):
     class Meta:
         model = Book
         fields = [
+            "q",
             "title",
             "author",
             "genre",
+            "genre_match",
             "min_price",
             "max_price",
             "has_discount",
@@ -56,6 +73,38 @@ class BookFilter(django_filters.FilterSet):
             "isbn",
         ]
 
+    def filter_query(self, queryset, name, value):
+        """Фильтр по результатам поиска бэкенда БД"""
+        return queryset.filter(pk__in=get_search_backend().book_ids(value))
+
+    def filter_genre(self, queryset, name, value):
+        """
+        Названия жанров сопоставляются с id по индексу из кэша, а книги
+        отбираются через EXISTS по таблице связей — без JOIN, дублей строк
+        и LIKE по названиям жанров.
+        """
+        genre_sets = resolve_genre_terms(value)
+        if not genre_sets:
+            return queryset
+
+        through = Book.genre.through.objects.filter(book_id=OuterRef("pk"))
+        if self.form.cleaned_data.get("genre_match") == GENRE_MATCH_ALL:
+            # Для каждого значения должен найтись хотя бы один жанр
+            for genres in genre_sets:
+                if not genres:
+                    return queryset.none()
+                queryset = queryset.filter(Exists(through.filter(genre_id__in=genres)))
+            return queryset
+
+        genre_ids = set().union(*genre_sets)
+        if not genre_ids:
+            return queryset.none()
+        return queryset.filter(Exists(through.filter(genre_id__in=genre_ids)))
+
+    def filter_noop(self, queryset, name, value):
+        """Параметр учитывается другим фильтром"""
+        return queryset
+
     def filter_has_discount(self, queryset, name, value):
         """Фильтр для книг со скидкой"""
         if value:
@@ -0,0 +1,99 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.fastpath import book_values, serialize_book_rows
+from api.serializers import BookSerializer
+from store.models import Book, Genre
+
+
+class Rollback(Exception):
+    """Откатывает тестовые данные бенчмарка."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает BookSerializer и быстрый путь на .values() на списке книг. "
+        "Тестовые книги создаются во временной транзакции и откатываются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--books", type=int, default=10000, help="Сколько книг создать"
+        )
+        parser.add_argument(
+            "--page-size", type=int, default=100, help="Книг на одной странице"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Повторов каждого варианта"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.create_books(options["books"])
+                self.run(options["page_size"], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def create_books(self, count):
+        genres = Genre.objects.bulk_create(
+            [Genre(name=f"benchmark-genre-{i}") for i in range(10)]
+        )
+        books = Book.objects.bulk_create(
+            [
+                Book(
+                    title=f"Benchmark {i}",
+                    description="Benchmark book",
+                    author=f"Author {i % 100}",
+                    price=20,
+                    discounted_price=15 if i % 3 == 0 else None,
+                    stock_quantity=i % 5,
+                    slug=f"benchmark-book-{i}",
+                )
+                for i in range(count)
+            ],
+            batch_size=1000,
+        )
+        through = Book.genre.through
+        through.objects.bulk_create(
+            [
+                through(book_id=book.pk, genre_id=genres[(book.pk + shift) % 10].pk)
+                for book in books
+                for shift in (0, 3)
+            ],
+            batch_size=1000,
+        )
+
+    def run(self, page_size, repeat):
+        queryset = Book.objects.filter(slug__startswith="benchmark-book-").order_by(
+            "pk"
+        )
+        pages = range(0, queryset.count(), page_size)
+
+        def serializer():
+            for offset in pages:
+                page = queryset.prefetch_related("genre")[offset : offset + page_size]
+                BookSerializer(page, many=True).data
+
+        def fast_path():
+            for offset in pages:
+                serialize_book_rows(book_values(queryset)[offset : offset + page_size])
+
+        results = {}
+        for name, func in (("BookSerializer", serializer), ("values()", fast_path)):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - started)
+            results[name] = min(timings)
+            self.stdout.write(
+                f"{name:>15}: {results[name]:.3f} s на {len(pages)} страниц "
+                f"по {page_size} книг"
+            )
+
+        speedup = results["BookSerializer"] / results["values()"]
+        self.stdout.write(self.style.SUCCESS(f"Ускорение: {speedup:.1f}x"))
@@ -0,0 +1,280 @@
+import json
+from base64 import b64decode, b64encode
+from dataclasses import dataclass
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_EXACT = "exact"
+COUNT_ESTIMATE = "estimate"
+COUNT_NONE = "none"
+
+
+@dataclass
+class Cursor:
+    # Значения ключа сортировки у граничной записи
+    values: list
+    # True — страница перед граничной записью (ссылка previous)
+    reverse: bool = False
+    # Сортировка, для которой выдан курсор (None — курсор без отметки)
+    ordering: list | None = None
+
+
+def estimate_count(queryset):
+    """
+    Оценка количества строк по статистике планировщика PostgreSQL
+    (EXPLAIN без выполнения запроса). В других СУБД — обычный COUNT(*).
+    """
+    if connections[queryset.db].vendor != "postgresql":
+        return queryset.count()
+    plan = json.loads(queryset.order_by().explain(format="json"))
+    return plan[0]["Plan"]["Plan Rows"]
+
+
+def keyset_condition(ordering, values, reverse=False):
+    """
+    Условие "строго после записи с ключом values" для сортировки ordering:
+    (a > x) OR (a = x AND b > y) OR ...  Направление учитывается для каждого
+    поля. Дополнительная граница по первому полю позволяет начать
+    сканирование составного индекса сразу с нужной позиции.
+    """
+    condition = Q()
+    for position, term in enumerate(ordering):
+        name = term.lstrip("-")
+        descending = term.startswith("-") != reverse
+        step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[position]})
+        for previous, value in zip(ordering[:position], values):
+            step &= Q(**{previous.lstrip("-"): value})
+        condition |= step
+
+    first = ordering[0]
+    descending = first.startswith("-") != reverse
+    bound = Q(**{f"{first.lstrip('-')}__{'lte' if descending else 'gte'}": values[0]})
+    return bound & condition
+
+
+class CatalogCursorPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация каталога.
+
+    Страница выбирается условием по ключу сортировки, а не OFFSET, поэтому
+    глубокие страницы стоят столько же, сколько первая. Ключ — поля из
+    OrderingFilter (по умолчанию time_create) плюс id для однозначности;
+    для каждой сортировки в Book.Meta есть составной индекс.
+
+    Общее количество по умолчанию точное (COUNT(*)), как было у постраничной
+    пагинации: клиенты API полагаются на поле count. ?count=estimate берёт
+    оценку планировщика, ?count=none отключает подсчёт. Режим сохраняется
+    в ссылках next/previous.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    default_count_mode = COUNT_EXACT
+    default_ordering = ("time_create",)
+    tiebreaker = "id"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for backend in getattr(view, "filter_backends", ()):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        ordering = list(ordering or self.default_ordering)
+        # id в том же направлении, что и первое поле: индекс читается в одну сторону
+        descending = ordering[0].startswith("-")
+        ordering.append(f"-{self.tiebreaker}" if descending else self.tiebreaker)
+        return ordering
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(b64decode(encoded.encode("ascii")).decode("utf-8"))
+            ordering = data.get("o")
+            return Cursor(
+                values=list(data["v"]),
+                reverse=bool(data.get("r")),
+                ordering=None if ordering is None else [str(o) for o in ordering],
+            )
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, cursor):
+        data = {"v": cursor.values}
+        if cursor.reverse:
+            data["r"] = 1
+        if cursor.ordering is not None:
+            data["o"] = cursor.ordering
+        encoded = b64encode(json.dumps(data, default=str).encode("utf-8"))
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded.decode("ascii")
+        )
+
+    def resolve_cursor(self, cursor, ordering):
+        """
+        Курсор, применимый к сортировке ordering. Курсор другой сортировки
+        (например, по релевантности из ES при ответе из БД) не ошибка:
+        выдача начинается с первой страницы.
+        """
+        if cursor is None:
+            return None
+        if cursor.ordering is not None and cursor.ordering != list(ordering):
+            return None
+        if len(cursor.values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def get_count_mode(self, request):
+        return request.query_params.get(self.count_query_param, self.default_count_mode)
+
+    def get_count(self, queryset, request):
+        mode = self.get_count_mode(request)
+        if mode == COUNT_EXACT:
+            return queryset.count()
+        if mode == COUNT_ESTIMATE:
+            return estimate_count(queryset)
+        return None
+
+    def start(self, request):
+        """Разбирает курсор запроса; вызывается и для выдачи из поискового индекса."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.count = None
+        return self.decode_cursor(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor = self.start(request)
+        self.count = self.get_count(queryset, request)
+        ordering = self.get_ordering(request, queryset, view)
+        cursor = self.resolve_cursor(cursor, ordering)
+
+        if cursor is not None:
+            model = queryset.model
+            try:
+                values = [
+                    model._meta.get_field(term.lstrip("-")).to_python(value)
+                    for term, value in zip(ordering, cursor.values)
+                ]
+            except Exception:
+                raise NotFound(self.invalid_cursor_message)
+            queryset = queryset.filter(
+                keyset_condition(ordering, values, cursor.reverse)
+            )
+
+        reverse = cursor is not None and cursor.reverse
+        if reverse:
+            order_by = [
+                term[1:] if term.startswith("-") else f"-{term}" for term in ordering
+            ]
+        else:
+            order_by = ordering
+
+        # Лишняя запись показывает, есть ли страница дальше
+        rows = list(queryset.order_by(*order_by)[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+
+        keys = [
+            [self.get_row_value(row, term.lstrip("-")) for term in ordering]
+            for row in (rows[:1] + rows[-1:])
+        ]
+        self.set_links(cursor, keys, has_more, ordering)
+        return rows
+
+    @staticmethod
+    def get_row_value(row, name):
+        # Строки быстрого пути приходят из .values()
+        return row[name] if isinstance(row, dict) else getattr(row, name)
+
+    def set_links(self, cursor, keys, has_more, ordering):
+        """
+        Ссылки next/previous по ключам первой и последней записи страницы.
+        has_more — нашлась ли запись за страницей в направлении чтения;
+        курсоры помечаются сортировкой ordering.
+        """
+        reverse = cursor is not None and cursor.reverse
+        has_previous = has_more if reverse else cursor is not None
+        has_next = (cursor is not None) if reverse else has_more
+        first_key = keys[0] if keys else None
+        last_key = keys[-1] if keys else None
+
+        self.next_url = self.previous_url = None
+        if has_next and last_key is not None:
+            self.next_url = self.encode_cursor(
+                Cursor(values=last_key, ordering=list(ordering))
+            )
+        if has_previous:
+            if first_key is None:
+                self.previous_url = remove_query_param(
+                    self.base_url, self.cursor_query_param
+                )
+            else:
+                self.previous_url = self.encode_cursor(
+                    Cursor(values=first_key, reverse=True, ordering=list(ordering))
+                )
+
+    def get_paginated_response(self, data, **extra):
+        return Response(
+            {
+                "count": self.count,
+                "next": self.next_url,
+                "previous": self.previous_url,
+                "results": data,
+                **extra,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer", "nullable": True},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Курсор страницы из ссылок next/previous",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Подсчёт количества: exact (COUNT, по умолчанию), estimate (оценка планировщика) или none (без подсчёта)",
+                "schema": {
+                    "type": "string",
+                    "enum": [COUNT_EXACT, COUNT_ESTIMATE, COUNT_NONE],
+                    "default": self.default_count_mode,
+                },
+            },
+        ]
+
+
+class ReviewCursorPagination(CatalogCursorPagination):
+    """
+    Отзывы книги от новых к старым: ключ (-created_at, -id) читается
+    по индексу (book, -created_at) без OFFSET.
+    """
+
+    default_ordering = ("-created_at",)
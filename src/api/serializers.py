@@ -35,6 +35,8 @@ class BookSerializer(serializers.ModelSerializer):
             "final_price",
             "discount_percentage",
             "is_in_stock",
+            "average_rating",
+            "rating_count",
             "slug",
         )
         swagger_schema_fields = {
@@ -48,6 +50,8 @@ class BookSerializer(serializers.ModelSerializer):
                 "final_price": 19.99,
                 "discount_percentage": 20.0,
                 "is_in_stock": True,
+                "average_rating": 4.5,
+                "rating_count": 12,
                 "slug": "lorem-ipsum",
             }
         }
@@ -62,11 +66,34 @@ class BookSerializer(serializers.ModelSerializer):
         return obj.is_in_stock()
 
 
+class BookHitSerializer(serializers.Serializer):
+    """Книга из документа Elasticsearch в том же формате, что и BookSerializer."""
+
+    title = serializers.CharField()
+    description = serializers.CharField()
+    author = serializers.CharField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    genre = serializers.SerializerMethodField()
+    discounted_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, allow_null=True
+    )
+    final_price = serializers.FloatField()
+    discount_percentage = serializers.FloatField()
+    is_in_stock = serializers.BooleanField(source="in_stock")
+    average_rating = serializers.FloatField(allow_null=True)
+    rating_count = serializers.IntegerField()
+    slug = serializers.SlugField()
+
+    def get_genre(self, obj):
+        return [{"name": name} for name in obj["genres"] or []]
+
+
 class BookDetailSerializer(serializers.ModelSerializer):
     genre = GenreSerializer(many=True, read_only=True)
     final_price = serializers.SerializerMethodField()
     discount_percentage = serializers.SerializerMethodField()
     is_in_stock = serializers.SerializerMethodField()
+    rating_histogram = serializers.SerializerMethodField()
 
     class Meta:
         model = Book
@@ -86,6 +113,9 @@ class BookDetailSerializer(serializers.ModelSerializer):
             "pages",
             "publication_year",
             "stock_quantity",
+            "average_rating",
+            "rating_count",
+            "rating_histogram",
             "slug",
         )
         swagger_schema_fields = {
@@ -105,6 +135,9 @@ class BookDetailSerializer(serializers.ModelSerializer):
                 "pages": 320,
                 "publication_year": 2023,
                 "stock_quantity": 15,
+                "average_rating": 4.5,
+                "rating_count": 12,
+                "rating_histogram": {"5": 8, "4": 3, "3": 0, "2": 1, "1": 0},
                 "slug": "lorem-ipsum",
             }
         }
@@ -118,6 +151,30 @@ class BookDetailSerializer(serializers.ModelSerializer):
     def get_is_in_stock(self, obj):
         return obj.is_in_stock()
 
+    def get_rating_histogram(self, obj) -> dict:
+        return {
+            str(rating): count for rating, count in obj.get_rating_histogram().items()
+        }
+
+
+class AutocompleteSerializer(serializers.Serializer):
+    """Облегчённая подсказка поиска (используется для схемы API)."""
+
+    title = serializers.CharField()
+    author = serializers.CharField()
+    slug = serializers.SlugField()
+    url = serializers.CharField()
+
+    class Meta:
+        swagger_schema_fields = {
+            "example": {
+                "title": "Война и мир",
+                "author": "Лев Толстой",
+                "slug": "vojna-i-mir",
+                "url": "/book/vojna-i-mir/",
+            }
+        }
+
 
 # ===== REVIEWS SERIALIZERS =====
 
@@ -157,6 +214,20 @@ class ReviewSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class ReviewSummarySerializer(serializers.Serializer):
+    """Сводка оценок книги из денормализованных полей Book."""
+
+    average_rating = serializers.FloatField(allow_null=True)
+    rating_count = serializers.IntegerField()
+    histogram = serializers.SerializerMethodField()
+
+    def get_histogram(self, obj) -> dict:
+        return {
+            str(rating): obj[Book.histogram_field(rating)]
+            for rating in reversed(Book.RATING_SCALE)
+        }
+
+
 class ReviewDetailSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
     book_title = serializers.ReadOnlyField(source="book.title")
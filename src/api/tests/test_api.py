@@ -1,6 +1,16 @@
+import json
+from base64 import b64encode
+from unittest.mock import patch
+
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.test import APIClient
+from store.models import Genre
+from elasticsearch_dsl import Search
+from elasticsearch_dsl.response import Response
 
 
 def assert_book_fields(book_data):
@@ -48,6 +58,13 @@ class TestBookAPI:
         assert response.status_code == status.HTTP_200_OK
 
         assert_book_fields(response.data)
+        assert response.data["rating_histogram"] == {
+            "5": 0,
+            "4": 0,
+            "3": 0,
+            "2": 0,
+            "1": 0,
+        }
 
     def test_discounted_book_list_api(self, authenticated_API_client, create_book):
         create_book(discounted_price=None)
@@ -68,7 +85,48 @@ class TestBookAPI:
         assert response.data["previous"] is None
 
 
+@pytest.mark.django_db
+class TestAutocompleteAPI:
+    def test_autocomplete_returns_slim_prefix_matches(self, create_book):
+        create_book(title="Python Basics", author="Guido", slug="python-basics")
+        create_book(title="Hidden Python", slug="hidden-python", is_published=False)
+        create_book(title="Java Book", slug="java-book")
+
+        response = APIClient().get(reverse("autocomplete-api"), {"q": " PYth "})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"] == [
+            {
+                "title": "Python Basics",
+                "author": "Guido",
+                "slug": "python-basics",
+                "url": "/book/python-basics/",
+            }
+        ]
+
+    def test_autocomplete_limits_and_caches_by_prefix(self, create_book):
+        for i in range(12):
+            create_book(title=f"Python {i:02d}", slug=f"python-{i}")
+        url = reverse("autocomplete-api")
+        client = APIClient()
+
+        assert len(client.get(url, {"q": "python"}).data["results"]) == 10
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, {"q": "Python"})
+        assert len(response.data["results"]) == 10
+        assert not any("store_book" in q["sql"] for q in queries.captured_queries)
+
+    def test_autocomplete_short_prefix(self, create_book):
+        create_book(title="Python Basics", slug="python-basics")
+
+        response = APIClient().get(reverse("autocomplete-api"), {"q": "p"})
+
+        assert response.data["results"] == []
+
+
 @pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures("skip_index_flush")
 class TestBookSearchAPI:
     def test_book_search_api(self, authenticated_API_client, create_book):
         create_book(
@@ -111,3 +169,385 @@ class TestBookSearchAPI:
 
         assert "Learn Python programming" in book["description"]
         assert "Python Author" in book["author"]
+
+    def test_search_api_answered_from_index_with_facets(self, create_book):
+        create_book(title="Python Book", slug="python-book")
+        raw = {
+            "hits": {
+                "total": {"value": 11, "relation": "eq"},
+                "hits": [
+                    {
+                        "_id": "1",
+                        "_score": None,
+                        "sort": [20.0, 1],
+                        "_source": {
+                            "title": "Indexed Book",
+                            "description": "From the index",
+                            "author": "Author",
+                            "price": 20.0,
+                            "genres": ["Drama"],
+                            "discounted_price": 15.0,
+                            "final_price": 15.0,
+                            "discount_percentage": 25.0,
+                            "in_stock": True,
+                            "average_rating": 4.5,
+                            "rating_count": 2,
+                            "slug": "indexed-book",
+                        },
+                    }
+                ],
+            },
+            "aggregations": {
+                "genres": {"buckets": [{"key": "Drama", "doc_count": 11}]},
+                "price": {"buckets": [{"key": "10-25", "doc_count": 11}]},
+                "publication_year": {"buckets": [{"key": 1990.0, "doc_count": 4}]},
+                "in_stock": {
+                    "buckets": [{"key": 1, "key_as_string": "true", "doc_count": 11}]
+                },
+            },
+        }
+        searches = []
+
+        def fake_execute(search):
+            searches.append(search.to_dict())
+            return Response(search, raw)
+
+        params = {
+            "q": "drama",
+            "in_stock": "true",
+            "min_price": "10",
+            "ordering": "-price",
+            "count": "exact",
+        }
+        cursor = b64encode(json.dumps({"v": [25.0, 7]}).encode()).decode()
+
+        with patch.object(Search, "execute", autospec=True, side_effect=fake_execute):
+            with CaptureQueriesContext(connection) as queries:
+                response = APIClient().get(reverse("book-search-api"), params)
+            next_page = APIClient().get(
+                reverse("book-search-api"), {**params, "cursor": cursor}
+            )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert not any("store_book" in q["sql"] for q in queries.captured_queries)
+        assert response.data["count"] == 11
+        assert response.data["next"] is None
+        assert response.data["previous"] is None
+        assert response.data["results"][0]["genre"] == [{"name": "Drama"}]
+        assert response.data["results"][0]["price"] == "20.00"
+        assert response.data["results"][0]["is_in_stock"] is True
+        assert response.data["facets"]["in_stock"] == [{"value": True, "count": 11}]
+        assert response.data["facets"]["publication_year"] == [
+            {"value": 1990, "count": 4}
+        ]
+
+        body = searches[0]
+        assert body["sort"] == [{"price": {"order": "desc"}}, {"id": {"order": "desc"}}]
+        assert "search_after" not in body
+        # Следующая страница продолжает выдачу после ключа из курсора
+        assert searches[1]["search_after"] == [25.0, 7]
+        assert "cursor=" in next_page.data["previous"]
+        assert {"range": {"price": {"gte": 10.0}}} in body["query"]["bool"]["filter"]
+        assert {"term": {"in_stock": True}} in body["query"]["bool"]["filter"]
+
+    def test_search_api_query_falls_back_to_database(self, create_book):
+        create_book(title="Python Book", slug="python-book")
+        create_book(title="Java Book", slug="java-book")
+
+        with patch("store.search.search_catalog_es", side_effect=ConnectionError):
+            response = APIClient().get(reverse("book-search-api"), {"q": "python"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [book["slug"] for book in response.data["results"]] == ["python-book"]
+        assert "facets" not in response.data
+
+    def test_search_cursor_from_index_restarts_on_database(self, create_book):
+        create_book(title="Python Book", slug="python-book")
+        # Курсор сортировки по релевантности, выданный ответом из ES
+        cursor = b64encode(
+            json.dumps({"v": [1.5, 7], "o": ["-_score", "-id"]}).encode()
+        ).decode()
+
+        with patch("store.search.search_catalog_es", side_effect=ConnectionError):
+            response = APIClient().get(
+                reverse("book-search-api"), {"q": "python", "cursor": cursor}
+            )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [book["slug"] for book in response.data["results"]] == ["python-book"]
+        assert response.data["previous"] is None
+
+
+@pytest.mark.django_db
+class TestCatalogCursorPagination:
+    def test_cursor_walks_all_pages_without_offset(self, create_book):
+        # Одинаковая цена: порядок внутри страницы определяет id
+        for i in range(25):
+            create_book(title=f"Book {i:02d}", slug=f"book-{i}", price=10)
+        client = APIClient()
+        url = reverse("all-books-api")
+
+        slugs, pages = [], []
+        response = client.get(url, {"ordering": "-price", "count": "exact"})
+        assert response.data["count"] == 25
+        while True:
+            pages.append(response)
+            slugs += [book["slug"] for book in response.data["results"]]
+            if response.data["next"] is None:
+                break
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(response.data["next"])
+            assert not any("OFFSET" in q["sql"] for q in queries.captured_queries)
+
+        assert len(pages) == 3
+        assert slugs == [f"book-{i}" for i in reversed(range(25))]
+        # Точное количество по умолчанию, как у прежней постраничной пагинации
+        assert pages[-1].data["count"] == 25
+
+        # Назад с последней страницы — та же вторая страница
+        previous = client.get(pages[-1].data["previous"])
+        assert previous.data["results"] == pages[1].data["results"]
+        assert previous.data["next"] is not None
+
+    def test_count_can_be_disabled_across_pages(self, create_book):
+        for i in range(15):
+            create_book(slug=f"book-{i}")
+        client = APIClient()
+
+        response = client.get(reverse("all-books-api"), {"count": "none"})
+        assert response.data["count"] is None
+        assert "count=none" in response.data["next"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(response.data["next"])
+        assert response.data["count"] is None
+        assert not any("COUNT(" in q["sql"] for q in queries.captured_queries)
+
+    def test_invalid_cursor(self):
+        response = APIClient().get(reverse("all-books-api"), {"cursor": "garbage"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_estimated_count_falls_back_to_count_outside_postgres(self, create_book):
+        genre = Genre.objects.create(name="Drama")
+        for i in range(3):
+            create_book(slug=f"book-{i}").genre.add(genre)
+
+        response = APIClient().get(
+            reverse("books-by-genre-api", kwargs={"genre_id": genre.pk}),
+            {"count": "estimate"},
+        )
+
+        assert response.data["count"] == 3
+        assert len(response.data["results"]) == 3
+
+
+@pytest.mark.django_db
+class TestCatalogCache:
+    def test_not_modified_answered_without_queries(self, create_book):
+        create_book(slug="cached-book")
+        url = reverse("all-books-api")
+        client = APIClient()
+
+        response = client.get(url)
+        etag = response["ETag"]
+        assert "public" in response["Cache-Control"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == etag
+        assert len(queries.captured_queries) == 0
+
+    def test_response_shared_between_users(self, authenticated_API_client, create_book):
+        create_book(slug="cached-book")
+        url = reverse("genre-list-api")
+        Genre.objects.create(name="Drama")
+
+        anonymous = APIClient().get(url, {"b": "", "page_size": "x"})
+        with CaptureQueriesContext(connection) as queries:
+            authenticated = authenticated_API_client.get(url, {"page_size": "x"})
+
+        assert authenticated.data == anonymous.data
+        assert not any("store_genre" in q["sql"] for q in queries.captured_queries)
+
+    def test_genre_change_invalidates_cache_and_etag(
+        self, django_capture_on_commit_callbacks
+    ):
+        genre = Genre.objects.create(name="Drama")
+        url = reverse("genre-list-api")
+        client = APIClient()
+        etag = client.get(url)["ETag"]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            genre.name = "Tragedy"
+            genre.save()
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+        assert response.data["results"] == [{"name": "Tragedy"}]
+
+
+@pytest.mark.django_db
+class TestBookGenreFilter:
+    @pytest.fixture
+    def books(self, create_book):
+        drama = Genre.objects.create(name="Drama")
+        poetry = Genre.objects.create(name="Poetry")
+        both = create_book(title="Both", slug="both")
+        both.genre.add(drama, poetry)
+        create_book(title="Drama only", slug="drama-only").genre.add(drama)
+        create_book(title="Poetry only", slug="poetry-only").genre.add(poetry)
+        create_book(title="No genre", slug="no-genre")
+
+    def search(self, **params):
+        with patch("store.search.search_catalog_es", side_effect=ConnectionError):
+            response = APIClient().get(reverse("book-search-api"), params)
+        assert response.status_code == status.HTTP_200_OK
+        return sorted(book["slug"] for book in response.data["results"])
+
+    def test_any_and_all_genres(self, books):
+        assert self.search(genre="dram,poe") == ["both", "drama-only", "poetry-only"]
+        assert self.search(genre="drama,poetry", genre_match="all") == ["both"]
+        assert self.search(genre="drama,unknown", genre_match="all") == []
+        assert self.search(genre="unknown") == []
+
+    def test_filter_uses_exists_and_cached_genre_index(self, books):
+        self.search(genre="drama")
+
+        with CaptureQueriesContext(connection) as queries:
+            assert self.search(genre="drama", count="exact") == ["both", "drama-only"]
+
+        sql = " ".join(q["sql"] for q in queries.captured_queries)
+        assert "EXISTS" in sql
+        assert 'FROM "store_genre"' not in sql
+        assert "LIKE" not in sql
+
+    def test_new_genre_visible_after_save(self, books, create_book):
+        self.search(genre="drama")
+        create_book(slug="fantasy").genre.add(Genre.objects.create(name="Fantasy"))
+
+        assert self.search(genre="fantasy") == ["fantasy"]
+
+    def test_index_filter_uses_resolved_genre_names(self, books):
+        from store.search import build_genre_filters
+
+        assert build_genre_filters(["DRAM", "poe"], "any") == [
+            {"terms": {"genres.raw": ["Drama", "Poetry"]}}
+        ]
+        assert build_genre_filters(["drama", "nothing"], "all") == [
+            {"terms": {"genres.raw": ["Drama"]}},
+            {"terms": {"genres.raw": []}},
+        ]
+
+
+@pytest.mark.django_db
+class TestBookRankingAPI:
+    def test_top_books_and_cache_follow_refresh(self, create_book, existing_user):
+        from cart.models import Cart, CartItem
+        from store.rankings import refresh_rankings
+
+        first = create_book(title="First", slug="first")
+        second = create_book(title="Second", slug="second")
+        create_book(title="Hidden", slug="hidden", is_published=False)
+        cart = Cart.objects.create(user=existing_user)
+        CartItem.objects.create(cart=cart, book=first)
+        refresh_rankings()
+
+        client = APIClient()
+        url = reverse("book-ranking-api", kwargs={"ranking": "popular"})
+        response = client.get(url, {"limit": 5})
+        assert response.status_code == status.HTTP_200_OK
+        assert [book["slug"] for book in response.data] == ["first", "second"]
+        assert_book_fields(response.data[0])
+        etag = response["ETag"]
+
+        CartItem.objects.create(
+            cart=Cart.objects.create(session_key="guest"), book=second
+        )
+        CartItem.objects.create(
+            cart=Cart.objects.create(session_key="guest-2"), book=second
+        )
+        assert client.get(url, {"limit": 5}, HTTP_IF_NONE_MATCH=etag).status_code == (
+            status.HTTP_304_NOT_MODIFIED
+        )
+
+        refresh_rankings()
+        response = client.get(url, {"limit": 1}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert [book["slug"] for book in response.data] == ["second"]
+
+    def test_top_rated_and_unknown_ranking(self, create_book):
+        create_book(slug="rated")
+
+        client = APIClient()
+        response = client.get(
+            reverse("book-ranking-api", kwargs={"ranking": "top-rated"})
+        )
+        assert [book["slug"] for book in response.data] == ["rated"]
+
+        response = client.get(reverse("book-ranking-api", kwargs={"ranking": "worst"}))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestReviewsByBookAPI:
+    @pytest.fixture
+    def reviews(self, create_book):
+        from django.contrib.auth.models import User
+        from reviews.models import Review
+
+        book = create_book(title="Reviewed", slug="reviewed")
+        for number, rating in enumerate((5, 5, 4, 2, 5), start=1):
+            user = User.objects.create_user(username=f"reader{number}", password="p")
+            Review.objects.create(book=book, user=user, rating=rating)
+        return book
+
+    def test_page_in_one_query_with_summary(
+        self, authenticated_API_client, settings, reviews
+    ):
+        url = reverse("reviews-by-book", kwargs={"book_id": reviews.pk})
+
+        # Точный count по умолчанию — отдельный COUNT, без него страница — один запрос
+        assert authenticated_API_client.get(url).data["count"] == 5
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_API_client.get(url, {"count": "none"})
+
+        assert response.status_code == status.HTTP_200_OK
+        review_queries = [
+            q["sql"] for q in queries.captured_queries if "reviews_review" in q["sql"]
+        ]
+        assert len(review_queries) == 1
+        assert "auth_user" in review_queries[0]
+        assert "store_book" in review_queries[0]
+        assert not any("COUNT(" in q["sql"] for q in queries.captured_queries)
+
+        assert response.data["summary"] == {
+            "average_rating": pytest.approx(4.2),
+            "rating_count": 5,
+            "histogram": {"5": 3, "4": 1, "3": 0, "2": 1, "1": 0},
+        }
+        results = response.data["results"]
+        assert [review["user"] for review in results] == [
+            f"reader{number}" for number in range(5, 0, -1)
+        ]
+        assert results[0]["book_title"] == "Reviewed"
+
+    def test_keyset_pages_newest_first(self, authenticated_API_client, reviews):
+        from api.pagination import ReviewCursorPagination
+
+        url = reverse("reviews-by-book", kwargs={"book_id": reviews.pk})
+        with patch.object(ReviewCursorPagination, "page_size", 2):
+            seen = []
+            while url:
+                data = authenticated_API_client.get(url).data
+                seen += [review["user"] for review in data["results"]]
+                url = data["next"]
+
+        assert seen == [f"reader{number}" for number in range(5, 0, -1)]
+
+    def test_unknown_book(self, authenticated_API_client):
+        url = reverse("reviews-by-book", kwargs={"book_id": 999})
+        response = authenticated_API_client.get(url)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
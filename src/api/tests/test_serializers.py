@@ -1,11 +1,20 @@
+import json
+from io import StringIO
+from decimal import Decimal
+
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
 from rest_framework.exceptions import ValidationError
 
 from store.models import Book, Genre
 from reviews.models import Review
 from cart.models import Cart, CartItem
 from user_profile.models import UserProfile
+from api.fastpath import book_values, serialize_book_rows
 from api.serializers import (
     GenreSerializer,
     BookSerializer,
@@ -55,6 +64,46 @@ class TestBookSerializer:
         assert data["is_in_stock"] is True
 
 
+@pytest.mark.django_db
+class TestFastBookList:
+    def test_matches_book_serializer(self, create_book):
+        drama = Genre.objects.create(name="Drama")
+        poetry = Genre.objects.create(name="Poetry")
+        discounted = create_book(
+            slug="discounted", price=25.99, discounted_price=19.99, stock_quantity=3
+        )
+        discounted.genre.add(poetry, drama)
+        create_book(slug="plain", price=10, discounted_price=None, stock_quantity=0)
+        # 0.05% — половина единицы округления: Python округляет к чётному
+        create_book(
+            slug="halfway", price=Decimal("40.00"), discounted_price=Decimal("39.98")
+        )
+
+        queryset = Book.objects.order_by("pk")
+        expected = BookSerializer(queryset.prefetch_related("genre"), many=True).data
+        for book in expected:
+            book["genre"] = sorted(book["genre"], key=lambda genre: genre["name"])
+
+        with CaptureQueriesContext(connection) as queries:
+            fast = serialize_book_rows(book_values(queryset))
+
+        # Строки книг и жанры страницы — не больше двух запросов
+        assert len(queries.captured_queries) <= 2
+        renderer = JSONRenderer()
+        assert json.loads(renderer.render(fast)) == json.loads(
+            renderer.render(expected)
+        )
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command(
+            "benchmark_book_list", books=30, page_size=10, repeat=1, stdout=out
+        )
+
+        assert "Ускорение" in out.getvalue()
+        assert not Book.objects.exists()
+
+
 @pytest.mark.django_db
 class TestBookDetailSerializer:
     def test_book_detail_fields(self, create_book):
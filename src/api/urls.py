@@ -3,9 +3,11 @@ from .views import (
     AllBooksAPI,
     DiscountedBookListAPI,
     BookSearchAPI,
+    AutocompleteAPI,
     BookDetailAPIView,
     GenreListAPI,
     BooksByGenreAPI,
+    BookRankingAPI,
     ReviewsByBookAPI,
     ReviewDetailAPI,
     CartAPI,
@@ -22,6 +24,8 @@ urlpatterns = [
         name="discounted-books-api",
     ),
     path("book-search/", BookSearchAPI.as_view(), name="book-search-api"),
+    path("autocomplete/", AutocompleteAPI.as_view(), name="autocomplete-api"),
+    path("rankings/<slug:ranking>/", BookRankingAPI.as_view(), name="book-ranking-api"),
     path("books/<slug:slug>/", BookDetailAPIView.as_view(), name="book-detail-api"),
     # Additional book-related endpoints
     path("genres/", GenreListAPI.as_view(), name="genre-list-api"),
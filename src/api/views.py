@@ -1,40 +1,76 @@
-from django.utils.decorators import method_decorator
 from django_filters import rest_framework as filters
 
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 
 from rest_framework import generics
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import (
+    AllowAny,
+    IsAuthenticated,
+    IsAuthenticatedOrReadOnly,
+)
+from rest_framework.exceptions import NotFound
 from rest_framework.filters import OrderingFilter
+from rest_framework.response import Response
+from rest_framework.throttling import ScopedRateThrottle
+from rest_framework.views import APIView
 
 from store.models import Book, Genre
 from cart.models import Cart, CartItem
 from reviews.models import Review
 from user_profile.models import UserProfile
 
+from .caching import CatalogCacheMixin
+from .fastpath import FastBookListMixin, book_values, serialize_book_rows
 from .filters import *
+from .pagination import (
+    COUNT_NONE,
+    CatalogCursorPagination,
+    ReviewCursorPagination,
+)
 from .serializers import (
+    AutocompleteSerializer,
     BookSerializer,
     BookDetailSerializer,
+    BookHitSerializer,
     GenreSerializer,
     ReviewSerializer,
     ReviewDetailSerializer,
+    ReviewSummarySerializer,
     CartSerializer,
     CartItemSerializer,
     UserProfileSerializer,
 )
 
-from django.views.decorators.cache import cache_page
+from store.cache import CATALOG_NAMESPACE, RANKINGS_NAMESPACE
+from store.search import CatalogQuery, autocomplete, search_catalog
+
+# Поля BookSerializer и ключа пагинации: остальные колонки книги не читаются
+BOOK_LIST_FIELDS = (
+    "title",
+    "description",
+    "author",
+    "price",
+    "discounted_price",
+    "stock_quantity",
+    "average_rating",
+    "rating_count",
+    "slug",
+    "time_create",
+)
+
+# Списки рейтингов: имя в адресе → поле BookRanking
+BOOK_RANKINGS = {"popular": "popularity_score", "top-rated": "rating_score"}
+RANKING_DEFAULT_LIMIT = 10
+RANKING_MAX_LIMIT = 100
 
 
-@method_decorator(cache_page(60 * 5), name="dispatch")
 @extend_schema(
     tags=["Books"],
     methods=["GET"],
     summary="Получить список всех книг",
     description="Возвращает полный список книг с основной информацией. Поддерживает пагинацию.",
 )
-class AllBooksAPI(generics.ListAPIView):
+class AllBooksAPI(CatalogCacheMixin, FastBookListMixin, generics.ListAPIView):
     """
     Возвращает список всех доступных книг.
 
@@ -42,19 +78,15 @@ class AllBooksAPI(generics.ListAPIView):
     Использует пагинацию.
     """
 
+    cache_timeout = 60 * 5
     queryset = (
         Book.objects.filter(is_published=True)
-        .only(
-            "title",
-            "description",
-            "author",
-            "price",
-            "discounted_price",
-        )
+        .only(*BOOK_LIST_FIELDS)
         .prefetch_related("genre")
     )
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = CatalogCursorPagination
     filter_backends = (filters.DjangoFilterBackend, OrderingFilter)
     filterset_fields = ["title", "author", "genre"]
     ordering_fields = ["price", "title"]
@@ -63,20 +95,20 @@ class AllBooksAPI(generics.ListAPIView):
         return super().list(request, *args, **kwargs)
 
 
-@method_decorator(cache_page(60 * 15), name="dispatch")
 @extend_schema(
     tags=["Books"],
     methods=["GET"],
     summary="Получить детали книги",
     description="Возвращает подробную информацию о книге по её slug или ID.",
 )
-class BookDetailAPIView(generics.RetrieveAPIView):
+class BookDetailAPIView(CatalogCacheMixin, generics.RetrieveAPIView):
     """
     Предоставляет подробную информацию об отдельной книге.
 
     Возвращает полную информацию о книге, включая описание, фото и статус публикации.
     """
 
+    cache_timeout = 60 * 15
     queryset = Book.objects.filter(is_published=True).prefetch_related("genre")
     serializer_class = BookDetailSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -86,28 +118,24 @@ class BookDetailAPIView(generics.RetrieveAPIView):
         return super().retrieve(request, *args, **kwargs)
 
 
-@method_decorator(cache_page(60 * 3), name="dispatch")
 @extend_schema(
     tags=["Books"],
     methods=["GET"],
     summary="Получить список книг со скидкой",
     description="Возвращает список книг, у которых указана скидочная цена.",
 )
-class DiscountedBookListAPI(generics.ListAPIView):
+class DiscountedBookListAPI(CatalogCacheMixin, FastBookListMixin, generics.ListAPIView):
     """Отображает все книги со скидкой."""
 
+    cache_timeout = 60 * 3
     queryset = (
         Book.objects.filter(discounted_price__isnull=False, is_published=True)
-        .only(
-            "title",
-            "author",
-            "price",
-            "discounted_price",
-        )
+        .only(*BOOK_LIST_FIELDS)
         .prefetch_related("genre")
     )
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = CatalogCursorPagination
     filter_backends = (filters.DjangoFilterBackend, OrderingFilter)
     filterset_class = BookFilter
     ordering_fields = ["price", "title"]
@@ -116,34 +144,105 @@ class DiscountedBookListAPI(generics.ListAPIView):
         return super().list(request, *args, **kwargs)
 
 
-@method_decorator(cache_page(60 * 3), name="dispatch")
 @extend_schema(
     tags=["Books"],
     methods=["GET"],
     summary="Поиск и фильтрация книг",
-    description="Позволяет искать книги по различным полям и сортировать результаты. Поддерживает фильтрацию через BookFilter и сортировку по цене и названию.",
+    description="Позволяет искать книги по различным полям и сортировать результаты. Поддерживает полнотекстовый поиск (q), фильтрацию через BookFilter и сортировку по цене и названию. Пока доступен Elasticsearch, ответ дополнительно содержит facets — количество книг по жанрам, ценовым диапазонам, десятилетиям и наличию.",
 )
-class BookSearchAPI(generics.ListAPIView):
-    """Отображает книгу по запросу или ничего не выводит."""
+class BookSearchAPI(CatalogCacheMixin, FastBookListMixin, generics.ListAPIView):
+    """
+    Отображает книгу по запросу или ничего не выводит.
+
+    Поиск, фильтры, сортировка и фасеты выполняются одним запросом к ES,
+    а книги сериализуются прямо из документов индекса. Если ES недоступен,
+    тот же запрос обслуживает БД через BookFilter и OrderingFilter.
+    """
 
+    cache_timeout = 60 * 3
     queryset = Book.objects.filter(is_published=True).prefetch_related("genre")
     serializer_class = BookSerializer
+    pagination_class = CatalogCursorPagination
     filter_backends = (filters.DjangoFilterBackend, OrderingFilter)
     filterset_class = BookFilter
     ordering_fields = ["price", "title"]
 
     def list(self, request, *args, **kwargs):
+        filterset = self.filterset_class(request.query_params, queryset=self.queryset)
+        # Некорректные параметры отклоняет DjangoFilterBackend (ответ 400)
+        if filterset.is_valid():
+            response = self.list_from_search_index(request, filterset.form.cleaned_data)
+            if response is not None:
+                return response
         return super().list(request, *args, **kwargs)
 
+    def list_from_search_index(self, request, cleaned_data):
+        paginator = self.paginator
+        cursor = paginator.start(request)
+        query = cleaned_data.get("q") or ""
+
+        if query and not request.query_params.get(OrderingFilter.ordering_param):
+            # Полнотекстовый поиск без явной сортировки — по релевантности
+            ordering = ["-_score", "-id"]
+        else:
+            ordering = paginator.get_ordering(request, self.queryset, self)
+        cursor = paginator.resolve_cursor(cursor, ordering)
+
+        catalog_page = search_catalog(
+            CatalogQuery(
+                query=query,
+                filters=cleaned_data,
+                ordering=ordering,
+                search_after=cursor.values if cursor else None,
+                reverse=bool(cursor and cursor.reverse),
+                limit=paginator.page_size,
+            )
+        )
+        if catalog_page is None:
+            return None
+
+        # Общее количество ES возвращает вместе со страницей
+        if paginator.get_count_mode(request) != COUNT_NONE:
+            paginator.count = catalog_page.count
+        paginator.set_links(cursor, catalog_page.keys, catalog_page.has_more, ordering)
+        return paginator.get_paginated_response(
+            BookHitSerializer(catalog_page.results, many=True).data,
+            facets=catalog_page.facets,
+        )
+
+
+@extend_schema(
+    tags=["Books"],
+    methods=["GET"],
+    summary="Автодополнение поиска",
+    description="Возвращает не более 10 подсказок по префиксу названия или автора (параметр q, от 2 символов).",
+    parameters=[OpenApiParameter("q", str, description="Префикс запроса")],
+    responses=AutocompleteSerializer(many=True),
+)
+class AutocompleteAPI(APIView):
+    """
+    Подсказки для строки поиска в шапке сайта.
+
+    Работает по edge n-gram полям BookDocument, результаты кэшируются
+    по нормализованному префиксу, поэтому повторные нажатия не доходят до ES.
+    """
+
+    permission_classes = [AllowAny]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "autocomplete"
+
+    def get(self, request, *args, **kwargs):
+        return Response({"results": autocomplete(request.query_params.get("q", ""))})
+
 
-@method_decorator(cache_page(60 * 60 * 2), name="dispatch")
 @extend_schema(
     tags=["Books"],
     methods=["GET"],
     summary="Получить список всех жанров",
     description="Возвращает полный список доступных жанров книг.",
 )
-class GenreListAPI(generics.ListAPIView):
+class GenreListAPI(CatalogCacheMixin, generics.ListAPIView):
+    cache_timeout = 60 * 60 * 2
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -152,16 +251,17 @@ class GenreListAPI(generics.ListAPIView):
         return super().list(request, *args, **kwargs)
 
 
-@method_decorator(cache_page(60 * 10), name="dispatch")
 @extend_schema(
     tags=["Books"],
     methods=["GET"],
     summary="Получить книги по жанру",
     description="Возвращает список книг определенного жанра.",
 )
-class BooksByGenreAPI(generics.ListAPIView):
+class BooksByGenreAPI(CatalogCacheMixin, FastBookListMixin, generics.ListAPIView):
+    cache_timeout = 60 * 10
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = CatalogCursorPagination
 
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -173,6 +273,48 @@ class BooksByGenreAPI(generics.ListAPIView):
         ).prefetch_related("genre")
 
 
+@extend_schema(
+    tags=["Books"],
+    methods=["GET"],
+    summary="Популярные и лучшие книги",
+    description="Возвращает первые limit книг рейтинга popular (популярность по отзывам, корзинам и избранному) или top-rated (сглаженный средний рейтинг). Рейтинги предрасчитываются по расписанию.",
+    parameters=[
+        OpenApiParameter(
+            "limit", int, description=f"Количество книг, до {RANKING_MAX_LIMIT}"
+        )
+    ],
+)
+class BookRankingAPI(CatalogCacheMixin, generics.ListAPIView):
+    """
+    Топ книг из материализованной таблицы BookRanking.
+
+    Выборка — ORDER BY по индексу оценки с LIMIT, без агрегации отзывов.
+    Кэш зависит и от версии каталога, и от версии рейтингов.
+    """
+
+    cache_timeout = 60 * 10
+    cache_namespaces = (CATALOG_NAMESPACE, RANKINGS_NAMESPACE)
+    serializer_class = BookSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get("limit", RANKING_DEFAULT_LIMIT))
+        except ValueError:
+            limit = RANKING_DEFAULT_LIMIT
+        return max(1, min(limit, RANKING_MAX_LIMIT))
+
+    def get_queryset(self):
+        score = BOOK_RANKINGS.get(self.kwargs["ranking"])
+        if score is None:
+            raise NotFound("Unknown ranking")
+        return Book.objects.ranked(score).filter(is_published=True)
+
+    def list(self, request, *args, **kwargs):
+        rows = book_values(self.get_queryset())[: self.get_limit()]
+        return Response(serialize_book_rows(rows))
+
+
 # Вспомогательная функция для создания или получения корзины пользователя
 def get_or_create_cart(user):
     cart, created = Cart.objects.get_or_create(user=user)
@@ -186,7 +328,7 @@ def get_or_create_cart(user):
     tags=["Reviews"],
     methods=["GET"],
     summary="Получить отзывы о книге",
-    description="Возвращает список всех отзывов для конкретной книги.",
+    description="Возвращает отзывы книги от новых к старым с курсорной пагинацией. Ответ содержит summary — средний рейтинг, количество оценок и распределение по звёздам.",
 )
 @extend_schema(
     tags=["Reviews"],
@@ -195,15 +337,46 @@ def get_or_create_cart(user):
     description="Добавляет новый отзыв к книге.",
 )
 class ReviewsByBookAPI(generics.ListCreateAPIView):
+    """
+    Отзывы книги одним запросом: пользователь и название книги
+    приходят через JOIN. Сводка оценок читается из полей книги,
+    которые поддерживают сигналы отзывов, а не считается агрегатом.
+    """
+
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ReviewCursorPagination
 
     def get_queryset(self):
         book_id = self.kwargs["book_id"]
-        return Review.objects.filter(book_id=book_id)
+        return (
+            Review.objects.filter(book_id=book_id)
+            .select_related("user", "book")
+            .only(
+                "rating",
+                "text",
+                "created_at",
+                "updated_at",
+                "book__title",
+                "user__username",
+            )
+        )
+
+    def get_summary(self):
+        summary = (
+            Book.objects.filter(pk=self.kwargs["book_id"])
+            .values("average_rating", "rating_count", *Book.RATING_HISTOGRAM_FIELDS)
+            .first()
+        )
+        if summary is None:
+            raise NotFound("Book not found")
+        return ReviewSummarySerializer(summary).data
 
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        summary = self.get_summary()
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.paginator.get_paginated_response(serializer.data, summary=summary)
 
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
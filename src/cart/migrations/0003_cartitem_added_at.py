@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:18
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0002_cart_total_items_cart_total_price_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cartitem",
+            name="added_at",
+            field=models.DateTimeField(
+                db_default=django.db.models.functions.datetime.Now(), editable=False
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cartitem",
+            index=models.Index(
+                fields=["added_at"], name="cart_cartit_added_a_c3b0c9_idx"
+            ),
+        ),
+    ]
@@ -1,9 +1,13 @@
 from django.db import models
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Now
 from django.contrib.auth.models import User
 
 from store.models import Book
 
+from .totals import deferred_cart_totals
+
 
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -21,15 +25,19 @@ class Cart(models.Model):
 
     # Очистка корзины после заказа
     def clear(self):
-        self.items.clear()
+        with deferred_cart_totals():
+            self.items.clear()
         self.is_active = False
+        self.total_price = 0
+        self.total_items = 0
         self.save()
 
     # Привязка корзины к пользователям после входа
     def assign_to_user(self, user):
         self.user = user
         self.session_key = None
-        self.save()
+        # Итоги меняются только update_totals, не перезаписываем их из памяти
+        self.save(update_fields=["user", "session_key", "updated_at"])
 
     # Слияние корзин при логине пользователя
     def merge_with(self, other_cart):
@@ -41,39 +49,48 @@ class Cart(models.Model):
             return
 
         with transaction.atomic():
-            for other_item in other_cart.cartitem_set.select_for_update():
-                # Проверяем, есть ли уже такой товар в текущей корзине
-                existing_item = (
-                    self.cartitem_set.select_for_update()
-                    .filter(book=other_item.book)
-                    .first()
-                )
-
-                if existing_item:
-                    # Если товар уже есть - увеличиваем количество
-                    existing_item.quantity += other_item.quantity
-                    existing_item.save(update_fields=["quantity"])
-                else:
-                    # Если товара нет - создаем новый элемент корзины
-                    CartItem.objects.create(
-                        cart=self,
-                        book=other_item.book,
-                        quantity=other_item.quantity,
-                        # Сохраняем цену из гостевой корзины, чтобы не изменять итоги
-                        price=other_item.price,
-                    )
-
-            # Обновляем общие суммы корзины
-            self.total_price = self.get_total_price()
-            self.total_items = self.get_total_items()
-            self.save(update_fields=["total_price", "total_items"])
+            # Блокируем обе корзины в порядке pk: параллельные логины
+            # сериализуются, а гостевая корзина сливается ровно один раз
+            carts = {
+                cart.pk: cart
+                for cart in Cart.objects.select_for_update()
+                .filter(pk__in=[self.pk, other_cart.pk])
+                .order_by("pk")
+            }
+            other = carts.get(other_cart.pk)
+            if other is None or not other.is_active:
+                return
+
+            CartItem.merge_items(source_cart_id=other.pk, target_cart_id=self.pk)
+            Cart.objects.filter(pk=other.pk).update(is_active=False)
+            other_cart.is_active = False
+
+            # Сигналы на сырой upsert не срабатывают — один пересчёт итогов
+            self.update_totals()
+
+    @classmethod
+    def update_totals_for(cls, cart_id):
+        """Пересчитывает итоги корзины одним агрегатом и сохраняет их одним UPDATE."""
+        totals = CartItem.objects.filter(cart_id=cart_id).aggregate(
+            total_price=Sum(F("price") * F("quantity")),
+            total_items=Sum("quantity"),
+        )
+        totals = {name: value or 0 for name, value in totals.items()}
+        cls.objects.filter(pk=cart_id).update(**totals)
+        return totals
+
+    def update_totals(self):
+        totals = self.update_totals_for(self.pk)
+        self.total_price = totals["total_price"]
+        self.total_items = totals["total_items"]
 
     # Получение цены в корзине
     def get_total_price(self):
-        return sum(item.price * item.quantity for item in self.cartitem_set.all())
+        total = self.cartitem_set.aggregate(total=Sum(F("price") * F("quantity")))
+        return total["total"] or 0
 
     def get_total_items(self):
-        return sum(item.quantity for item in self.cartitem_set.all())
+        return self.cartitem_set.aggregate(total=Sum("quantity"))["total"] or 0
 
     class Meta:
         indexes = [
@@ -88,11 +105,33 @@ class CartItem(models.Model):
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Заполняет БД, в том числе при сыром INSERT из merge_items
+    added_at = models.DateTimeField(db_default=Now(), editable=False)
 
     def save(self, *args, **kwargs):
         if self.price is None:
             self.price = self.book.get_final_price()
         super().save(*args, **kwargs)
 
+    @classmethod
+    def merge_items(cls, source_cart_id, target_cart_id):
+        """
+        Переносит позиции одной корзины в другую одним INSERT ... ON CONFLICT:
+        совпадающие книги складывают количество, новые сохраняют гостевую цену.
+        """
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (cart_id, book_id, quantity, price)
+                SELECT %s, book_id, quantity, price FROM {table} WHERE cart_id = %s
+                ON CONFLICT (cart_id, book_id)
+                DO UPDATE SET quantity = {table}.quantity + EXCLUDED.quantity
+                """,
+                [target_cart_id, source_cart_id],
+            )
+            return cursor.rowcount
+
     class Meta:
         unique_together = ("cart", "book")
+        indexes = [models.Index(fields=["added_at"])]
@@ -1,12 +1,18 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
-from .models import CartItem
+from .models import Cart, CartItem
+from .totals import defer_cart_totals_for
 
 
 @receiver([post_save, post_delete], sender=CartItem)
 def update_cart_totals(sender, instance, **kwargs):
-    cart = instance.cart
-    cart.total_price = cart.get_total_price()
-    cart.total_items = cart.get_total_items()
-    cart.save(update_fields=["total_price", "total_items"])
+    # Внутри deferred_cart_totals() итоги пересчитаются один раз на выходе
+    if defer_cart_totals_for(instance.cart_id):
+        return
+    totals = Cart.update_totals_for(instance.cart_id)
+
+    # Держим загруженный объект корзины в актуальном состоянии без лишнего запроса
+    if CartItem.cart.is_cached(instance):
+        instance.cart.total_price = totals["total_price"]
+        instance.cart.total_items = totals["total_items"]
@@ -1,4 +1,8 @@
+from decimal import Decimal
+
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from cart.models import Cart, CartItem
 from cart.utils import merge_guest_cart_with_user_cart
@@ -110,3 +114,35 @@ class TestMergeCart:
         # Корзина должна остаться без изменений
         assert cart.cartitem_set.count() == 0
         assert cart.get_total_price() == 0
+
+    def test_merge_is_set_based_and_idempotent(self, create_book):
+        """Слияние выполняется фиксированным числом запросов и только один раз."""
+        user = User.objects.create_user(username="testuser", password="testpass")
+        books = [create_book(title=f"Book {i}", price=10.00) for i in range(30)]
+
+        guest_cart = Cart.objects.create(session_key="guest", is_active=True)
+        for book in books:
+            CartItem.objects.create(cart=guest_cart, book=book, quantity=2, price=7.50)
+        user_cart = Cart.objects.create(user=user, is_active=True)
+        CartItem.objects.create(cart=user_cart, book=books[0], quantity=1, price=10.00)
+
+        with CaptureQueriesContext(connection) as queries:
+            user_cart.merge_with(guest_cart)
+        assert len(queries.captured_queries) <= 8
+
+        assert user_cart.cartitem_set.count() == 30
+        first = user_cart.cartitem_set.get(book=books[0])
+        assert first.quantity == 3
+        assert first.price == Decimal("10.00")
+        # Новые позиции сохраняют цену из гостевой корзины
+        assert user_cart.cartitem_set.get(book=books[1]).price == Decimal("7.50")
+        assert user_cart.total_items == 61
+        assert user_cart.total_price == 3 * Decimal("10.00") + 29 * 2 * Decimal("7.50")
+
+        guest_cart.refresh_from_db()
+        assert not guest_cart.is_active
+
+        # Повторное слияние (например, параллельный логин) ничего не добавляет
+        user_cart.merge_with(guest_cart)
+        assert user_cart.cartitem_set.get(book=books[0]).quantity == 3
+        assert user_cart.total_items == 61
@@ -1,6 +1,7 @@
 from django.urls import reverse
 import pytest
 from cart.models import Cart, CartItem
+from cart.totals import deferred_cart_totals
 from store.models import Book
 from django.contrib.auth.models import User
 
@@ -47,3 +48,38 @@ class TestCartFunctionality:
 
         expected_items = sum(item.quantity for item in cart.cartitem_set.all())
         assert total_items == expected_items
+
+
+@pytest.mark.django_db
+class TestCartTotals:
+    def test_totals_stored_on_item_changes(self, create_cart_with_items):
+        cart = create_cart_with_items
+        cart.refresh_from_db()
+        assert cart.total_items == 6
+        assert cart.total_price == cart.get_total_price()
+
+        item = cart.cartitem_set.first()
+        item.quantity += 2
+        item.save()
+        item.delete()
+
+        cart.refresh_from_db()
+        assert cart.total_items == cart.get_total_items()
+        assert cart.total_price == cart.get_total_price()
+
+    def test_deferred_totals_recomputed_once(
+        self, create_cart, create_book, django_assert_max_num_queries
+    ):
+        cart = create_cart()
+        books = [create_book() for _ in range(5)]
+
+        with django_assert_max_num_queries(7):
+            with deferred_cart_totals():
+                for book in books:
+                    CartItem.objects.create(
+                        cart=cart, book=book, quantity=2, price=book.price
+                    )
+
+        cart.refresh_from_db()
+        assert cart.total_items == 10
+        assert cart.total_price == cart.get_total_price()
@@ -3,6 +3,7 @@ from django.urls import reverse
 from cart.models import Cart, CartItem
 from store.models import Book
 from django.contrib.auth.models import User
+from django.conf import settings
 
 
 @pytest.mark.django_db
@@ -43,3 +44,26 @@ class TestCartView:
         # Убеждаемся, что элемент удален
         assert not CartItem.objects.filter(pk=cart_item.pk).exists()
         assert CartItem.objects.count() == 2
+
+
+@pytest.mark.django_db
+class TestCartItemsCount:
+    def test_anonymous_page_view_creates_no_cart(self, client, create_three_books):
+        create_three_books()
+
+        response = client.get(reverse("home"))
+        client.get(reverse("cart"))
+
+        assert response.context["cart_items_count"] == 0
+        assert Cart.objects.count() == 0
+        assert settings.SESSION_COOKIE_NAME not in client.cookies
+
+    def test_count_read_from_cart_totals(self, client, create_book):
+        book = create_book()
+        client.post(reverse("add-to-cart", kwargs={"book_slug": book.slug}))
+        client.post(reverse("add-to-cart", kwargs={"book_slug": book.slug}))
+
+        response = client.get(reverse("cart"))
+
+        assert Cart.objects.count() == 1
+        assert response.context["cart_items_count"] == 2
@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_deferred_carts = ContextVar("deferred_cart_totals", default=None)
+
+
+def defer_cart_totals_for(cart_id):
+    """
+    Если пересчёт итогов отложен, запоминает корзину и возвращает True.
+    Вызывается сигналами позиций корзины.
+    """
+    deferred = _deferred_carts.get()
+    if deferred is None:
+        return False
+    deferred.add(cart_id)
+    return True
+
+
+@contextmanager
+def deferred_cart_totals():
+    """
+    Пакетные операции с позициями корзины: сигналы не пересчитывают итоги
+    на каждую позицию, пересчёт выполняется один раз на корзину при выходе.
+    """
+    if _deferred_carts.get() is not None:
+        yield
+        return
+
+    cart_ids = set()
+    token = _deferred_carts.set(cart_ids)
+    try:
+        yield
+    finally:
+        _deferred_carts.reset(token)
+        from .models import Cart
+
+        for cart_id in cart_ids:
+            Cart.update_totals_for(cart_id)
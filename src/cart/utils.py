@@ -31,6 +31,26 @@ def get_or_create_cart(request):
     return cart
 
 
+def get_cart_queryset(request):
+    """
+    Активная корзина пользователя или сессии без создания сессии и корзины.
+    Возвращает None, если корзины заведомо нет (гость без сессии).
+    """
+    if request.user.is_authenticated:
+        return Cart.objects.filter(user=request.user, is_active=True)
+
+    session_key = request.session.session_key
+    if not session_key:
+        return None
+    return Cart.objects.filter(session_key=session_key, is_active=True)
+
+
+def get_cart(request):
+    """Только чтение: существующая активная корзина или None."""
+    carts = get_cart_queryset(request)
+    return carts.first() if carts is not None else None
+
+
 def merge_guest_cart_with_user_cart(request, user):
     """
     Сливает гостевую корзину с корзиной пользователя при логине.
@@ -51,25 +71,22 @@ def merge_guest_cart_with_user_cart(request, user):
         user=user, is_active=True, defaults={"user": user}
     )
 
-    # Сливаем корзины
+    # Сливаем корзины; merge_with деактивирует гостевую корзину
     user_cart.merge_with(guest_cart)
 
-    # Деактивируем гостевую корзину
-    guest_cart.is_active = False
-    guest_cart.save()
-
     return user_cart
 
 
 def get_cart_items_count(request):
     """
     Возвращает количество товаров в корзине для отображения в шапке.
+    Никогда не создаёт сессию или корзину: читает денормализованный
+    Cart.total_items одним запросом, а гостя без сессии обслуживает без БД.
     """
-    try:
-        cart = get_or_create_cart(request)
-        return cart.get_total_items()
-    except:
+    carts = get_cart_queryset(request)
+    if carts is None:
         return 0
+    return carts.values_list("total_items", flat=True).first() or 0
 
 
 def add_to_cart(request, book_slug):
@@ -2,7 +2,7 @@ from django.shortcuts import get_object_or_404, redirect
 from django.views import View
 from django.views.generic import TemplateView
 
-from .utils import add_to_cart, get_or_create_cart
+from .utils import add_to_cart, get_cart
 from .models import CartItem
 
 
@@ -12,10 +12,17 @@ class CartView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        cart = get_or_create_cart(self.request)
+        # Просмотр корзины не создаёт её: корзина появляется при первом добавлении
+        cart = get_cart(self.request)
+        if cart is None:
+            context["cart_items"] = CartItem.objects.none()
+            context["total_price"] = 0
+            context["total_items"] = 0
+            return context
+
         context["cart_items"] = cart.cartitem_set.select_related("book").all()
-        context["total_price"] = cart.get_total_price()
-        context["total_items"] = cart.get_total_items()
+        context["total_price"] = cart.total_price
+        context["total_items"] = cart.total_items
 
         return context
 
@@ -28,7 +35,7 @@ class AddToCartView(View):
 
 class RemoveFromCartView(View):
     def post(self, request, book_slug):
-        cart = get_or_create_cart(request)
+        cart = get_cart(request)
         cart_item = get_object_or_404(CartItem, cart=cart, book__slug=book_slug)
         cart_item.delete()
         return redirect("cart")
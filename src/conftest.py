@@ -1,4 +1,5 @@
 import pytest
+from unittest.mock import patch
 
 from django.test import Client
 from django.contrib.auth.models import User
@@ -37,6 +38,13 @@ def celery_run_eager(settings):
     settings.CELERY_TASK_EAGER_PROPAGATES = True
 
 
+@pytest.fixture
+def skip_index_flush():
+    """Очередь индексации не отправляется в Elasticsearch: в тестах его нет"""
+    with patch("store.indexing.flush_index_queue", return_value=0) as flush:
+        yield flush
+
+
 @pytest.fixture(autouse=True)
 def disable_axes_for_tests(settings):
     """Используется только ModelBackend для тестов, чтобы исключить влияние каптчи"""
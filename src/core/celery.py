@@ -10,6 +10,38 @@ app.conf.beat_schedule = {
         "task": "cart.tasks.delete_old_anonymous_carts",
         "schedule": crontab(hour=0, minute=0),  # Ежедневно в полночь
     },
+    "delete-old-newsletter-deliveries-everyday": {
+        "task": "store.tasks.delete_old_newsletter_deliveries",
+        "schedule": crontab(hour=0, minute=15),
+    },
+    "send-new-books-digest-every-30-minutes": {
+        "task": "store.tasks.send_new_books_digest_task",
+        "schedule": crontab(minute="*/30"),  # Один дайджест на окно в 30 минут
+    },
+    "sync-search-index-every-minute": {
+        "task": "store.tasks.sync_search_index_task",
+        "schedule": crontab(),  # Страховка, если отложенный сброс очереди потерян
+    },
+    "reconcile-search-index-every-15-minutes": {
+        "task": "store.tasks.reconcile_search_index_task",
+        "schedule": crontab(minute="*/15"),
+    },
+    "sweep-search-index-orphans-nightly": {
+        "task": "store.tasks.reconcile_search_index_task",
+        "schedule": crontab(hour=4, minute=5),  # Полный просмотр индекса
+        "kwargs": {"sweep_orphans": True},
+    },
+    "refresh-book-rankings-every-10-minutes": {
+        "task": "store.tasks.refresh_book_rankings_task",
+        "schedule": crontab(minute="*/10"),
+    },
+    "rebuild-book-rankings-nightly": {
+        "task": "store.tasks.refresh_book_rankings_task",
+        "schedule": crontab(
+            hour=3, minute=30
+        ),  # Учитывает удалённые отзывы и избранное
+        "kwargs": {"full": True},
+    },
 }
 
 
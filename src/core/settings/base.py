@@ -13,6 +13,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # external apps
     "phonenumber_field",
     # "debug_toolbar",
@@ -127,6 +128,8 @@ REST_FRAMEWORK = {
         "anon": "60/min",
         # Авторизованные: не более 120 запросов в минуту
         "user": "120/min",
+        # Автодополнение вызывается на каждое нажатие клавиши
+        "autocomplete": "600/min",
     },
 }
 
@@ -210,3 +213,15 @@ ELASTICSEARCH_DSL = {
         "hosts": os.getenv("ELASTICSEARCH_URL", "http://localhost:9200"),
     },
 }
+# Изменения книг копятся в очереди и уходят в ES пакетами из Celery
+ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = "store.indexing.QueuedSignalProcessor"
+
+# Поиск: жёсткий дедлайн на запрос к Elasticsearch (секунды) и circuit breaker,
+# который после серии ошибок отправляет поиск в БД на время охлаждения
+SEARCH_ES_TIMEOUT = float(os.getenv("SEARCH_ES_TIMEOUT", "0.5"))
+SEARCH_ES_FAILURE_THRESHOLD = 5
+SEARCH_ES_COOLDOWN = 30
+
+# Поиск в БД, когда Elasticsearch недоступен: полнотекстовый индекс и триграммы
+# PostgreSQL или простой icontains (store.search_backends.IContainsSearchBackend)
+SEARCH_DB_BACKEND = "store.search_backends.PostgresSearchBackend"
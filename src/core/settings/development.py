@@ -55,9 +55,7 @@ AUTHENTICATION_BACKENDS = [
 
 # Настройки для индексации
 ELASTICSEARCH_DSL_AUTOSYNC = True
-ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = (
-    "django_elasticsearch_dsl.signals.RealTimeSignalProcessor"
-)
+ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = "store.indexing.QueuedSignalProcessor"
 
 CSRF_COOKIE_SECURE = False
 SESSION_COOKIE_SECURE = False
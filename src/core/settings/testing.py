@@ -13,6 +13,9 @@ DATABASES = {
     }
 }
 
+# SQLite не поддерживает tsvector и pg_trgm
+SEARCH_DB_BACKEND = "store.search_backends.IContainsSearchBackend"
+
 # Disable axes in tests
 AXES_ENABLED = False
 AUTHENTICATION_BACKENDS = ["django.contrib.auth.backends.ModelBackend"]
@@ -34,4 +37,5 @@ CACHES = {
 REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"] = {
     "anon": "1000/min",
     "user": "2000/min",
+    "autocomplete": "5000/min",
 }
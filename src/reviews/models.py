@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
 
@@ -28,3 +28,12 @@ class Review(models.Model):
 
     def __str__(self) -> str:
         return f"{self.user} → {self.book} ({self.rating})"
+
+    # Отзыв и агрегаты рейтинга книги (сигналы) фиксируются одной транзакцией
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
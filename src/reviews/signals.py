@@ -0,0 +1,66 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from store.cache import (
+    CATALOG_NAMESPACE,
+    HOME_BOOKS_NAMESPACE,
+    bump_cache_version_on_commit,
+)
+from store.indexing import enqueue_books
+from store.models import Book
+
+from .models import Review
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    """Запоминаем прежние книгу и оценку, чтобы post_save применил разницу."""
+    instance._previous_rating = None
+    if raw or instance.pk is None:
+        return
+    # Блокировка строки: параллельное изменение того же отзыва ждёт,
+    # иначе обе транзакции применили бы разницу от одной прежней оценки
+    instance._previous_rating = (
+        Review.objects.select_for_update()
+        .filter(pk=instance.pk)
+        .values_list("book_id", "rating")
+        .first()
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_book_rating_on_save(sender, instance, raw=False, **kwargs):
+    """Инкрементально обновляет агрегаты рейтинга книги."""
+    if raw:
+        return
+
+    bump_cache_version_on_commit(CATALOG_NAMESPACE, HOME_BOOKS_NAMESPACE)
+    previous = getattr(instance, "_previous_rating", None)
+    rating = int(instance.rating)
+
+    if previous is None:
+        Book.objects.apply_rating_delta(instance.book_id, rating, 1, {rating: 1})
+        # Рейтинг хранится в поисковом документе книги
+        enqueue_books([instance.book_id])
+        return
+
+    old_book_id, old_rating = previous
+    if old_book_id != instance.book_id:
+        # Отзыв перенесён на другую книгу
+        Book.objects.apply_rating_delta(old_book_id, -old_rating, -1, {old_rating: -1})
+        Book.objects.apply_rating_delta(instance.book_id, rating, 1, {rating: 1})
+        enqueue_books([old_book_id, instance.book_id])
+    elif old_rating != rating:
+        Book.objects.apply_rating_delta(
+            instance.book_id, rating - old_rating, 0, {old_rating: -1, rating: 1}
+        )
+        enqueue_books([instance.book_id])
+
+
+@receiver(post_delete, sender=Review)
+def update_book_rating_on_delete(sender, instance, **kwargs):
+    """Вычитает удалённый отзыв из агрегатов рейтинга книги."""
+    bump_cache_version_on_commit(CATALOG_NAMESPACE, HOME_BOOKS_NAMESPACE)
+    rating = int(instance.rating)
+    Book.objects.apply_rating_delta(instance.book_id, -rating, -1, {rating: -1})
+    enqueue_books([instance.book_id])
@@ -1,5 +1,10 @@
+from io import StringIO
+from unittest.mock import patch
+
 import pytest
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from store.models import Book, Genre
 from reviews.models import Review
@@ -15,3 +20,149 @@ def test_review_unique_per_user_book():
     Review.objects.create(book=book, user=user, rating=5)
     with pytest.raises(Exception):
         Review.objects.create(book=book, user=user, rating=4)
+
+
+@pytest.mark.django_db
+class TestBookRatingAggregates:
+    def test_review_create_update_delete_updates_book(self, create_book):
+        user1 = User.objects.create_user(username="r1", password="p")
+        user2 = User.objects.create_user(username="r2", password="p")
+        book = create_book()
+
+        review = Review.objects.create(book=book, user=user1, rating=5)
+        Review.objects.create(book=book, user=user2, rating=2)
+        book.refresh_from_db()
+        assert (book.rating_sum, book.rating_count) == (7, 2)
+        assert book.average_rating == pytest.approx(3.5)
+        assert book.get_rating_histogram() == {5: 1, 4: 0, 3: 0, 2: 1, 1: 0}
+
+        review.rating = 3
+        review.save()
+        book.refresh_from_db()
+        assert (book.rating_sum, book.rating_count) == (5, 2)
+        assert book.get_average_rating() == pytest.approx(2.5)
+        assert book.get_rating_histogram() == {5: 0, 4: 0, 3: 1, 2: 1, 1: 0}
+
+        Review.objects.filter(book=book).delete()
+        book.refresh_from_db()
+        assert (book.rating_sum, book.rating_count) == (0, 0)
+        assert book.average_rating is None
+        assert book.get_average_rating() is None
+        assert set(book.get_rating_histogram().values()) == {0}
+
+    def test_review_moved_to_other_book_moves_histogram(self, create_book):
+        user = User.objects.create_user(username="r5", password="p")
+        first = create_book(slug="first")
+        second = create_book(slug="second")
+        review = Review.objects.create(book=first, user=user, rating=4)
+
+        review.book = second
+        review.save()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert first.rating_4_count == 0
+        assert second.rating_4_count == 1
+
+    def test_book_save_does_not_overwrite_aggregates(self, create_book):
+        user = User.objects.create_user(username="r3", password="p")
+        book = create_book()
+        stale = Book.objects.get(pk=book.pk)
+
+        Review.objects.create(book=book, user=user, rating=4)
+        stale.title = "Renamed"
+        stale.save()
+
+        book.refresh_from_db()
+        assert book.title == "Renamed"
+        assert (book.rating_sum, book.rating_count) == (4, 1)
+
+    def test_rebuild_book_ratings_command_repairs_drift(self, create_book):
+        from django.core.management import call_command
+
+        user = User.objects.create_user(username="r4", password="p")
+        book = create_book()
+        Review.objects.create(book=book, user=user, rating=4)
+        Book.objects.filter(pk=book.pk).update(
+            rating_sum=100, rating_count=7, average_rating=1.0, rating_1_count=7
+        )
+
+        call_command("rebuild_book_ratings", stdout=StringIO())
+
+        book.refresh_from_db()
+        assert (book.rating_sum, book.rating_count) == (4, 1)
+        assert book.average_rating == pytest.approx(4.0)
+        assert book.get_rating_histogram() == {5: 0, 4: 1, 3: 0, 2: 0, 1: 0}
+
+    def test_verify_rating_histograms_command_repairs_drift(self, create_book):
+        from django.core.management import call_command
+
+        user = User.objects.create_user(username="r6", password="p")
+        book = create_book(slug="drifted")
+        intact = create_book(slug="intact")
+        Review.objects.create(book=book, user=user, rating=5)
+        Review.objects.create(book=intact, user=user, rating=3)
+        Book.objects.filter(pk=book.pk).update(
+            rating_5_count=0, rating_2_count=4, rating_count=4
+        )
+
+        out = StringIO()
+        call_command("verify_rating_histograms", "--dry-run", stdout=out)
+        assert f"[{book.pk}]" in out.getvalue()
+        assert Book.objects.get(pk=book.pk).rating_2_count == 4
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command("verify_rating_histograms", stdout=StringIO())
+        selects = [
+            q["sql"]
+            for q in queries.captured_queries
+            if q["sql"].startswith("SELECT") and "reviews_review" in q["sql"]
+        ]
+        assert len(selects) == 1
+        assert "GROUP BY" in selects[0]
+        # Исправляются только найденные книги
+        updates = [
+            q["sql"]
+            for q in queries.captured_queries
+            if q["sql"].startswith('UPDATE "store_book"')
+        ]
+        assert updates
+        assert all(f"IN ({book.pk})" in sql for sql in updates)
+
+        book.refresh_from_db()
+        assert book.get_rating_histogram() == {5: 1, 4: 0, 3: 0, 2: 0, 1: 0}
+        assert (book.rating_sum, book.rating_count) == (5, 1)
+        assert book.average_rating == pytest.approx(5.0)
+
+        out = StringIO()
+        call_command("verify_rating_histograms", stdout=out)
+        assert "Расхождений нет" in out.getvalue()
+
+    def test_verify_rating_histograms_keeps_review_added_during_check(
+        self, create_book
+    ):
+        from django.core.management import call_command
+
+        from store.management.commands import verify_rating_histograms
+
+        first = User.objects.create_user(username="r7", password="p")
+        late = User.objects.create_user(username="r8", password="p")
+        book = create_book(slug="busy")
+        Review.objects.create(book=book, user=first, rating=5)
+        Book.objects.filter(pk=book.pk).update(rating_count=9)
+        check = verify_rating_histograms.review_histograms
+
+        def check_then_review():
+            histograms = check()
+            # Отзыв приходит между сверкой и исправлением
+            Review.objects.create(book=book, user=late, rating=1)
+            return histograms
+
+        with patch.object(
+            verify_rating_histograms, "review_histograms", check_then_review
+        ):
+            call_command("verify_rating_histograms", stdout=StringIO())
+
+        book.refresh_from_db()
+        assert book.get_rating_histogram() == {5: 1, 4: 0, 3: 0, 2: 0, 1: 1}
+        assert (book.rating_sum, book.rating_count) == (6, 2)
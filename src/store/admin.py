@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Book, Genre, Quote, Subscription
+from .models import Book, Genre, NewBooksDigest, Quote, Subscription
 
 
 @admin.register(Book)
@@ -35,3 +35,17 @@ class QuoteAdmin(admin.ModelAdmin):
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ("email", "date_subscribed", "is_active", "last_sent")
+
+
+@admin.register(NewBooksDigest)
+class NewBooksDigestAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "window_start",
+        "created_at",
+        "books_count",
+        "recipients_count",
+        "queued_at",
+    )
+    readonly_fields = ("created_at",)
+    filter_vertical = ("books",)
@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+
+from .cache import CATALOG_NAMESPACE, HOME_BOOKS_NAMESPACE, bump_cache_version
+
+_current_batch = ContextVar("catalog_batch", default=None)
+
+
+class CatalogBatch:
+    """
+    Накопитель изменений каталога.
+    Внутри пакета сигналы книг не выполняют побочных эффектов по одной записи,
+    а только запоминают id; при выходе всё выполняется один раз на пакет.
+    """
+
+    def __init__(self):
+        self.created_ids = set()
+        self.changed_ids = set()
+
+    def record(self, book_id, created=False):
+        if book_id is None:
+            return
+        self.changed_ids.add(book_id)
+        if created:
+            self.created_ids.add(book_id)
+
+    def record_many(self, book_ids, created=False):
+        for book_id in book_ids:
+            self.record(book_id, created=created)
+
+    def flush(self):
+        """Одна инвалидация кэша, постановка книг в очередь индексации
+        и новых книг в очередь дайджеста — по одному запросу на пакет."""
+        from .indexing import enqueue_books
+        from .models import Book, PendingBookNotification
+        from .utils import invalidate_random_pick
+
+        if not self.changed_ids:
+            return
+
+        bump_cache_version(CATALOG_NAMESPACE)
+        bump_cache_version(HOME_BOOKS_NAMESPACE)
+        invalidate_random_pick(Book)
+
+        enqueue_books(self.changed_ids)
+
+        if self.created_ids:
+            PendingBookNotification.objects.bulk_create(
+                [PendingBookNotification(book_id=pk) for pk in self.created_ids],
+                ignore_conflicts=True,
+            )
+
+
+def get_current_batch():
+    """Активный пакет каталога или None."""
+    return _current_batch.get()
+
+
+@contextmanager
+def catalog_batch():
+    """
+    Контекст пакетной записи каталога. Вложенные вызовы используют внешний пакет.
+    Побочные эффекты выполняются после коммита внешней транзакции (если она есть).
+    """
+    current = _current_batch.get()
+    if current is not None:
+        yield current
+        return
+
+    batch = CatalogBatch()
+    token = _current_batch.set(batch)
+    try:
+        yield batch
+    finally:
+        _current_batch.reset(token)
+        transaction.on_commit(batch.flush)
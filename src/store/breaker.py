@@ -0,0 +1,104 @@
+import time
+
+from django.core.cache import cache
+
+from .metrics import aincr_counter, incr_counter
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker с состоянием в общем кэше.
+
+    После threshold ошибок подряд цепь размыкается на cooldown секунд:
+    вызовы сразу идут в фоллбек. По истечении охлаждения цепь полуоткрыта:
+    проходит один пробный запрос (ключ пробы занимается через cache.add),
+    остальные по-прежнему идут в фоллбек. Успех пробы замыкает цепь,
+    ошибка сразу размыкает её снова. Если проба не завершилась за
+    probe_timeout секунд, пропускается следующая.
+    У каждого метода есть async-вариант для асинхронных представлений.
+    """
+
+    def __init__(self, name, threshold, cooldown, probe_timeout=None):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout or cooldown
+        self.failures_key = f"breaker:{name}:failures"
+        self.open_until_key = f"breaker:{name}:open_until"
+        self.tripped_key = f"breaker:{name}:tripped"
+        self.probe_key = f"breaker:{name}:probe"
+
+    def is_open(self):
+        open_until = cache.get(self.open_until_key)
+        return open_until is not None and open_until > time.time()
+
+    async def ais_open(self):
+        open_until = await cache.aget(self.open_until_key)
+        return open_until is not None and open_until > time.time()
+
+    def allow_request(self):
+        """Можно ли обратиться к сервису; в полуоткрытом состоянии — только пробе."""
+        open_until = cache.get(self.open_until_key)
+        if open_until is None:
+            return True
+        if open_until > time.time():
+            return False
+        return cache.add(self.probe_key, 1, self.probe_timeout)
+
+    async def aallow_request(self):
+        open_until = await cache.aget(self.open_until_key)
+        if open_until is None:
+            return True
+        if open_until > time.time():
+            return False
+        return await cache.aadd(self.probe_key, 1, self.probe_timeout)
+
+    def record_success(self):
+        cache.delete_many(self._closed_keys())
+
+    async def arecord_success(self):
+        await cache.adelete_many(self._closed_keys())
+
+    def record_failure(self):
+        cache.add(self.failures_key, 0, self.cooldown)
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:
+            failures = 1
+        if failures >= self.threshold or cache.get(self.tripped_key):
+            self.open()
+
+    async def arecord_failure(self):
+        await cache.aadd(self.failures_key, 0, self.cooldown)
+        try:
+            failures = await cache.aincr(self.failures_key)
+        except ValueError:
+            failures = 1
+        if failures >= self.threshold or await cache.aget(self.tripped_key):
+            await self.aopen()
+
+    def open(self):
+        cache.set_many(self._open_state(), self.cooldown * 10)
+        cache.delete_many([self.failures_key, self.probe_key])
+        incr_counter("breaker_opened_total", breaker=self.name)
+
+    async def aopen(self):
+        await cache.aset_many(self._open_state(), self.cooldown * 10)
+        await cache.adelete_many([self.failures_key, self.probe_key])
+        await aincr_counter("breaker_opened_total", breaker=self.name)
+
+    def _closed_keys(self):
+        return [
+            self.failures_key,
+            self.tripped_key,
+            self.open_until_key,
+            self.probe_key,
+        ]
+
+    def _open_state(self):
+        # open_until хранится дольше охлаждения: по нему и флагу tripped
+        # пробный запрос после охлаждения при ошибке снова размыкает цепь
+        return {
+            self.open_until_key: time.time() + self.cooldown,
+            self.tripped_key: True,
+        }
@@ -0,0 +1,103 @@
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.views.decorators.cache import cache_page
+
+# Данные каталога: поиск, список книг, ответы API
+CATALOG_NAMESPACE = "catalog"
+
+# Материализованные рейтинги книг: меняются пересчётом по расписанию
+RANKINGS_NAMESPACE = "rankings"
+
+# Пространства имён версионируемого кэша главной страницы
+HOME_BOOKS_NAMESPACE = "home:books"
+HOME_QUOTE_NAMESPACE = "home:quote"
+
+
+def _version_key(namespace):
+    return f"{namespace}:version"
+
+
+def get_cache_version(namespace):
+    """
+    Текущая версия пространства имён кэша.
+    Ключ версии не истекает; если его вытеснили, начинаем с метки времени,
+    чтобы не совпасть со старыми версиями.
+    """
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def _modified_key(namespace):
+    return f"{namespace}:modified"
+
+
+def get_cache_modified(namespace):
+    """Время последней инвалидации пространства имён (для Last-Modified)."""
+    key = _modified_key(namespace)
+    modified = cache.get(key)
+    if modified is None:
+        cache.add(key, time.time(), None)
+        modified = cache.get(key)
+    return modified
+
+
+def bump_cache_version(namespace):
+    """Инвалидирует все ключи пространства имён одним INCR."""
+    cache.set(_modified_key(namespace), time.time(), None)
+    key = _version_key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Ключа версии нет — старые записи всё равно недостижимы
+        return get_cache_version(namespace)
+
+
+def bump_cache_version_on_commit(*namespaces):
+    """
+    Инвалидирует пространства имён после коммита текущей транзакции.
+    Версия, поднятая до коммита, позволила бы параллельному читателю
+    закэшировать старые данные уже под новой версией.
+    """
+
+    def _bump():
+        for namespace in namespaces:
+            bump_cache_version(namespace)
+
+    transaction.on_commit(_bump)
+
+
+def versioned_key(namespace, *parts, version=None):
+    """
+    Строит ключ вида '<namespace>:v<version>:<part>:...'.
+    version передаётся, если она уже прочитана в начале запроса.
+    """
+    if version is None:
+        version = get_cache_version(namespace)
+    suffix = ":".join(str(part) for part in parts)
+    return f"{namespace}:v{version}:{suffix}"
+
+
+def catalog_cache_page(timeout):
+    """
+    Аналог cache_page, у которого префикс ключа содержит версию каталога.
+    После bump_cache_version(CATALOG_NAMESPACE) старые страницы становятся
+    недостижимыми и истекают сами по TTL.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            key_prefix = versioned_key(CATALOG_NAMESPACE, "page")
+            cached_view = cache_page(timeout, key_prefix=key_prefix)(view_func)
+            return cached_view(request, *args, **kwargs)
+
+        return _wrapped_view
+
+    return decorator
@@ -1,14 +1,92 @@
 from django_elasticsearch_dsl import Document, fields
 from django_elasticsearch_dsl.registries import registry
+from elasticsearch_dsl import analyzer, token_filter
+
 from .models import Book
 
+# Edge n-gram на этапе индексации: "пушкин" -> "пу", "пуш", ... "пушкин".
+# При поиске префикс не режется, поэтому запрос — обычный term-поиск без wildcard
+autocomplete_filter = token_filter(
+    "autocomplete_filter", type="edge_ngram", min_gram=2, max_gram=20
+)
+autocomplete_analyzer = analyzer(
+    "autocomplete",
+    tokenizer="standard",
+    filter=["lowercase", "asciifolding", autocomplete_filter],
+)
+autocomplete_search_analyzer = analyzer(
+    "autocomplete_search", tokenizer="standard", filter=["lowercase", "asciifolding"]
+)
+
+
+def autocomplete_text_field():
+    return fields.TextField(
+        fields={
+            "autocomplete": fields.TextField(
+                analyzer=autocomplete_analyzer,
+                search_analyzer=autocomplete_search_analyzer,
+            ),
+            # Для сортировки
+            "raw": fields.KeywordField(),
+        }
+    )
+
+
+def money_field():
+    return fields.ScaledFloatField(scaling_factor=100)
+
 
 @registry.register_document
 class BookDocument(Document):
+    title = autocomplete_text_field()
+    author = autocomplete_text_field()
+
+    # Всё, что нужно для выдачи и фильтров каталога, хранится в документе,
+    # чтобы поиск отвечал без обращения к БД
+    genres = fields.TextField(multi=True, fields={"raw": fields.KeywordField()})
+    price = money_field()
+    discounted_price = money_field()
+    final_price = money_field()
+    discount_percentage = fields.FloatField()
+    in_stock = fields.BooleanField()
+    # Путь к файлу обложки, URL строится хранилищем при отображении
+    photo = fields.KeywordField(index=False)
+
     class Index:
         name = "books"
         settings = {"number_of_shards": 1, "number_of_replicas": 0}
 
     class Django:
         model = Book
-        fields = ["title", "author", "description", "isbn", "slug"]
+        fields = [
+            "id",
+            "description",
+            "isbn",
+            "slug",
+            "is_published",
+            "time_create",
+            "time_update",
+            "pages",
+            "publication_year",
+            "stock_quantity",
+            "average_rating",
+            "rating_count",
+        ]
+
+    def get_queryset(self):
+        return super().get_queryset().prefetch_related("genre")
+
+    def prepare_genres(self, instance):
+        return [genre.name for genre in instance.genre.all()]
+
+    def prepare_final_price(self, instance):
+        return instance.get_final_price()
+
+    def prepare_discount_percentage(self, instance):
+        return float(instance.get_discount_percentage())
+
+    def prepare_in_stock(self, instance):
+        return instance.is_in_stock()
+
+    def prepare_photo(self, instance):
+        return instance.photo.name or None
@@ -0,0 +1,248 @@
+import csv
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .batch import catalog_batch
+from .models import Book, Genre
+from .utils import invalidate_genre_index
+
+# Поля книги, которые можно передать в файле импорта
+IMPORT_FIELDS = (
+    "title",
+    "description",
+    "author",
+    "price",
+    "discounted_price",
+    "isbn",
+    "pages",
+    "publication_year",
+    "stock_quantity",
+    "is_published",
+)
+
+
+GENRE_SEPARATOR = ";"
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    errors: list = field(default_factory=list)
+
+    @property
+    def processed(self):
+        return self.created + self.updated
+
+
+def read_rows(stream, fmt):
+    """Потоково читает строки CSV или JSONL, возвращая (номер строки, dict)."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield line_no, exc
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def check_discount(price, discounted_price):
+    """То же условие, что и CheckConstraint discounted_lt_price_or_null."""
+    if discounted_price is not None and discounted_price >= price:
+        raise ValidationError(
+            {"discounted_price": "Скидочная цена должна быть меньше цены"}
+        )
+
+
+def parse_genres(value):
+    """Список названий жанров из строки 'A; B' или из JSON-массива."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(GENRE_SEPARATOR)
+    return [name.strip() for name in value if name and name.strip()]
+
+
+class BookImporter:
+    """
+    Пакетный импорт книг: валидация по правилам модели, bulk_create/bulk_update
+    порциями и один набор побочных эффектов на весь импорт (см. catalog_batch).
+    Существующие книги сопоставляются по slug.
+    """
+
+    def __init__(self, chunk_size=500, update_existing=True):
+        self.chunk_size = chunk_size
+        self.update_existing = update_existing
+
+    def run(self, rows):
+        result = ImportResult()
+        rows = iter(rows)
+
+        with catalog_batch() as batch:
+            while chunk := list(islice(rows, self.chunk_size)):
+                self.import_chunk(chunk, batch, result)
+
+        return result
+
+    def build_book(self, row):
+        """
+        Создаёт несохранённую книгу и проверяет её так же, как Book.full_clean().
+        Возвращает книгу и поля, которые заданы в строке: у существующей книги
+        обновляются только они, остальные колонки не сбрасываются к умолчаниям.
+        Пустая ячейка не то же самое, что отсутствующая колонка: она очищает
+        необязательное поле (например, снимает скидку).
+        """
+        if not isinstance(row, dict):
+            raise ValidationError(str(row))
+
+        values = {}
+        for name in IMPORT_FIELDS:
+            if name not in row:
+                continue
+            value = row[name]
+            if value in ("", None):
+                # Обязательное поле пустой ячейкой не очищается
+                if not Book._meta.get_field(name).null:
+                    continue
+                value = None
+            values[name] = value
+        book = Book(**values)
+        book.slug = slugify(book.title or "")
+
+        # Уникальность проверяем одним запросом на порцию, а не на каждую строку
+        book.full_clean(validate_unique=False, validate_constraints=False)
+
+        if not book.slug:
+            raise ValidationError({"slug": "Не удалось построить slug из заголовка"})
+        check_discount(book.price, book.discounted_price)
+
+        # Нормализация денежных значений, как в Book.save()
+        book.price = Decimal(book.price).quantize(Decimal("0.01"))
+        if book.discounted_price is not None:
+            book.discounted_price = Decimal(book.discounted_price).quantize(
+                Decimal("0.01")
+            )
+        return book, frozenset(values)
+
+    def import_chunk(self, chunk, batch, result):
+        books_by_slug = {}
+        fields_by_slug = {}
+        lines_by_slug = {}
+        genres_by_slug = {}
+
+        for line_no, row in chunk:
+            try:
+                book, fields = self.build_book(row)
+            except ValidationError as exc:
+                result.errors.append((line_no, exc.messages))
+                continue
+            # Повтор slug внутри порции — побеждает последняя строка
+            books_by_slug[book.slug] = book
+            fields_by_slug[book.slug] = fields
+            lines_by_slug[book.slug] = line_no
+            genres = parse_genres(row.get("genres"))
+            if genres is not None:
+                genres_by_slug[book.slug] = genres
+
+        if not books_by_slug:
+            return
+
+        with transaction.atomic():
+            existing = {
+                slug: (pk, price, discounted_price)
+                for slug, pk, price, discounted_price in Book.objects.filter(
+                    slug__in=books_by_slug
+                ).values_list("slug", "pk", "price", "discounted_price")
+            }
+            to_create, to_update = [], []
+            # Обновления группируются по набору полей из строки: один bulk_update на набор
+            updates_by_fields = defaultdict(list)
+            now = timezone.now()
+
+            for slug, book in books_by_slug.items():
+                if slug not in existing:
+                    to_create.append(book)
+                elif self.update_existing:
+                    pk, price, discounted_price = existing[slug]
+                    fields = fields_by_slug[slug]
+                    # Скидку проверяем по итоговой строке: сохранённые значения
+                    # с полями из файла, иначе CheckConstraint прервёт всю порцию
+                    try:
+                        check_discount(
+                            book.price if "price" in fields else price,
+                            (
+                                book.discounted_price
+                                if "discounted_price" in fields
+                                else discounted_price
+                            ),
+                        )
+                    except ValidationError as exc:
+                        result.errors.append((lines_by_slug[slug], exc.messages))
+                        genres_by_slug.pop(slug, None)
+                        continue
+                    book.pk = pk
+                    book.time_update = now
+                    book._state.adding = False
+                    to_update.append(book)
+                    updates_by_fields[fields].append(book)
+                else:
+                    genres_by_slug.pop(slug, None)
+
+            Book.objects.bulk_create(to_create)
+            for fields, books in updates_by_fields.items():
+                update_fields = [name for name in IMPORT_FIELDS if name in fields]
+                Book.objects.bulk_update(books, [*update_fields, "time_update"])
+
+            books = to_create + to_update
+            self.assign_genres(
+                {
+                    book.pk: genres_by_slug[book.slug]
+                    for book in books
+                    if book.slug in genres_by_slug
+                }
+            )
+
+        batch.record_many((book.pk for book in to_create), created=True)
+        batch.record_many(book.pk for book in to_update)
+        result.created += len(to_create)
+        result.updated += len(to_update)
+
+    def assign_genres(self, genres_by_book):
+        """Заменяет жанры книг: недостающие жанры создаются одним запросом."""
+        if not genres_by_book:
+            return
+
+        names = {name for names in genres_by_book.values() for name in names}
+        Genre.objects.bulk_create(
+            [Genre(name=name) for name in names], ignore_conflicts=True
+        )
+        # bulk_create не отправляет сигналы Genre
+        invalidate_genre_index()
+        genre_ids = dict(Genre.objects.filter(name__in=names).values_list("name", "pk"))
+
+        through = Book.genre.through
+        through.objects.filter(book_id__in=genres_by_book).delete()
+        through.objects.bulk_create(
+            [
+                through(book_id=book_id, genre_id=genre_ids[name])
+                for book_id, names in genres_by_book.items()
+                for name in set(names)
+            ],
+            ignore_conflicts=True,
+        )
@@ -0,0 +1,362 @@
+import time
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_elasticsearch_dsl.apps import DEDConfig
+from django_elasticsearch_dsl.signals import BaseSignalProcessor
+
+from .batch import get_current_batch
+from .cache import CATALOG_NAMESPACE, bump_cache_version
+from .models import Book, Genre, PendingBookIndex
+
+# Сколько книг отправляется в одном bulk-запросе
+INDEX_FLUSH_BATCH_SIZE = 500
+# Задержка сброса очереди: изменения за это окно уходят одним bulk-запросом
+INDEX_FLUSH_DELAY = 5
+INDEX_FLUSH_SCHEDULED_KEY = "search-index:flush-scheduled"
+
+# Сверка индекса с БД по time_update
+RECONCILE_WATERMARK_KEY = "search-index:watermark"
+RECONCILE_CHUNK_SIZE = 500
+
+
+# Параметры индекса на время полной загрузки
+REINDEX_LOAD_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+
+
+@dataclass
+class ReindexResult:
+    index_name: str
+    indexed: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    old_indices: list = field(default_factory=list)
+
+    @property
+    def docs_per_second(self):
+        return self.indexed / self.seconds if self.seconds else 0.0
+
+
+class IndexSyncError(Exception):
+    """Elasticsearch отклонил часть операций bulk-запроса."""
+
+
+def schedule_index_flush():
+    """Ставит одну отложенную задачу сброса очереди на окно INDEX_FLUSH_DELAY."""
+    from .tasks import sync_search_index_task
+
+    def _schedule():
+        if cache.add(INDEX_FLUSH_SCHEDULED_KEY, 1, INDEX_FLUSH_DELAY):
+            sync_search_index_task.apply_async(countdown=INDEX_FLUSH_DELAY)
+
+    transaction.on_commit(_schedule)
+
+
+def enqueue_books(book_ids):
+    """Записывает книги в очередь индексации в той же транзакции, что и изменение."""
+    book_ids = {book_id for book_id in book_ids if book_id is not None}
+    if not book_ids or not DEDConfig.autosync_enabled():
+        return
+
+    PendingBookIndex.objects.bulk_create(
+        [PendingBookIndex(book_id=book_id) for book_id in book_ids]
+    )
+    schedule_index_flush()
+
+
+def flush_index_queue(limit=INDEX_FLUSH_BATCH_SIZE):
+    """
+    Забирает порцию очереди и синхронизирует её одним bulk-запросом:
+    существующие книги индексируются, отсутствующие в БД — удаляются из индекса.
+    Строки очереди удаляются только после успешного bulk; при ошибке
+    транзакция откатывается и порция остаётся в очереди для повтора.
+    Возвращает количество обработанных книг.
+    """
+    from elasticsearch.helpers import bulk
+
+    from .documents import BookDocument
+
+    with transaction.atomic():
+        rows = list(
+            PendingBookIndex.objects.select_for_update(skip_locked=True)
+            .order_by("pk")
+            .values_list("pk", "book_id")[:limit]
+        )
+        if not rows:
+            return 0
+
+        book_ids = {book_id for _, book_id in rows}
+        document = BookDocument()
+        books = list(document.get_queryset().filter(pk__in=book_ids))
+        deleted_ids = book_ids - {book.pk for book in books}
+
+        actions = [document._prepare_action(book, "index") for book in books]
+        actions += [
+            {"_op_type": "delete", "_index": document._index._name, "_id": book_id}
+            for book_id in deleted_ids
+        ]
+        _, errors = bulk(
+            document._get_connection(), actions, raise_on_error=False, stats_only=False
+        )
+        # Документа удалённой книги может уже не быть в индексе
+        errors = [
+            error for error in errors if error.get("delete", {}).get("status") != 404
+        ]
+        if errors:
+            raise IndexSyncError(f"{len(errors)} bulk operations failed: {errors[:3]}")
+
+        PendingBookIndex.objects.filter(pk__in=[pk for pk, _ in rows]).delete()
+
+    # Ответы API, построенные по индексу до синхронизации, устарели
+    bump_cache_version(CATALOG_NAMESPACE)
+    return len(book_ids)
+
+
+def reconcile_index(sweep_orphans=False):
+    """
+    Сверяет индекс с БД по водяному знаку time_update: книги, изменённые
+    после прошлой сверки, которых нет в индексе или чей документ старее
+    строки в БД, ставятся в очередь. Документы книг, которых больше нет в БД,
+    тоже ставятся в очередь (на удаление). Возвращает количество книг в очереди.
+
+    Полный просмотр индекса в поисках таких документов стоит пропорционально
+    размеру каталога, поэтому частая сверка запускает его, только если
+    документов больше, чем книг; sweep_orphans=True (ночной запуск)
+    просматривает индекс всегда.
+    """
+    from .documents import BookDocument
+
+    document = BookDocument()
+    client = document._get_connection()
+    index = document._index._name
+
+    watermark = cache.get(RECONCILE_WATERMARK_KEY)
+    new_watermark = Book.objects.aggregate(latest=Max("time_update"))["latest"]
+
+    books = Book.objects.order_by("pk").values_list("pk", "time_update")
+    if watermark is not None:
+        books = books.filter(time_update__gte=watermark)
+
+    stale_ids = set()
+    batch = []
+    for row in books.iterator(chunk_size=RECONCILE_CHUNK_SIZE):
+        batch.append(row)
+        if len(batch) == RECONCILE_CHUNK_SIZE:
+            stale_ids |= _find_stale(client, index, batch)
+            batch = []
+    if batch:
+        stale_ids |= _find_stale(client, index, batch)
+
+    # Лишние документы: книги удалены в обход сигналов. Сравнение количеств
+    # не видит сироту, если другой книги в индексе не хватает, — её находит
+    # ночной полный просмотр
+    if sweep_orphans or client.count(index=index)["count"] > Book.objects.count():
+        stale_ids |= find_orphaned_documents(client, index)
+
+    enqueue_books(stale_ids)
+    if new_watermark is not None:
+        cache.set(RECONCILE_WATERMARK_KEY, new_watermark, None)
+    return len(stale_ids)
+
+
+def find_orphaned_documents(client, index):
+    """id документов индекса, книг которых нет в БД (порциями по индексу)."""
+    from elasticsearch.helpers import scan
+
+    orphan_ids = set()
+    batch = []
+    hits = scan(
+        client, index=index, query={"_source": False}, size=RECONCILE_CHUNK_SIZE
+    )
+    for hit in hits:
+        batch.append(int(hit["_id"]))
+        if len(batch) == RECONCILE_CHUNK_SIZE:
+            orphan_ids |= _find_orphans(batch)
+            batch = []
+    if batch:
+        orphan_ids |= _find_orphans(batch)
+    return orphan_ids
+
+
+def _find_orphans(indexed_ids):
+    """id из индекса, которых нет в БД."""
+    db_ids = set(Book.objects.filter(pk__in=indexed_ids).values_list("pk", flat=True))
+    return set(indexed_ids) - db_ids
+
+
+def _find_stale(client, index, rows):
+    """id книг, документы которых отсутствуют или старее time_update в БД."""
+    response = client.mget(
+        index=index, ids=[pk for pk, _ in rows], source_includes=["time_update"]
+    )
+    indexed = {
+        int(doc["_id"]): parse_datetime(doc["_source"].get("time_update") or "")
+        for doc in response["docs"]
+        if doc.get("found")
+    }
+    return {
+        pk
+        for pk, time_update in rows
+        if indexed.get(pk) is None or indexed[pk] < time_update
+    }
+
+
+def iter_books_keyset(queryset, chunk_size):
+    """Потоковое чтение книг порциями по pk > последнего (без OFFSET)."""
+    last_pk = 0
+    while True:
+        books = list(queryset.filter(pk__gt=last_pk).order_by("pk")[:chunk_size])
+        if not books:
+            return
+        yield from books
+        last_pk = books[-1].pk
+
+
+def reindex_books(
+    chunk_size=1000,
+    workers=4,
+    load_settings=None,
+    final_settings=None,
+    delete_old=True,
+):
+    """
+    Полная переиндексация без простоя поиска.
+
+    Строит новый индекс '<alias>-<timestamp>' с маппингом BookDocument,
+    загружает его параллельными bulk-потоками с параметрами load_settings
+    (по умолчанию без refresh и реплик), возвращает final_settings
+    и атомарно переключает alias на новый индекс. Пока идёт загрузка,
+    поиск и очередь индексации работают со старым индексом; книги,
+    изменённые за время загрузки, после переключения ставятся в очередь.
+    """
+    from elasticsearch.helpers import parallel_bulk
+
+    from .documents import BookDocument
+
+    document = BookDocument()
+    client = document._get_connection()
+    alias = document._index._name
+    index_name = f"{alias}-{timezone.now():%Y%m%d%H%M%S}"
+    result = ReindexResult(index_name=index_name)
+
+    load_settings = {**REINDEX_LOAD_SETTINGS, **(load_settings or {})}
+    final_settings = {
+        "refresh_interval": "1s",
+        "number_of_replicas": document._index._settings.get("number_of_replicas", 1),
+        **(final_settings or {}),
+    }
+
+    new_index = document._index.clone(name=index_name)
+    new_index.settings(**load_settings)
+    new_index.create(using=client)
+
+    started_at = timezone.now()
+    started = time.monotonic()
+
+    def actions():
+        books = iter_books_keyset(document.get_queryset(), chunk_size)
+        for book in books:
+            action = document._prepare_action(book, "index")
+            action["_index"] = index_name
+            yield action
+
+    for ok, _ in parallel_bulk(
+        client,
+        actions(),
+        thread_count=workers,
+        chunk_size=chunk_size,
+        raise_on_error=False,
+    ):
+        if ok:
+            result.indexed += 1
+        else:
+            result.errors += 1
+    result.seconds = time.monotonic() - started
+
+    client.indices.put_settings(index=index_name, settings=final_settings)
+    client.indices.refresh(index=index_name)
+
+    if result.errors:
+        # Старый индекс продолжает обслуживать поиск
+        return result
+
+    # Alias может указывать на старые индексы, а может быть ещё обычным индексом
+    actions = [{"add": {"index": index_name, "alias": alias}}]
+    if client.indices.exists_alias(name=alias):
+        result.old_indices = list(client.indices.get_alias(name=alias))
+        actions += [
+            {"remove": {"index": old, "alias": alias}} for old in result.old_indices
+        ]
+    elif client.indices.exists(index=alias):
+        actions.append({"remove_index": {"index": alias}})
+    client.indices.update_aliases(actions=actions)
+
+    if delete_old:
+        for old in result.old_indices:
+            client.indices.delete(index=old, ignore_unavailable=True)
+
+    # Изменения во время загрузки ушли в старый индекс — догоняем новый
+    enqueue_books(
+        Book.objects.filter(time_update__gte=started_at).values_list("pk", flat=True)
+    )
+    return result
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    """
+    Signal processor для django-elasticsearch-dsl, который не обращается к ES
+    в запросе: изменённые книги записываются в очередь PendingBookIndex,
+    а в индекс их отправляет задача sync_search_index_task пакетами.
+    Сохранение книги не блокируется и не падает при недоступном ES.
+    Изменение жанра переиндексирует его книги: названия жанров хранятся
+    в документе. Агрегаты рейтинга ставят в очередь сигналы отзывов.
+    """
+
+    def setup(self):
+        post_save.connect(self.handle_save)
+        post_delete.connect(self.handle_delete)
+        pre_delete.connect(self.handle_pre_delete)
+        m2m_changed.connect(self.handle_m2m_changed)
+
+    def teardown(self):
+        post_save.disconnect(self.handle_save)
+        post_delete.disconnect(self.handle_delete)
+        pre_delete.disconnect(self.handle_pre_delete)
+        m2m_changed.disconnect(self.handle_m2m_changed)
+
+    def handle_save(self, sender, instance, **kwargs):
+        # Внутри catalog_batch() книги ставит в очередь сам пакет
+        if isinstance(instance, Book) and get_current_batch() is None:
+            enqueue_books([instance.pk])
+        elif isinstance(instance, Genre) and not kwargs.get("created"):
+            enqueue_books(instance.book_set.values_list("pk", flat=True))
+
+    def handle_pre_delete(self, sender, instance, **kwargs):
+        # После удаления жанра связи с книгами уже не найти
+        if isinstance(instance, Genre):
+            enqueue_books(instance.book_set.values_list("pk", flat=True))
+
+    def handle_delete(self, sender, instance, **kwargs):
+        if isinstance(instance, Book):
+            enqueue_books([instance.pk])
+
+    def handle_m2m_changed(self, sender, instance, action, **kwargs):
+        if action == "pre_clear" and isinstance(instance, Genre):
+            # genre.book_set.clear() не передаёт pk_set: книги запоминаем заранее
+            instance._cleared_book_ids = list(
+                instance.book_set.values_list("pk", flat=True)
+            )
+            return
+        if action not in ("post_add", "post_remove", "post_clear"):
+            return
+        if isinstance(instance, Book):
+            self.handle_save(sender, instance)
+        elif action == "post_clear" and isinstance(instance, Genre):
+            enqueue_books(instance.__dict__.pop("_cleared_book_ids", ()))
+        elif kwargs.get("model") is Book and kwargs.get("pk_set"):
+            enqueue_books(kwargs["pk_set"])
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.importers import BookImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Импортирует книги из CSV или JSONL. Книги сопоставляются по slug заголовка; "
+        "жанры передаются в колонке genres через ';' (или массивом в JSONL)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к файлу импорта")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="Формат файла (по умолчанию — по расширению)",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=500, help="Размер порции записи"
+        )
+        parser.add_argument(
+            "--skip-existing",
+            action="store_true",
+            help="Не обновлять уже существующие книги",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"Файл не найден: {path}")
+
+        fmt = options["format"] or path.suffix.lstrip(".").lower()
+        if fmt not in ("csv", "jsonl"):
+            raise CommandError("Не удалось определить формат, укажите --format")
+
+        importer = BookImporter(
+            chunk_size=options["chunk_size"],
+            update_existing=not options["skip_existing"],
+        )
+
+        self.stdout.write(f"Импорт книг из {path}...")
+        with path.open(encoding="utf-8", newline="") as stream:
+            result = importer.run(read_rows(stream, fmt))
+
+        for line_no, messages in result.errors:
+            self.stderr.write(f"Строка {line_no}: {'; '.join(messages)}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано: {result.created}, обновлено: {result.updated}, "
+                f"ошибок: {len(result.errors)}"
+            )
+        )
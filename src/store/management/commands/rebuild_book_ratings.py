@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store.indexing import enqueue_books
+from store.models import Book
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает денормализованные агрегаты рейтинга книг по отзывам"
+
+    def handle(self, *args, **options):
+        self.stdout.write("Пересчёт рейтингов книг...")
+
+        with transaction.atomic():
+            updated = Book.objects.recalculate_ratings()
+            # Рейтинг хранится и в поисковых документах
+            enqueue_books(Book.objects.values_list("pk", flat=True))
+
+        self.stdout.write(self.style.SUCCESS(f"Обновлено книг: {updated}"))
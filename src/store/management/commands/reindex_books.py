@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.indexing import reindex_books
+
+
+class Command(BaseCommand):
+    help = (
+        "Переиндексирует книги в новый индекс и атомарно переключает на него alias "
+        "books: поиск работает со старым индексом до конца загрузки"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=1000, help="Книг в одном bulk-запросе"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Параллельных bulk-потоков"
+        )
+        parser.add_argument(
+            "--load-refresh-interval",
+            default="-1",
+            help="refresh_interval на время загрузки (по умолчанию выключен)",
+        )
+        parser.add_argument(
+            "--load-replicas",
+            type=int,
+            default=0,
+            help="Количество реплик на время загрузки",
+        )
+        parser.add_argument(
+            "--refresh-interval",
+            default="1s",
+            help="refresh_interval после загрузки",
+        )
+        parser.add_argument(
+            "--replicas",
+            type=int,
+            help="Количество реплик после загрузки (по умолчанию из BookDocument)",
+        )
+        parser.add_argument(
+            "--keep-old",
+            action="store_true",
+            help="Не удалять предыдущие индексы после переключения alias",
+        )
+
+    def handle(self, *args, **options):
+        final_settings = {"refresh_interval": options["refresh_interval"]}
+        if options["replicas"] is not None:
+            final_settings["number_of_replicas"] = options["replicas"]
+
+        self.stdout.write("Переиндексация книг...")
+        result = reindex_books(
+            chunk_size=options["chunk_size"],
+            workers=options["workers"],
+            load_settings={
+                "refresh_interval": options["load_refresh_interval"],
+                "number_of_replicas": options["load_replicas"],
+            },
+            final_settings=final_settings,
+            delete_old=not options["keep_old"],
+        )
+
+        self.stdout.write(
+            f"Индекс {result.index_name}: {result.indexed} документов "
+            f"за {result.seconds:.1f} с ({result.docs_per_second:.0f} док/с)"
+        )
+        if result.errors:
+            raise CommandError(
+                f"Ошибок индексации: {result.errors}. Alias не переключён, "
+                f"индекс {result.index_name} можно удалить"
+            )
+        self.stdout.write(self.style.SUCCESS("Alias переключён на новый индекс"))
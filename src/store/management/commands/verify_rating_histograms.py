@@ -0,0 +1,83 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from reviews.models import Review
+from store.cache import CATALOG_NAMESPACE, HOME_BOOKS_NAMESPACE, bump_cache_version
+from store.indexing import enqueue_books
+from store.models import Book
+
+BOOK_CHUNK_SIZE = 2000
+
+
+def review_histograms():
+    """{book_id: {оценка: количество}} одним GROUP BY по отзывам."""
+    histograms = defaultdict(dict)
+    rows = (
+        Review.objects.order_by()
+        .values_list("book_id", "rating")
+        .annotate(total=Count("pk"))
+    )
+    for book_id, rating, total in rows:
+        histograms[book_id][rating] = total
+    return histograms
+
+
+def find_drift(histograms):
+    """id книг, чьи сохранённые счётчики не совпадают с отзывами."""
+    fields = ("pk", *Book.RATING_HISTOGRAM_FIELDS, "rating_sum", "rating_count")
+    drift = []
+    for row in (
+        Book.objects.order_by("pk").values(*fields).iterator(chunk_size=BOOK_CHUNK_SIZE)
+    ):
+        histogram = histograms.get(row["pk"], {})
+        expected = {
+            Book.histogram_field(rating): histogram.get(rating, 0)
+            for rating in Book.RATING_SCALE
+        }
+        expected["rating_sum"] = sum(
+            rating * count for rating, count in histogram.items()
+        )
+        expected["rating_count"] = sum(histogram.values())
+        if any(row[name] != value for name, value in expected.items()):
+            drift.append(row["pk"])
+    return drift
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет гистограммы оценок книг с отзывами одним сгруппированным "
+        "запросом и исправляет расхождения"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать расхождения, ничего не исправлять",
+        )
+
+    def handle(self, *args, **options):
+        book_ids = find_drift(review_histograms())
+        if not book_ids:
+            self.stdout.write(self.style.SUCCESS("Расхождений нет"))
+            return
+
+        self.stdout.write(f"Расхождения у книг: {len(book_ids)} ({book_ids[:20]})")
+        if options["dry_run"]:
+            return
+
+        # Сверка лишь находит книги: значения пересчитывает сам UPDATE,
+        # чтобы не записать устаревшие счётчики поверх новых отзывов
+        with transaction.atomic():
+            for start in range(0, len(book_ids), BOOK_CHUNK_SIZE):
+                chunk = book_ids[start : start + BOOK_CHUNK_SIZE]
+                Book.objects.recalculate_ratings(book_ids=chunk)
+            # Рейтинг хранится и в поисковых документах
+            enqueue_books(book_ids)
+
+        bump_cache_version(CATALOG_NAMESPACE)
+        bump_cache_version(HOME_BOOKS_NAMESPACE)
+        self.stdout.write(self.style.SUCCESS(f"Исправлено книг: {len(book_ids)}"))
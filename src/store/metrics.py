@@ -0,0 +1,55 @@
+from django.core.cache import cache
+
+# Счётчики живут в общем кэше, чтобы их видели все процессы и воркеры
+METRICS_PREFIX = "metrics"
+
+
+def _metric_key(name, labels):
+    suffix = ",".join(f"{key}={value}" for key, value in sorted(labels.items()))
+    return f"{METRICS_PREFIX}:{name}:{suffix}"
+
+
+def incr_counter(name, **labels):
+    """Монотонный счётчик: ключ создаётся без срока жизни и растёт INCR."""
+    key = _metric_key(name, labels)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключ вытеснили между add и incr — потеря одного события допустима
+        pass
+
+
+async def aincr_counter(name, **labels):
+    key = _metric_key(name, labels)
+    await cache.aadd(key, 0, None)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        pass
+
+
+def get_counters(name, label_sets):
+    """Значения счётчика для перечисленных наборов меток одним get_many."""
+    keys = {_metric_key(name, labels): labels for labels in label_sets}
+    values = cache.get_many(keys)
+    return [(labels, values.get(key, 0)) for key, labels in keys.items()]
+
+
+def render_prometheus(samples):
+    """
+    Текстовый формат Prometheus.
+    samples: список (name, type, help, [(labels, value), ...]).
+    """
+    lines = []
+    for name, metric_type, help_text, values in samples:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in values:
+            label_str = ",".join(
+                f'{key}="{value}"' for key, value in sorted(labels.items())
+            )
+            lines.append(
+                f"{name}{{{label_str}}} {value}" if labels else f"{name} {value}"
+            )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:23
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Book = apps.get_model("store", "Book")
+    Review = apps.get_model("reviews", "Review")
+
+    book_reviews = Review.objects.filter(book=OuterRef("pk")).order_by().values("book")
+    Book.objects.update(
+        rating_sum=Coalesce(
+            Subquery(book_reviews.annotate(total=Sum("rating")).values("total")), 0
+        ),
+        rating_count=Coalesce(
+            Subquery(book_reviews.annotate(total=Count("pk")).values("total")), 0
+        ),
+    )
+    Book.objects.update(
+        average_rating=Cast(F("rating_sum"), FloatField()) / NullIf(F("rating_count"), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_alter_book_photo'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='average_rating',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Средний рейтинг'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество оценок'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['rating_count'], name='store_book_rating__886627_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['average_rating'], name='store_book_average_ea96bc_idx'),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.1.4 on 2026-10-18 21:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0009_book_rating_aggregates"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PendingBookNotification",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Добавлена в очередь"
+                    ),
+                ),
+                (
+                    "book",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pending_notification",
+                        to="store.book",
+                        verbose_name="Книга",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Книга в очереди рассылки",
+                "verbose_name_plural": "Книги в очереди рассылки",
+                "ordering": ["created_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="NewBooksDigest",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("window_start", models.DateTimeField(verbose_name="Начало окна")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Конец окна"),
+                ),
+                (
+                    "queued_at",
+                    models.DateTimeField(
+                        blank=True,
+                        null=True,
+                        verbose_name="Рассылка поставлена в очередь",
+                    ),
+                ),
+                (
+                    "books_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Книг"),
+                ),
+                (
+                    "recipients_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Получателей"),
+                ),
+                (
+                    "books",
+                    models.ManyToManyField(
+                        blank=True,
+                        related_name="digests",
+                        to="store.book",
+                        verbose_name="Книги",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Дайджест новых книг",
+                "verbose_name_plural": "Дайджесты новых книг",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["queued_at"], name="store_newbo_queued__69492d_idx"
+                    )
+                ],
+            },
+        ),
+    ]
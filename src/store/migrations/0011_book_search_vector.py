@@ -0,0 +1,111 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:10
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+BACKFILL_BATCH_SIZE = 10000
+
+# Веса соответствуют бустам ES: title (A) > author (B) > description (D)
+CREATE_SEARCH_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION store_book_search_vector(
+        title text, author text, description text
+    ) RETURNS tsvector LANGUAGE sql IMMUTABLE AS $$
+        SELECT setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(author, '')), 'B')
+            || setweight(to_tsvector('simple', coalesce(description, '')), 'D')
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION store_book_search_vector_trigger()
+    RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector := store_book_search_vector(
+            NEW.title, NEW.author, NEW.description
+        );
+        RETURN NEW;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER store_book_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, author, description ON store_book
+    FOR EACH ROW EXECUTE FUNCTION store_book_search_vector_trigger()
+    """,
+]
+
+# Индексы строятся CONCURRENTLY, чтобы не блокировать запись в каталог.
+# Триграммы по UPPER(...) обслуживают и icontains из Django (UPPER(col) LIKE UPPER(%s))
+CREATE_INDEXES_SQL = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS store_book_search_vector_gin "
+    "ON store_book USING gin (search_vector)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS store_book_title_upper_trgm "
+    "ON store_book USING gin (UPPER(title) gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS store_book_author_upper_trgm "
+    "ON store_book USING gin (UPPER(author) gin_trgm_ops)",
+]
+
+DROP_SEARCH_SQL = [
+    "DROP INDEX CONCURRENTLY IF EXISTS store_book_author_upper_trgm",
+    "DROP INDEX CONCURRENTLY IF EXISTS store_book_title_upper_trgm",
+    "DROP INDEX CONCURRENTLY IF EXISTS store_book_search_vector_gin",
+    "DROP TRIGGER IF EXISTS store_book_search_vector_update ON store_book",
+    "DROP FUNCTION IF EXISTS store_book_search_vector_trigger()",
+    "DROP FUNCTION IF EXISTS store_book_search_vector(text, text, text)",
+]
+
+
+def create_search_objects(apps, schema_editor):
+    # Триггер, функции и GIN-индексы есть только в PostgreSQL
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for sql in CREATE_SEARCH_SQL:
+            cursor.execute(sql)
+
+        # Заполняем вектор порциями по pk, не держа одну длинную транзакцию
+        cursor.execute("SELECT MIN(id), MAX(id) FROM store_book")
+        low, high = cursor.fetchone()
+        if low is not None:
+            for start in range(low, high + 1, BACKFILL_BATCH_SIZE):
+                cursor.execute(
+                    "UPDATE store_book SET search_vector = "
+                    "store_book_search_vector(title, author, description) "
+                    "WHERE id >= %s AND id < %s",
+                    [start, start + BACKFILL_BATCH_SIZE],
+                )
+
+        for sql in CREATE_INDEXES_SQL:
+            cursor.execute(sql)
+
+
+def drop_search_objects(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for sql in DROP_SEARCH_SQL:
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ("store", "0010_pendingbooknotification_newbooksdigest"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="book",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_objects, drop_search_objects),
+    ]
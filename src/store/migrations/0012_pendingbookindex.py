@@ -0,0 +1,39 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0011_book_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PendingBookIndex",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("book_id", models.PositiveBigIntegerField(verbose_name="ID книги")),
+                (
+                    "queued_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Добавлена в очередь"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Книга в очереди индексации",
+                "verbose_name_plural": "Книги в очереди индексации",
+                "ordering": ["pk"],
+            },
+        ),
+    ]
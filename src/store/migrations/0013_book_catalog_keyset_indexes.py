@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0012_pendingbookindex"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["is_published", "time_create", "id"],
+                name="store_book_is_publ_7f4c72_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["is_published", "price", "id"],
+                name="store_book_is_publ_639085_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["is_published", "title", "id"],
+                name="store_book_is_publ_aa026d_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0013_book_catalog_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BookRanking",
+            fields=[
+                (
+                    "book",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="ranking",
+                        serialize=False,
+                        to="store.book",
+                        verbose_name="Книга",
+                    ),
+                ),
+                (
+                    "popularity_score",
+                    models.FloatField(default=0, verbose_name="Популярность"),
+                ),
+                (
+                    "rating_score",
+                    models.FloatField(default=0, verbose_name="Сглаженный рейтинг"),
+                ),
+                (
+                    "activity_score",
+                    models.FloatField(default=0, verbose_name="Недавняя активность"),
+                ),
+                (
+                    "favorites_count",
+                    models.PositiveIntegerField(default=0, verbose_name="В избранном"),
+                ),
+                (
+                    "refreshed_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Пересчитано"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Рейтинг книги",
+                "verbose_name_plural": "Рейтинги книг",
+                "indexes": [
+                    models.Index(
+                        fields=["-popularity_score", "-book"],
+                        name="store_bookr_popular_f34d39_idx",
+                    ),
+                    models.Index(
+                        fields=["-rating_score", "-book"],
+                        name="store_bookr_rating__3b38d2_idx",
+                    ),
+                    models.Index(
+                        fields=["activity_score"], name="store_bookr_activit_e4639a_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
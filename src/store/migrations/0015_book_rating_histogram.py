@@ -0,0 +1,72 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_rating_histogram(apps, schema_editor):
+    Book = apps.get_model("store", "Book")
+    Review = apps.get_model("reviews", "Review")
+
+    book_reviews = Review.objects.filter(book=OuterRef("pk")).order_by().values("book")
+    Book.objects.update(
+        **{
+            f"rating_{rating}_count": Coalesce(
+                Subquery(
+                    book_reviews.filter(rating=rating)
+                    .annotate(total=Count("pk"))
+                    .values("total")
+                ),
+                0,
+            )
+            for rating in range(1, 6)
+        }
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0014_bookranking"),
+        ("reviews", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="rating_1_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Оценок 1"
+            ),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="rating_2_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Оценок 2"
+            ),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="rating_3_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Оценок 3"
+            ),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="rating_4_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Оценок 4"
+            ),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="rating_5_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Оценок 5"
+            ),
+        ),
+        migrations.RunPython(fill_rating_histogram, migrations.RunPython.noop),
+    ]
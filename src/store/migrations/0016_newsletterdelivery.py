@@ -0,0 +1,60 @@
+# Generated by Django 5.1.4 on 2026-10-19 00:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0015_book_rating_histogram"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NewsletterDelivery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "campaign_id",
+                    models.CharField(max_length=64, verbose_name="Рассылка"),
+                ),
+                (
+                    "sent_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Отправлено"),
+                ),
+                (
+                    "subscription",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="deliveries",
+                        to="store.subscription",
+                        verbose_name="Подписка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Отправленное письмо рассылки",
+                "verbose_name_plural": "Отправленные письма рассылок",
+                "indexes": [
+                    models.Index(
+                        fields=["sent_at"], name="store_newsl_sent_at_2e1b2d_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("campaign_id", "subscription"),
+                        name="newsletter_delivery_once_per_campaign",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,5 +1,7 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from django.db.models import Q
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf
 from django.urls import reverse
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -14,25 +16,101 @@ from imagekit.processors import ResizeToFill
 class BookManager(models.Manager):
     """Менеджер для книг с дополнительными методами"""
 
-    def with_ratings(self):
-        """Получить книги с предварительно рассчитанным рейтингом"""
-        from django.db.models import Avg, Count
+    def get_queryset(self):
+        # Поисковый вектор нужен только в WHERE/ORDER BY, в память его не грузим
+        return super().get_queryset().defer("search_vector")
 
-        return self.annotate(
-            average_rating=Avg("reviews__rating"), reviews_count=Count("reviews")
-        )
+    def with_ratings(self):
+        """Получить книги с рейтингом из денормализованных полей (без JOIN с отзывами)"""
+        return self.annotate(reviews_count=F("rating_count"))
 
     def published(self):
         """Только опубликованные книги"""
         return self.filter(is_published=True)
 
+    def ranked(self, score):
+        """Книги по убыванию предрасчитанной оценки из BookRanking.
+
+        Сортировка совпадает с индексом (score DESC, book DESC), поэтому
+        ORDER BY ... LIMIT читает только начало индекса без агрегации отзывов.
+        """
+        return (
+            self.with_ratings()
+            .filter(ranking__isnull=False)
+            .order_by(f"-ranking__{score}", "-ranking__book")
+        )
+
     def rated_high(self, min_rating=4.0):
-        """Книги с высоким рейтингом"""
-        return self.with_ratings().filter(average_rating__gte=min_rating)
+        """Книги с высоким сглаженным (байесовским) рейтингом"""
+        return self.ranked("rating_score").filter(ranking__rating_score__gte=min_rating)
 
     def popular(self, limit=10):
-        """Популярные книги по количеству отзывов"""
-        return self.with_ratings().order_by("-reviews_count")[:limit]
+        """Популярные книги по материализованной оценке популярности"""
+        return self.ranked("popularity_score")[:limit]
+
+    def apply_rating_delta(self, book_id, sum_delta, count_delta, histogram_delta=None):
+        """Атомарно сдвигает агрегаты рейтинга книги одним UPDATE.
+
+        Используется сигналами отзывов: на создание, изменение и удаление
+        отзыва приходится ровно один запрос без чтения строки книги.
+        histogram_delta — изменения счётчиков оценок, {оценка: +1/-1}.
+        """
+        new_sum = F("rating_sum") + sum_delta
+        new_count = F("rating_count") + count_delta
+        histogram = {
+            Book.histogram_field(rating): F(Book.histogram_field(rating)) + delta
+            for rating, delta in (histogram_delta or {}).items()
+            if delta
+        }
+        return self.filter(pk=book_id).update(
+            rating_sum=new_sum,
+            rating_count=new_count,
+            average_rating=Cast(new_sum, FloatField()) / NullIf(new_count, 0),
+            **histogram,
+        )
+
+    def recalculate_ratings(self, book_ids=None):
+        """Полностью пересчитывает агрегаты рейтинга по таблице отзывов.
+
+        book_ids ограничивает пересчёт указанными книгами. Значения считаются
+        коррелированными подзапросами внутри самого UPDATE, поэтому
+        не затирают отзывы, добавленные между чтением и записью.
+        Возвращает количество обновлённых книг.
+        """
+        from reviews.models import Review
+
+        books = self.all() if book_ids is None else self.filter(pk__in=book_ids)
+
+        book_reviews = (
+            Review.objects.filter(book=OuterRef("pk")).order_by().values("book")
+        )
+        histogram = {
+            Book.histogram_field(rating): Coalesce(
+                Subquery(
+                    book_reviews.filter(rating=rating)
+                    .annotate(total=Count("pk"))
+                    .values("total")
+                ),
+                0,
+            )
+            for rating in Book.RATING_SCALE
+        }
+        updated = books.update(
+            rating_sum=Coalesce(
+                Subquery(book_reviews.annotate(total=Sum("rating")).values("total")),
+                0,
+            ),
+            rating_count=Coalesce(
+                Subquery(book_reviews.annotate(total=Count("pk")).values("total")),
+                0,
+            ),
+            **histogram,
+        )
+        books.update(
+            average_rating=Cast(F("rating_sum"), FloatField())
+            / NullIf(F("rating_count"), 0)
+        )
+        return updated
 
 
 class Genre(models.Model):
@@ -114,6 +192,54 @@ class Book(models.Model):
         default=0, verbose_name="Количество на складе"
     )
 
+    # Денормализованные агрегаты рейтинга, поддерживаются сигналами reviews
+    rating_sum = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Сумма оценок"
+    )
+    rating_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Количество оценок"
+    )
+    average_rating = models.FloatField(
+        blank=True, null=True, editable=False, verbose_name="Средний рейтинг"
+    )
+    # Гистограмма оценок: количество отзывов с каждой оценкой от 1 до 5
+    rating_1_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Оценок 1"
+    )
+    rating_2_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Оценок 2"
+    )
+    rating_3_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Оценок 3"
+    )
+    rating_4_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Оценок 4"
+    )
+    rating_5_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Оценок 5"
+    )
+
+    # Полнотекстовый вектор для поиска в БД, заполняется триггером PostgreSQL
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
+
+    RATING_SCALE = range(1, 6)
+    RATING_HISTOGRAM_FIELDS = (
+        "rating_1_count",
+        "rating_2_count",
+        "rating_3_count",
+        "rating_4_count",
+        "rating_5_count",
+    )
+    # Поля, которые изменяются только через BookManager.apply_rating_delta
+    RATING_FIELDS = (
+        "rating_sum",
+        "rating_count",
+        "average_rating",
+        *RATING_HISTOGRAM_FIELDS,
+    )
+    # Поля, которые поддерживает сама БД (атомарные UPDATE и триггеры)
+    DB_MAINTAINED_FIELDS = (*RATING_FIELDS, "search_vector")
+
     def __str__(self):
         return self.title
 
@@ -135,18 +261,34 @@ class Book(models.Model):
         """Возвращает финальную цену с учетом скидки"""
         return self.discounted_price if self.discounted_price else self.price
 
+    @staticmethod
+    def discount_percentage(price, discounted_price):
+        """Процент скидки по цене и цене со скидкой (общая формула для API)"""
+        if discounted_price and price:
+            return round(((price - discounted_price) / price) * 100, 1)
+        return 0
+
     def get_discount_percentage(self):
         """Возвращает процент скидки"""
-        if self.discounted_price and self.price:
-            return round(((self.price - self.discounted_price) / self.price) * 100, 1)
-        return 0
+        return self.discount_percentage(self.price, self.discounted_price)
 
     def get_average_rating(self):
-        """Рассчитывает средний рейтинг книги"""
-        if self.reviews.exists():
-            return self.reviews.aggregate(models.Avg("rating"))["rating__avg"]
+        """Средний рейтинг книги (хранится в average_rating)"""
+        if self.rating_count:
+            return self.average_rating
         return None
 
+    @staticmethod
+    def histogram_field(rating):
+        return f"rating_{rating}_count"
+
+    def get_rating_histogram(self):
+        """Количество отзывов по оценкам: {5: ..., 4: ..., ..., 1: ...}"""
+        return {
+            rating: getattr(self, self.histogram_field(rating))
+            for rating in reversed(self.RATING_SCALE)
+        }
+
     def get_rating_display(self):
         """Форматированное отображение рейтинга"""
         avg_rating = self.get_average_rating()
@@ -169,6 +311,18 @@ class Book(models.Model):
             self.discounted_price = (Decimal(self.discounted_price)).quantize(
                 Decimal("0.01")
             )
+        # Не перезаписываем агрегаты рейтинга и поисковый вектор значениями
+        # из памяти: их меняют атомарные UPDATE из сигналов отзывов и триггер БД
+        if (
+            not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DB_MAINTAINED_FIELDS
+            ]
         super().save(*args, **kwargs)
 
     class Meta:
@@ -181,6 +335,12 @@ class Book(models.Model):
             models.Index(fields=["is_published"]),
             models.Index(fields=["price"]),
             models.Index(fields=["discounted_price"]),
+            models.Index(fields=["rating_count"]),
+            models.Index(fields=["average_rating"]),
+            # Ключи курсорной пагинации каталога: (сортировка, id) среди опубликованных
+            models.Index(fields=["is_published", "time_create", "id"]),
+            models.Index(fields=["is_published", "price", "id"]),
+            models.Index(fields=["is_published", "title", "id"]),
         ]
         constraints = [
             models.CheckConstraint(
@@ -241,3 +401,139 @@ class Subscription(models.Model):
         verbose_name = "Подписка на Email"
         verbose_name_plural = "Подписки на Email"
         ordering = ["-date_subscribed"]
+
+
+class NewsletterDelivery(models.Model):
+    """Письмо рассылки, отправленное подписчику.
+
+    Записывается сразу после отправки: повтор задачи после ошибки SMTP
+    пропускает подписчиков, которые уже получили письмо этой рассылки.
+    """
+
+    campaign_id = models.CharField(max_length=64, verbose_name="Рассылка")
+    subscription = models.ForeignKey(
+        Subscription,
+        on_delete=models.CASCADE,
+        related_name="deliveries",
+        verbose_name="Подписка",
+    )
+    sent_at = models.DateTimeField(auto_now_add=True, verbose_name="Отправлено")
+
+    def __str__(self):
+        return f"{self.campaign_id} → {self.subscription_id}"
+
+    class Meta:
+        verbose_name = "Отправленное письмо рассылки"
+        verbose_name_plural = "Отправленные письма рассылок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["campaign_id", "subscription"],
+                name="newsletter_delivery_once_per_campaign",
+            )
+        ]
+        indexes = [models.Index(fields=["sent_at"])]
+
+
+class PendingBookNotification(models.Model):
+    """Новая книга в очереди на ближайший дайджест рассылки"""
+
+    book = models.OneToOneField(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="pending_notification",
+        verbose_name="Книга",
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Добавлена в очередь"
+    )
+
+    def __str__(self):
+        return str(self.book)
+
+    class Meta:
+        verbose_name = "Книга в очереди рассылки"
+        verbose_name_plural = "Книги в очереди рассылки"
+        ordering = ["created_at"]
+
+
+class NewBooksDigest(models.Model):
+    """Дайджест новых книг за окно рассылки и его метрики"""
+
+    books = models.ManyToManyField(
+        Book, related_name="digests", blank=True, verbose_name="Книги"
+    )
+    window_start = models.DateTimeField(verbose_name="Начало окна")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Конец окна")
+    queued_at = models.DateTimeField(
+        blank=True, null=True, verbose_name="Рассылка поставлена в очередь"
+    )
+    books_count = models.PositiveIntegerField(default=0, verbose_name="Книг")
+    recipients_count = models.PositiveIntegerField(
+        default=0, verbose_name="Получателей"
+    )
+
+    def __str__(self):
+        return f"Дайджест #{self.pk}: {self.books_count} книг"
+
+    class Meta:
+        verbose_name = "Дайджест новых книг"
+        verbose_name_plural = "Дайджесты новых книг"
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["queued_at"])]
+
+
+class PendingBookIndex(models.Model):
+    """Книга, изменённая после последней синхронизации индекса Elasticsearch.
+
+    Не внешний ключ: удалённые книги тоже попадают в очередь,
+    чтобы их документ был удалён из индекса.
+    """
+
+    book_id = models.PositiveBigIntegerField(verbose_name="ID книги")
+    queued_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Добавлена в очередь"
+    )
+
+    def __str__(self):
+        return f"Книга #{self.book_id}"
+
+    class Meta:
+        verbose_name = "Книга в очереди индексации"
+        verbose_name_plural = "Книги в очереди индексации"
+        ordering = ["pk"]
+
+
+class BookRanking(models.Model):
+    """Предрасчитанные оценки книги для списков "популярные" и "лучшие".
+
+    Строки пересчитывает store.rankings.refresh_rankings по расписанию
+    celery-beat; запросы каталога только читают их по индексам.
+    """
+
+    book = models.OneToOneField(
+        Book,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="ranking",
+        verbose_name="Книга",
+    )
+    popularity_score = models.FloatField(default=0, verbose_name="Популярность")
+    rating_score = models.FloatField(default=0, verbose_name="Сглаженный рейтинг")
+    # Вклад событий из временных окон; пока он больше нуля, оценка затухает
+    activity_score = models.FloatField(default=0, verbose_name="Недавняя активность")
+    favorites_count = models.PositiveIntegerField(default=0, verbose_name="В избранном")
+    refreshed_at = models.DateTimeField(
+        blank=True, null=True, verbose_name="Пересчитано"
+    )
+
+    def __str__(self):
+        return f"{self.book_id}: {self.popularity_score:.2f}"
+
+    class Meta:
+        verbose_name = "Рейтинг книги"
+        verbose_name_plural = "Рейтинги книг"
+        indexes = [
+            models.Index(fields=["-popularity_score", "-book"]),
+            models.Index(fields=["-rating_score", "-book"]),
+            models.Index(fields=["activity_score"]),
+        ]
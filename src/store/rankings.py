@@ -0,0 +1,205 @@
+"""
+Материализованные рейтинги книг (таблица BookRanking).
+
+Популярность складывается из событий во временных окнах (отзывы и
+добавления в корзину за 7/30/90 дней с убывающими весами), добавлений
+в избранное и общего числа отзывов и умножается на байесовски сглаженный
+рейтинг. Сглаженный рейтинг тянет оценку книги с малым числом отзывов
+к среднему по каталогу, поэтому одна пятёрка не поднимает книгу в топ.
+
+Задача по расписанию пересчитывает только затронутые книги: с новыми
+отзывами или добавлениями в корзину после прошлого запуска, с ненулевой
+недавней активностью (окна сдвигаются) и ещё без строки в таблице.
+Раз в сутки выполняется полный пересчёт: он учитывает удаление отзывов
+и изменения избранного, у которых нет отметок времени.
+"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .cache import HOME_BOOKS_NAMESPACE, RANKINGS_NAMESPACE, bump_cache_version
+from .models import Book, BookRanking
+
+# Окна активности и их веса: событие учитывается в каждом окне, куда попадает
+RANKING_WINDOWS = (
+    (timedelta(days=7), 1.0),
+    (timedelta(days=30), 0.5),
+    (timedelta(days=90), 0.25),
+)
+REVIEW_WEIGHT = 3.0
+CART_ADD_WEIGHT = 1.0
+FAVORITE_WEIGHT = 2.0
+# Вклад всех отзывов за всё время, чтобы старые бестселлеры не обнулялись
+LIFETIME_REVIEW_WEIGHT = 0.1
+
+# Байесовское сглаживание: столько "виртуальных" оценок со средним по каталогу
+RATING_PRIOR_WEIGHT = 5
+# Среднее, если в каталоге ещё нет ни одной оценки
+RATING_PRIOR_MEAN = 3.0
+RATING_SCALE = 5.0
+
+RANKING_CHUNK_SIZE = 500
+RANKING_WATERMARK_KEY = "rankings:watermark"
+
+RANKING_UPDATE_FIELDS = (
+    "popularity_score",
+    "rating_score",
+    "activity_score",
+    "favorites_count",
+    "refreshed_at",
+)
+
+
+def catalog_mean_rating():
+    """Средняя оценка по всем отзывам каталога (по денормализованным суммам)."""
+    totals = Book.objects.aggregate(
+        rating_sum=Sum("rating_sum"), rating_count=Sum("rating_count")
+    )
+    if not totals["rating_count"]:
+        return RATING_PRIOR_MEAN
+    return totals["rating_sum"] / totals["rating_count"]
+
+
+def bayesian_rating(rating_sum, rating_count, mean, weight=RATING_PRIOR_WEIGHT):
+    return (weight * mean + rating_sum) / (weight + rating_count)
+
+
+def windowed_counts(queryset, time_field, book_ids, now):
+    """{book_id: [события в окне 1, окне 2, ...]} одним GROUP BY."""
+    annotations = {
+        f"window_{position}": Count(
+            "pk", filter=Q(**{f"{time_field}__gte": now - period})
+        )
+        for position, (period, _) in enumerate(RANKING_WINDOWS)
+    }
+    longest = max(period for period, _ in RANKING_WINDOWS)
+    rows = (
+        queryset.filter(book_id__in=book_ids, **{f"{time_field}__gte": now - longest})
+        .order_by()
+        .values("book_id")
+        .annotate(**annotations)
+    )
+    return {row["book_id"]: [row[name] for name in annotations] for row in rows}
+
+
+def decayed_score(counts):
+    return sum(
+        weight * count for (_, weight), count in zip(RANKING_WINDOWS, counts or ())
+    )
+
+
+def favorites_counts(book_ids):
+    from user_profile.models import UserProfile
+
+    through = UserProfile.favorite_books.through
+    rows = (
+        through.objects.filter(book_id__in=book_ids)
+        .order_by()
+        .values("book_id")
+        .annotate(total=Count("pk"))
+    )
+    return {row["book_id"]: row["total"] for row in rows}
+
+
+def compute_rankings(book_ids, now=None, mean=None):
+    """Несохранённые BookRanking для книг book_ids."""
+    from cart.models import CartItem
+    from reviews.models import Review
+
+    now = now or timezone.now()
+    mean = catalog_mean_rating() if mean is None else mean
+
+    reviews = windowed_counts(Review.objects, "created_at", book_ids, now)
+    cart_adds = windowed_counts(CartItem.objects, "added_at", book_ids, now)
+    favorites = favorites_counts(book_ids)
+
+    rankings = []
+    books = Book.objects.filter(pk__in=book_ids).values_list(
+        "pk", "rating_sum", "rating_count"
+    )
+    for book_id, rating_sum, rating_count in books:
+        activity = REVIEW_WEIGHT * decayed_score(
+            reviews.get(book_id)
+        ) + CART_ADD_WEIGHT * decayed_score(cart_adds.get(book_id))
+        engagement = (
+            activity
+            + FAVORITE_WEIGHT * favorites.get(book_id, 0)
+            + LIFETIME_REVIEW_WEIGHT * rating_count
+        )
+        rating = bayesian_rating(rating_sum, rating_count, mean)
+        rankings.append(
+            BookRanking(
+                book_id=book_id,
+                popularity_score=engagement * rating / RATING_SCALE,
+                rating_score=rating,
+                activity_score=activity,
+                favorites_count=favorites.get(book_id, 0),
+                refreshed_at=now,
+            )
+        )
+    return rankings
+
+
+def refresh_rankings(book_ids=None, chunk_size=RANKING_CHUNK_SIZE):
+    """
+    Пересчитывает и сохраняет рейтинги книг book_ids (по умолчанию — всех)
+    порциями через INSERT ... ON CONFLICT DO UPDATE. Возвращает количество книг.
+    """
+    now = timezone.now()
+    mean = catalog_mean_rating()
+    if book_ids is None:
+        book_ids = Book.objects.values_list("pk", flat=True)
+    book_ids = sorted(set(book_ids))
+
+    for start in range(0, len(book_ids), chunk_size):
+        rankings = compute_rankings(book_ids[start : start + chunk_size], now, mean)
+        BookRanking.objects.bulk_create(
+            rankings,
+            update_conflicts=True,
+            unique_fields=["book"],
+            update_fields=RANKING_UPDATE_FIELDS,
+        )
+
+    if book_ids:
+        bump_cache_version(RANKINGS_NAMESPACE)
+        bump_cache_version(HOME_BOOKS_NAMESPACE)
+    return len(book_ids)
+
+
+def stale_ranking_ids(since):
+    """Книги, чья оценка могла измениться после момента since."""
+    from cart.models import CartItem
+    from reviews.models import Review
+
+    stale_ids = set(
+        Book.objects.filter(ranking__isnull=True).values_list("pk", flat=True)
+    )
+    stale_ids |= set(
+        BookRanking.objects.filter(activity_score__gt=0).values_list(
+            "book_id", flat=True
+        )
+    )
+    stale_ids |= set(
+        Review.objects.filter(updated_at__gte=since).values_list("book_id", flat=True)
+    )
+    stale_ids |= set(
+        CartItem.objects.filter(added_at__gte=since).values_list("book_id", flat=True)
+    )
+    return stale_ids
+
+
+def refresh_stale_rankings():
+    """
+    Инкрементальный пересчёт по водяному знаку времени прошлого запуска.
+    Без водяного знака (первый запуск, вытеснение кэша) — полный пересчёт.
+    """
+    started_at = timezone.now()
+    since = cache.get(RANKING_WATERMARK_KEY)
+    book_ids = None if since is None else stale_ranking_ids(since)
+
+    refreshed = refresh_rankings(book_ids)
+    cache.set(RANKING_WATERMARK_KEY, started_at, None)
+    return refreshed
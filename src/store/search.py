@@ -0,0 +1,633 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import unicodedata
+import weakref
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.urls import reverse
+
+from .breaker import CircuitBreaker
+from .cache import CATALOG_NAMESPACE, versioned_key
+from .metrics import aincr_counter, get_counters, incr_counter
+from .models import Book
+from .search_backends import get_search_backend
+from .utils import GENRE_MATCH_ALL, resolve_genre_terms
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TIMEOUT = 60 * 5
+SEARCH_RESULTS_LIMIT = 20
+
+AUTOCOMPLETE_TIMEOUT = 60 * 5
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MIN_LENGTH = 2
+AUTOCOMPLETE_FIELDS = ("title", "author", "slug")
+
+# Поля, которые нужны шаблону search_result.html
+SEARCH_RENDER_FIELDS = (
+    "id",
+    "slug",
+    "title",
+    "author",
+    "price",
+    "discounted_price",
+    "photo",
+)
+# Те же поля берутся из _source документа, поэтому ES-выдача не ходит в БД
+SEARCH_SOURCE_FIELDS = SEARCH_RENDER_FIELDS[1:]
+
+
+@dataclass
+class SearchResult:
+    book_ids: list
+    json_payload: str
+    # Книги уже загружены, если результат только что посчитан
+    _books: list = field(default=None, repr=False)
+
+    @property
+    def books(self):
+        if self._books is None:
+            self._books = hydrate_books(self.book_ids)
+        return self._books
+
+    async def aget_books(self):
+        if self._books is None:
+            self._books = await ahydrate_books(self.book_ids)
+        return self._books
+
+
+def normalize_query(query):
+    """Приводит запрос к канонической форме: NFKC, регистр, пробелы."""
+    query = unicodedata.normalize("NFKC", query or "")
+    return " ".join(query.casefold().split())
+
+
+def search_cache_key(query):
+    """Ключ результатов поиска: хэш нормализованного запроса в версии каталога."""
+    digest = hashlib.sha1(query.encode("utf-8")).hexdigest()
+    return versioned_key(CATALOG_NAMESPACE, "search", digest)
+
+
+es_breaker = CircuitBreaker(
+    "search:es",
+    threshold=settings.SEARCH_ES_FAILURE_THRESHOLD,
+    cooldown=settings.SEARCH_ES_COOLDOWN,
+    # Проба ограничена таймаутом ES; зависшая проба не держит цепь дольше
+    probe_timeout=math.ceil(settings.SEARCH_ES_TIMEOUT) + 1,
+)
+
+# Асинхронные клиенты привязаны к своему event loop
+_async_es_clients = weakref.WeakKeyDictionary()
+
+
+def build_es_search(search, query):
+    """Продвинутый запрос с бустами и опечатками поверх Search/AsyncSearch."""
+    return search.query(
+        "bool",
+        should=[
+            {"match": {"title": {"query": query, "boost": 5}}},
+            {"match": {"author": {"query": query, "boost": 3}}},
+            {"fuzzy": {"title": {"value": query, "fuzziness": "AUTO"}}},
+            {"fuzzy": {"author": {"value": query, "fuzziness": "AUTO"}}},
+            {"wildcard": {"title": {"value": f"*{query}*", "boost": 2}}},
+            {"wildcard": {"author": {"value": f"*{query}*", "boost": 2}}},
+            {"match": {"description": {"query": query, "boost": 1}}},
+        ],
+        minimum_should_match=1,
+    ).source(list(SEARCH_SOURCE_FIELDS))[:SEARCH_RESULTS_LIMIT]
+
+
+def to_decimal(value):
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(Decimal("0.01"))
+
+
+def book_from_hit(hit):
+    """Несохраняемая книга для шаблона, собранная из _source попадания."""
+    source = hit.to_dict()
+    return Book(
+        # _id документа совпадает с pk книги
+        pk=int(hit.meta.id),
+        slug=source.get("slug"),
+        title=source.get("title"),
+        author=source.get("author"),
+        price=to_decimal(source.get("price")),
+        discounted_price=to_decimal(source.get("discounted_price")),
+        photo=source.get("photo"),
+    )
+
+
+def get_es_client():
+    from elasticsearch_dsl.connections import connections
+
+    return connections.get_connection().options(
+        request_timeout=settings.SEARCH_ES_TIMEOUT
+    )
+
+
+def search_books_es(query):
+    """Упорядоченные по score книги, собранные из попаданий Elasticsearch."""
+    from .documents import BookDocument
+
+    search = build_es_search(BookDocument.search(using=get_es_client()), query)
+    return [book_from_hit(hit) for hit in search.execute()]
+
+
+def get_async_es_client():
+    """Асинхронный клиент ES или None, если не установлен aiohttp."""
+    loop = asyncio.get_running_loop()
+    client = _async_es_clients.get(loop)
+    if client is None:
+        from elasticsearch import AsyncElasticsearch
+
+        try:
+            client = AsyncElasticsearch(**settings.ELASTICSEARCH_DSL["default"])
+        except ValueError:
+            # elasticsearch[async] не установлен
+            return None
+        _async_es_clients[loop] = client
+    return client
+
+
+async def asearch_books_es(query):
+    client = get_async_es_client()
+    if client is None:
+        # Без aiohttp выполняем синхронный клиент в отдельном потоке
+        return await sync_to_async(search_books_es, thread_sensitive=False)(query)
+
+    from elasticsearch_dsl import AsyncSearch
+
+    from .documents import BookDocument
+
+    client = client.options(request_timeout=settings.SEARCH_ES_TIMEOUT)
+    search = build_es_search(
+        AsyncSearch(using=client, index=BookDocument.Index.name), query
+    )
+    return [book_from_hit(hit) async for hit in await search.execute()]
+
+
+def _db_search_queryset(query):
+    return get_search_backend().book_ids(query)[:SEARCH_RESULTS_LIMIT]
+
+
+def search_books_db(query):
+    """Фоллбек на поиск в БД через бэкенд из settings.SEARCH_DB_BACKEND."""
+    return hydrate_books(list(_db_search_queryset(query)))
+
+
+async def asearch_books_db(query):
+    return await ahydrate_books([pk async for pk in _db_search_queryset(query)])
+
+
+def build_json_payload(books):
+    """Готовый JSON-ответ для format=json, хранится в кэше как строка."""
+    return json.dumps(
+        {
+            "results": [
+                {
+                    "title": book.title,
+                    "author": book.author,
+                    "url": book.get_absolute_url(),
+                }
+                for book in books
+            ]
+        },
+        ensure_ascii=False,
+    )
+
+
+def hydrate_books(book_ids):
+    """Один in_bulk() по id с полями для отображения, порядок сохраняется."""
+    if not book_ids:
+        return []
+    books = Book.objects.only(*SEARCH_RENDER_FIELDS).in_bulk(book_ids)
+    # Книги, удалённые после индексации, просто пропускаются
+    return [books[pk] for pk in book_ids if pk in books]
+
+
+async def ahydrate_books(book_ids):
+    if not book_ids:
+        return []
+    books = await Book.objects.only(*SEARCH_RENDER_FIELDS).ain_bulk(book_ids)
+    return [books[pk] for pk in book_ids if pk in books]
+
+
+def with_es_fallback(es_search, db_search, query):
+    """
+    Выполняет es_search, а при ошибке или разомкнутом breaker — db_search.
+    Запрос к ES ограничен SEARCH_ES_TIMEOUT.
+    """
+    if not es_breaker.allow_request():
+        incr_counter("search_fallback_total", reason="breaker_open")
+        return db_search(query)
+
+    try:
+        result = es_search(query)
+    except Exception:
+        logger.warning("Elasticsearch search failed", exc_info=True)
+        es_breaker.record_failure()
+        incr_counter("search_fallback_total", reason="error")
+        return db_search(query)
+
+    es_breaker.record_success()
+    incr_counter("search_es_requests_total", outcome="success")
+    return result
+
+
+def find_books(query):
+    """Книги из Elasticsearch, а при недоступности ES — из БД."""
+    return with_es_fallback(search_books_es, search_books_db, query)
+
+
+async def afind_books(query):
+    """Асинхронный вариант find_books со строгим дедлайном на ES."""
+    if not await es_breaker.aallow_request():
+        await aincr_counter("search_fallback_total", reason="breaker_open")
+        return await asearch_books_db(query)
+
+    try:
+        books = await asyncio.wait_for(
+            asearch_books_es(query), timeout=settings.SEARCH_ES_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        reason = "timeout"
+    except Exception:
+        logger.warning("Elasticsearch search failed", exc_info=True)
+        reason = "error"
+    else:
+        await es_breaker.arecord_success()
+        await aincr_counter("search_es_requests_total", outcome="success")
+        return books
+
+    await es_breaker.arecord_failure()
+    await aincr_counter("search_fallback_total", reason=reason)
+    return await asearch_books_db(query)
+
+
+def _empty_result():
+    return SearchResult([], build_json_payload([]), [])
+
+
+def _build_result(books):
+    result = SearchResult([book.pk for book in books], build_json_payload(books), books)
+    # В кэш попадают только id и готовый JSON
+    return result, (result.book_ids, result.json_payload)
+
+
+def search_books(query):
+    """
+    Возвращает SearchResult для запроса.
+    В кэше хранится только компактный список id и готовый JSON,
+    а не модели целиком.
+    """
+    query = normalize_query(query)
+    if not query:
+        return _empty_result()
+
+    cache_key = search_cache_key(query)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return SearchResult(*cached)
+
+    books = find_books(query)
+    result, payload = _build_result(books)
+    cache.set(cache_key, payload, SEARCH_TIMEOUT)
+    return result
+
+
+async def asearch_books(query):
+    """Асинхронный вариант search_books для AsyncBookSearchView."""
+    query = normalize_query(query)
+    if not query:
+        return _empty_result()
+
+    cache_key = search_cache_key(query)
+    cached = await cache.aget(cache_key)
+    if cached is not None:
+        return SearchResult(*cached)
+
+    books = await afind_books(query)
+    result, payload = _build_result(books)
+    await cache.aset(cache_key, payload, SEARCH_TIMEOUT)
+    return result
+
+
+def autocomplete_cache_key(prefix):
+    digest = hashlib.sha1(prefix.encode("utf-8")).hexdigest()
+    return versioned_key(CATALOG_NAMESPACE, "autocomplete", digest)
+
+
+def autocomplete_es(prefix):
+    """Подсказки по edge n-gram полям BookDocument: без wildcard и fuzzy."""
+    from .documents import BookDocument
+
+    search = (
+        BookDocument.search(using=get_es_client())
+        .query(
+            "multi_match",
+            query=prefix,
+            fields=["title.autocomplete^3", "author.autocomplete"],
+            operator="and",
+        )
+        .filter("term", is_published=True)
+        .source(list(AUTOCOMPLETE_FIELDS))[:AUTOCOMPLETE_LIMIT]
+    )
+    return [
+        {name: getattr(hit, name, "") for name in AUTOCOMPLETE_FIELDS}
+        for hit in search.execute()
+    ]
+
+
+def autocomplete_db(prefix):
+    """Фоллбек: префикс названия или автора (триграммные индексы UPPER(...))."""
+    return list(
+        Book.objects.published()
+        .filter(Q(title__istartswith=prefix) | Q(author__istartswith=prefix))
+        .order_by("title")
+        .values(*AUTOCOMPLETE_FIELDS)[:AUTOCOMPLETE_LIMIT]
+    )
+
+
+def autocomplete(prefix):
+    """
+    Не более AUTOCOMPLETE_LIMIT облегчённых подсказок для префикса.
+    Ответ кэшируется по нормализованному префиксу в версии каталога.
+    """
+    prefix = normalize_query(prefix)
+    if len(prefix) < AUTOCOMPLETE_MIN_LENGTH:
+        return []
+
+    cache_key = autocomplete_cache_key(prefix)
+    results = cache.get(cache_key)
+    if results is None:
+        rows = with_es_fallback(autocomplete_es, autocomplete_db, prefix)
+        results = [
+            {**row, "url": reverse("book-detail", kwargs={"book_slug": row["slug"]})}
+            for row in rows
+        ]
+        cache.set(cache_key, results, AUTOCOMPLETE_TIMEOUT)
+    return results
+
+
+# Выдача каталога из ES: поля документа в формате BookSerializer
+CATALOG_SOURCE_FIELDS = (
+    "title",
+    "description",
+    "author",
+    "price",
+    "genres",
+    "discounted_price",
+    "final_price",
+    "discount_percentage",
+    "in_stock",
+    "average_rating",
+    "rating_count",
+    "slug",
+)
+# Поля ключа сортировки курсорной пагинации и соответствующие поля индекса
+CATALOG_ORDERING = {
+    "_score": "_score",
+    "price": "price",
+    "title": "title.raw",
+    "time_create": "time_create",
+    "id": "id",
+}
+CATALOG_PRICE_RANGES = [
+    {"key": "under-10", "to": 10},
+    {"key": "10-25", "from": 10, "to": 25},
+    {"key": "25-50", "from": 25, "to": 50},
+    {"key": "50-plus", "from": 50},
+]
+CATALOG_GENRE_FACET_SIZE = 50
+CATALOG_YEAR_FACET_INTERVAL = 10
+
+
+@dataclass
+class CatalogQuery:
+    query: str = ""
+    # cleaned_data формы BookFilter
+    filters: dict = field(default_factory=dict)
+    # Ключ сортировки в стиле OrderingFilter ('-price', 'id'), последний — уникальный
+    ordering: list = field(default_factory=list)
+    # Ключ граничной записи из курсора и направление чтения от неё
+    search_after: list = None
+    reverse: bool = False
+    limit: int = 10
+
+
+@dataclass
+class CatalogPage:
+    count: int
+    results: list
+    facets: dict
+    # Ключи сортировки первой и последней книги страницы
+    keys: list = field(default_factory=list)
+    # Есть ли книги за страницей в направлении чтения
+    has_more: bool = False
+
+
+def build_catalog_filters(filters):
+    """Условия BookFilter в виде filter-контекста bool-запроса ES."""
+    filters = {
+        name: value for name, value in filters.items() if value not in ("", None)
+    }
+
+    conditions = [{"term": {"is_published": True}}]
+    for name in ("title", "author"):
+        if name in filters:
+            conditions.append(
+                {"match": {name: {"query": filters[name], "operator": "and"}}}
+            )
+    conditions += build_genre_filters(filters.get("genre"), filters.get("genre_match"))
+    if "isbn" in filters:
+        conditions.append({"wildcard": {"isbn": f"*{filters['isbn'].lower()}*"}})
+    if "publication_year" in filters:
+        conditions.append({"term": {"publication_year": filters["publication_year"]}})
+    if filters.get("has_discount"):
+        conditions.append({"exists": {"field": "discounted_price"}})
+    if filters.get("in_stock"):
+        conditions.append({"term": {"in_stock": True}})
+
+    ranges = {
+        "price": ("min_price", "max_price"),
+        "publication_year": ("min_year", "max_year"),
+        "pages": ("min_pages", "max_pages"),
+    }
+    for es_field, (low, high) in ranges.items():
+        bounds = {}
+        if low in filters:
+            bounds["gte"] = float(filters[low])
+        if high in filters:
+            bounds["lte"] = float(filters[high])
+        if bounds:
+            conditions.append({"range": {es_field: bounds}})
+    return conditions
+
+
+def build_genre_filters(terms, match):
+    """
+    Значения фильтра жанров сопоставляются с точными названиями по индексу
+    жанров, как и в БД; пустой список terms в ES не находит ничего.
+    """
+    genre_sets = resolve_genre_terms(terms)
+    if not genre_sets:
+        return []
+    if match == GENRE_MATCH_ALL:
+        return [
+            {"terms": {"genres.raw": sorted(genres.values())}} for genres in genre_sets
+        ]
+    names = set().union(*(genres.values() for genres in genre_sets))
+    return [{"terms": {"genres.raw": sorted(names)}}]
+
+
+def build_catalog_sort(ordering, reverse=False):
+    """Сортировка ES по ключу в стиле OrderingFilter: 'price', '-id' и т.п."""
+    sort = []
+    for term in ordering:
+        descending = term.startswith("-") != reverse
+        es_field = CATALOG_ORDERING[term.lstrip("-")]
+        sort.append({es_field: {"order": "desc" if descending else "asc"}})
+    return sort
+
+
+def build_catalog_search(search, catalog_query):
+    """Поиск, фильтры, сортировка, страница и фасеты одним запросом к ES."""
+    if catalog_query.query:
+        must = [
+            {
+                "multi_match": {
+                    "query": catalog_query.query,
+                    "fields": ["title^5", "author^3", "description"],
+                    "fuzziness": "AUTO",
+                }
+            }
+        ]
+    else:
+        must = [{"match_all": {}}]
+
+    search = search.query(
+        "bool", must=must, filter=build_catalog_filters(catalog_query.filters)
+    )
+    search = search.sort(
+        *build_catalog_sort(catalog_query.ordering, catalog_query.reverse)
+    )
+    if catalog_query.search_after:
+        # Keyset-пагинация: глубина страницы не влияет на стоимость запроса
+        search = search.extra(search_after=catalog_query.search_after)
+    search = search.source(list(CATALOG_SOURCE_FIELDS)).extra(track_total_hits=True)
+
+    search.aggs.bucket(
+        "genres", "terms", field="genres.raw", size=CATALOG_GENRE_FACET_SIZE
+    )
+    search.aggs.bucket(
+        "price", "range", field="final_price", ranges=CATALOG_PRICE_RANGES
+    )
+    search.aggs.bucket(
+        "publication_year",
+        "histogram",
+        field="publication_year",
+        interval=CATALOG_YEAR_FACET_INTERVAL,
+        min_doc_count=1,
+    )
+    search.aggs.bucket("in_stock", "terms", field="in_stock")
+
+    # Лишняя книга показывает, есть ли страница дальше
+    return search[: catalog_query.limit + 1]
+
+
+def parse_catalog_facets(aggregations):
+    """Бакеты агрегаций в виде {фасет: [{"value": ..., "count": ...}]}."""
+    facets = {}
+    for name in ("genres", "price", "publication_year"):
+        facets[name] = [
+            {"value": bucket["key"], "count": bucket["doc_count"]}
+            for bucket in aggregations[name]["buckets"]
+        ]
+    facets["publication_year"] = [
+        {**bucket, "value": int(bucket["value"])}
+        for bucket in facets["publication_year"]
+    ]
+    facets["in_stock"] = [
+        {"value": bucket["key_as_string"] == "true", "count": bucket["doc_count"]}
+        for bucket in aggregations["in_stock"]["buckets"]
+    ]
+    return facets
+
+
+def search_catalog_es(catalog_query):
+    """
+    Страница каталога целиком из Elasticsearch: книги из _source попаданий
+    и количество книг по фасетам (жанры, цена, десятилетие, наличие).
+    """
+    from .documents import BookDocument
+
+    search = build_catalog_search(
+        BookDocument.search(using=get_es_client()), catalog_query
+    )
+    response = search.execute()
+    hits = list(response)
+    has_more = len(hits) > catalog_query.limit
+    hits = hits[: catalog_query.limit]
+    if catalog_query.reverse:
+        hits.reverse()
+
+    results = []
+    for hit in hits:
+        source = hit.to_dict()
+        results.append({name: source.get(name) for name in CATALOG_SOURCE_FIELDS})
+    return CatalogPage(
+        count=response.hits.total.value,
+        results=results,
+        facets=parse_catalog_facets(response.aggregations.to_dict()),
+        keys=[list(hit.meta.sort) for hit in hits[:1] + hits[-1:]],
+        has_more=has_more,
+    )
+
+
+def search_catalog(catalog_query):
+    """CatalogPage из ES или None, если ES недоступен (ответ строит БД)."""
+    return with_es_fallback(
+        search_catalog_es, lambda catalog_query: None, catalog_query
+    )
+
+
+def get_search_metrics():
+    """Метрики поиска для экспорта в формате Prometheus."""
+    return [
+        (
+            "search_es_requests_total",
+            "counter",
+            "Successful Elasticsearch searches.",
+            get_counters("search_es_requests_total", [{"outcome": "success"}]),
+        ),
+        (
+            "search_fallback_total",
+            "counter",
+            "Searches served by the database fallback, by reason.",
+            get_counters(
+                "search_fallback_total",
+                [{"reason": reason} for reason in ("error", "timeout", "breaker_open")],
+            ),
+        ),
+        (
+            "search_breaker_opened_total",
+            "counter",
+            "Times the Elasticsearch circuit breaker opened.",
+            get_counters("breaker_opened_total", [{"breaker": es_breaker.name}]),
+        ),
+        (
+            "search_breaker_open",
+            "gauge",
+            "1 while searches skip Elasticsearch.",
+            [({}, int(es_breaker.is_open()))],
+        ),
+    ]
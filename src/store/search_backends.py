@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
+from django.db.models import F, Q
+from django.db.models.functions import Upper
+from django.utils.module_loading import import_string
+
+from .models import Book
+
+# Конфигурация совпадает с функцией store_book_search_vector из миграции 0011
+SEARCH_CONFIG = "simple"
+
+# Веса ts_rank в порядке D, C, B, A: title:author:description ≈ 5:3:1, как бусты ES
+SEARCH_RANK_WEIGHTS = [0.2, 0.2, 0.6, 1.0]
+
+
+class IContainsSearchBackend:
+    """Поиск подстроки в названии и авторе (для SQLite и окружений без pg_trgm)."""
+
+    def book_ids(self, query):
+        return Book.objects.filter(
+            Q(title__icontains=query) | Q(author__icontains=query)
+        ).values_list("pk", flat=True)
+
+
+class PostgresSearchBackend:
+    """
+    Поиск средствами PostgreSQL: полнотекстовый search_vector (GIN),
+    подстрока и опечатки через триграммные GIN-индексы по UPPER(title/author).
+    Все условия обслуживаются индексами, поэтому задержка не растёт
+    линейно с размером каталога.
+    """
+
+    def book_ids(self, query):
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+        upper_query = query.upper()
+
+        return (
+            Book.objects.alias(upper_title=Upper("title"), upper_author=Upper("author"))
+            .filter(
+                Q(search_vector=search_query)
+                | Q(upper_title__contains=upper_query)
+                | Q(upper_author__contains=upper_query)
+                | Q(upper_title__trigram_word_similar=upper_query)
+                | Q(upper_author__trigram_word_similar=upper_query)
+            )
+            .annotate(
+                rank=SearchRank(
+                    F("search_vector"), search_query, weights=SEARCH_RANK_WEIGHTS
+                )
+                + TrigramWordSimilarity(upper_query, "upper_title") * 0.5
+                + TrigramWordSimilarity(upper_query, "upper_author") * 0.3
+            )
+            .order_by("-rank", "pk")
+            .values_list("pk", flat=True)
+        )
+
+
+def get_search_backend():
+    """Бэкенд поиска в БД из settings.SEARCH_DB_BACKEND."""
+    return import_string(settings.SEARCH_DB_BACKEND)()
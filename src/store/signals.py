@@ -1,31 +1,84 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import m2m_changed, post_save, post_delete
 from django.dispatch import receiver
 
-from store.tasks import send_new_book_notification_task
-
-from .models import Book, Subscription
+from .batch import get_current_batch
+from .cache import (
+    CATALOG_NAMESPACE,
+    HOME_BOOKS_NAMESPACE,
+    HOME_QUOTE_NAMESPACE,
+    bump_cache_version_on_commit,
+)
+from .models import Book, BookRanking, Genre, PendingBookNotification, Quote
+from .utils import invalidate_genre_index, invalidate_random_pick
 
 
 @receiver(post_save, sender=Book)
 @receiver(post_delete, sender=Book)
 def clear_book_cache(sender, instance, **kwargs):
-    """Удаление всего кэша после добавления/удаления новой книги."""
-    from django.core.cache import cache
-    from django.core.cache.backends.base import BaseCache
+    """Инвалидация кэша каталога после изменения/удаления книги.
+
+    Вместо сканирования ключей увеличиваем версию пространства имён:
+    старые ключи становятся недостижимыми и истекают по TTL.
+    Внутри catalog_batch() только запоминаем id — инвалидация будет одна на пакет.
+    """
+    batch = get_current_batch()
+    if batch is not None:
+        batch.record(instance.pk, created=kwargs.get("created", False))
+        return
+
+    bump_cache_version_on_commit(CATALOG_NAMESPACE, HOME_BOOKS_NAMESPACE)
+
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def clear_book_genres_cache(sender, instance, action, **kwargs):
+    """Жанры книги входят в кэшированную карточку — инвалидируем каталог."""
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_cache_version_on_commit(CATALOG_NAMESPACE)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def clear_genre_cache(sender, instance, **kwargs):
+    """Инвалидация кэша каталога и индекса названий после изменения жанров."""
+    bump_cache_version_on_commit(CATALOG_NAMESPACE)
+    invalidate_genre_index()
+
 
-    # Проверяем, есть ли метод delete_pattern
-    if hasattr(cache, "delete_pattern"):
-        cache.delete_pattern("search_*")
-        cache.delete("all_books")
-    # Альтернатива для DummyCache и других бэкендов без delete_pattern
-    elif hasattr(cache, "clear"):
-        cache.clear()  # Полная очистка (если доступна)
+@receiver(post_save, sender=Book)
+def create_book_ranking(sender, instance, created, **kwargs):
+    """Новая книга сразу попадает в рейтинги с нулевой оценкой.
+
+    Книги из пакетного импорта добавит ближайший пересчёт рейтингов.
+    """
+    if created and get_current_batch() is None:
+        BookRanking.objects.get_or_create(book=instance)
 
 
 @receiver(post_save, sender=Book)
 def send_new_book_notification(sender, instance, created, **kwargs):
-    """Отправка рассылки при добавлении новой книги через Celery."""
+    """Новая книга попадает в очередь дайджеста вместо отдельной рассылки.
+
+    Письмо подписчикам уходит одно на окно: см. send_new_books_digest_task.
+    В пакетном режиме очередь пополняет сам пакет.
+    """
+    if created and get_current_batch() is None:
+        PendingBookNotification.objects.get_or_create(book=instance)
+
 
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=Quote)
+@receiver(post_delete, sender=Quote)
+def refresh_random_pick(sender, instance, created=True, **kwargs):
+    """Сброс границ pk для случайного выбора при появлении/удалении записей."""
+    if sender is Book and get_current_batch() is not None:
+        return
     if created:
-        # Передаем минимум данных в Celery, чтобы не блокировать поток
-        send_new_book_notification_task.delay(instance.pk)
+        invalidate_random_pick(sender)
+
+
+@receiver(post_save, sender=Quote)
+@receiver(post_delete, sender=Quote)
+def clear_quote_cache(sender, instance, **kwargs):
+    """Инвалидация блока цитаты на главной странице."""
+    bump_cache_version_on_commit(HOME_QUOTE_NAMESPACE)
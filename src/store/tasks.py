@@ -1,36 +1,298 @@
+import uuid
+from datetime import timedelta
+from itertools import islice
+from smtplib import SMTPException
+
 from celery import shared_task
-from django.core.mail import send_mail
+from elasticsearch import ApiError, TransportError
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
 from django.core import signing
+from django.db import transaction
 from django.urls import reverse
+from django.utils import timezone
 
+from store.indexing import IndexSyncError
 
-@shared_task
-def send_new_book_notification_task(book_id: int) -> int:
-    """Готовит список подписчиков и шлёт уведомление о новой книге.
-    Возвращает количество адресов для отправки.
+# Размер порции подписчиков на одну подзадачу и одно SMTP-соединение
+NEWSLETTER_CHUNK_SIZE = 500
+# Сколько хранится отметка об успешно отправленной порции
+NEWSLETTER_CHUNK_DONE_TIMEOUT = 60 * 60 * 24 * 7
+# Отметки о доставке пишутся пачками по столько писем (и при любой ошибке)
+NEWSLETTER_PROGRESS_BATCH_SIZE = 50
+# Сколько хранятся записи о доставленных письмах
+NEWSLETTER_DELIVERY_RETENTION = timedelta(days=7)
+
+
+def get_recipients(subscribed_before=None, campaign_id=None):
+    """Активные подписчики; с subscribed_before — только подписавшиеся раньше,
+    с campaign_id — только те, кому письмо этой рассылки ещё не отправлено
+    (по записям NewsletterDelivery, а не по last_sent от других рассылок)."""
+    from store.models import Subscription
+
+    recipients = Subscription.objects.filter(is_active=True)
+    if subscribed_before is not None:
+        recipients = recipients.filter(date_subscribed__lt=subscribed_before)
+    if campaign_id is not None:
+        recipients = recipients.exclude(deliveries__campaign_id=campaign_id)
+    return recipients
+
+
+def send_to_subscribers(
+    subject: str, base_message: str, campaign_id=None, subscribed_before=None
+) -> int:
+    """Разбивает активных подписчиков на порции по возрастанию pk и ставит
+    на каждую порцию отдельную подзадачу. Возвращает количество адресов для отправки.
+    """
+    campaign_id = campaign_id or uuid.uuid4().hex
+    if subscribed_before is not None:
+        subscribed_before = subscribed_before.isoformat()
+
+    subscriber_ids = (
+        get_recipients(subscribed_before, campaign_id)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+        .iterator(chunk_size=NEWSLETTER_CHUNK_SIZE)
+    )
+    count = 0
+
+    while chunk := list(islice(subscriber_ids, NEWSLETTER_CHUNK_SIZE)):
+        send_newsletter_chunk_task.delay(
+            campaign_id, subject, base_message, chunk[0], chunk[-1], subscribed_before
+        )
+        count += len(chunk)
+
+    return count
+
+
+@shared_task(
+    autoretry_for=(SMTPException, OSError),
+    retry_backoff=True,
+    retry_kwargs={"max_retries": 5},
+)
+def send_newsletter_chunk_task(
+    campaign_id: str,
+    subject: str,
+    base_message: str,
+    first_pk: int,
+    last_pk: int,
+    subscribed_before: str | None = None,
+) -> int:
+    """Отправляет письмо порции подписчиков [first_pk, last_pk] через одно соединение.
+    Каждое письмо отмечается как доставленное сразу после отправки, поэтому
+    повтор после ошибки SMTP шлёт только тем, кто письма ещё не получил.
+    Возвращает количество писем.
     """
-    from store.models import Book, Subscription
+    from store.models import NewsletterDelivery, Subscription
 
-    book = Book.objects.filter(pk=book_id).first()
-    if not book:
+    done_key = f"newsletter:{campaign_id}:{first_pk}-{last_pk}"
+    if cache.get(done_key):
         return 0
 
-    subscribers = Subscription.objects.filter(is_active=True).values_list(
-        "email", flat=True
+    subscribers = list(
+        get_recipients(subscribed_before, campaign_id)
+        .filter(pk__gte=first_pk, pk__lte=last_pk)
+        .order_by("pk")
+        .values_list("pk", "email")
     )
-    count = 0
+    if not subscribers:
+        cache.set(done_key, True, NEWSLETTER_CHUNK_DONE_TIMEOUT)
+        return 0
 
-    subject = f"New Book Added: {book.title}"
-    base_message = f"We've added a new book: {book.title}. Check it out here: {settings.SITE_URL}{book.get_absolute_url()}"
+    # Токены и ссылки считаем до открытия соединения
+    unsubscribe_url = f"{settings.SITE_URL}{reverse('unsubscribe')}"
+    tokens = {
+        email: signing.dumps(email, salt="unsubscribe") for _, email in subscribers
+    }
+    messages = [
+        (
+            pk,
+            EmailMessage(
+                subject,
+                f"{base_message}\n\nTo unsubscribe: {unsubscribe_url}?t={tokens[email]}",
+                settings.DEFAULT_FROM_EMAIL,
+                [email],
+            ),
+        )
+        for pk, email in subscribers
+    ]
+
+    sent_pks = []
 
-    for email in subscribers:
-        token = signing.dumps(email, salt="unsubscribe")
-        unsubscribe_link = f"{settings.SITE_URL}{reverse('unsubscribe')}?={token}"
-        message = f"{base_message}\n\nTo unsubscribe: {unsubscribe_link}"
-        send_mail(
-            subject, message, settings.DEFAULT_FROM_EMAIL, [email], fail_silently=False
+    def record_sent():
+        if not sent_pks:
+            return
+        NewsletterDelivery.objects.bulk_create(
+            [
+                NewsletterDelivery(campaign_id=campaign_id, subscription_id=pk)
+                for pk in sent_pks
+            ],
+            ignore_conflicts=True,
         )
-        count += 1
+        Subscription.objects.filter(pk__in=sent_pks).update(last_sent=timezone.now())
+        sent_pks.clear()
 
-    return count
+    sent = 0
+    connection = get_connection(fail_silently=False)
+    # Письма уходят по одному через общее соединение: при ошибке
+    # отправленные до неё уже записаны и при повторе пропускаются
+    try:
+        with connection:
+            for pk, message in messages:
+                connection.send_messages([message])
+                sent_pks.append(pk)
+                sent += 1
+                if len(sent_pks) >= NEWSLETTER_PROGRESS_BATCH_SIZE:
+                    record_sent()
+    finally:
+        record_sent()
+
+    cache.set(done_key, True, NEWSLETTER_CHUNK_DONE_TIMEOUT)
+    return sent
+
+
+@shared_task
+def send_new_book_notification_task(book_id: int) -> int:
+    """Устарела: оставлена для сообщений, уже стоящих в очереди брокера.
+    Книга ставится в очередь дайджеста вместо отдельной рассылки.
+    Удалить в следующем релизе.
+    """
+    from store.models import Book, PendingBookNotification
+
+    if Book.objects.filter(pk=book_id).exists():
+        PendingBookNotification.objects.get_or_create(book_id=book_id)
+    return 0
+
+
+def send_digest(digest) -> int:
+    """Рассылает дайджест тем, кто его ещё не получил, и сохраняет метрики."""
+    books = list(digest.books.only("title", "slug"))
+
+    recipients = 0
+    if books:
+        subject = f"New Books Added: {len(books)}"
+        lines = [
+            f"- {book.title}: {settings.SITE_URL}{book.get_absolute_url()}"
+            for book in books
+        ]
+        base_message = "We've added new books:\n" + "\n".join(lines)
+        recipients = send_to_subscribers(
+            subject,
+            base_message,
+            campaign_id=f"digest-{digest.pk}",
+            subscribed_before=digest.created_at,
+        )
+
+    digest.books_count = len(books)
+    digest.recipients_count = recipients
+    digest.queued_at = timezone.now()
+    digest.save(update_fields=["books_count", "recipients_count", "queued_at"])
+    return recipients
+
+
+@shared_task
+def send_new_books_digest_task() -> int:
+    """Периодическая задача: собирает книги из очереди за окно в один дайджест
+    и рассылает его. Возвращает количество адресов для отправки.
+    """
+    from store.models import NewBooksDigest, PendingBookNotification
+
+    with transaction.atomic():
+        pending = list(
+            PendingBookNotification.objects.select_for_update(skip_locked=True)
+        )
+        if pending:
+            # Недоотправленный дайджест (упала постановка) дополняем, а не плодим;
+            # дайджест, который сейчас рассылает другой запуск, не трогаем
+            digest = (
+                NewBooksDigest.objects.select_for_update(skip_locked=True)
+                .filter(queued_at__isnull=True)
+                .first()
+            )
+            if digest is None:
+                digest = NewBooksDigest.objects.create(
+                    window_start=min(item.created_at for item in pending)
+                )
+            digest.books.add(*[item.book_id for item in pending])
+            PendingBookNotification.objects.filter(
+                pk__in=[item.pk for item in pending]
+            ).delete()
+
+    recipients = 0
+    digest_ids = list(
+        NewBooksDigest.objects.filter(queued_at__isnull=True)
+        .order_by("created_at")
+        .values_list("pk", flat=True)
+    )
+    for digest_id in digest_ids:
+        # Дайджест захватывается блокировкой строки: пересекающиеся запуски
+        # по расписанию пропускают его, а не рассылают второй раз
+        with transaction.atomic():
+            digest = (
+                NewBooksDigest.objects.select_for_update(skip_locked=True)
+                .filter(pk=digest_id, queued_at__isnull=True)
+                .first()
+            )
+            if digest is not None:
+                recipients += send_digest(digest)
+
+    return recipients
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(ApiError, TransportError, IndexSyncError),
+    retry_backoff=True,
+    retry_backoff_max=600,
+    retry_jitter=True,
+    max_retries=10,
+)
+def sync_search_index_task(self) -> int:
+    """Сбрасывает очередь индексации в Elasticsearch bulk-запросами.
+    При ошибке ES строки остаются в очереди, задача повторяется с backoff.
+    Возвращает количество синхронизированных книг.
+    """
+    from store.indexing import INDEX_FLUSH_SCHEDULED_KEY, flush_index_queue
+
+    # Изменения, пришедшие во время сброса, запланируют новую задачу
+    cache.delete(INDEX_FLUSH_SCHEDULED_KEY)
+
+    total = 0
+    while synced := flush_index_queue():
+        total += synced
+    return total
+
+
+@shared_task
+def reconcile_search_index_task(sweep_orphans: bool = False) -> int:
+    """Периодическая сверка индекса books с БД по водяному знаку time_update.
+    С sweep_orphans=True дополнительно просматривает весь индекс в поисках
+    документов удалённых книг (ночной запуск).
+    """
+    from store.indexing import reconcile_index
+
+    return reconcile_index(sweep_orphans=sweep_orphans)
+
+
+@shared_task
+def refresh_book_rankings_task(full: bool = False) -> int:
+    """Пересчитывает материализованные рейтинги книг: по умолчанию только
+    затронутые с прошлого запуска, с full=True — все. Возвращает количество книг.
+    """
+    from store.rankings import refresh_rankings, refresh_stale_rankings
+
+    if full:
+        return refresh_rankings()
+    return refresh_stale_rankings()
+
+
+@shared_task
+def delete_old_newsletter_deliveries() -> int:
+    """Удаляет записи о доставке старше NEWSLETTER_DELIVERY_RETENTION."""
+    from store.models import NewsletterDelivery
+
+    deleted, _ = NewsletterDelivery.objects.filter(
+        sent_at__lt=timezone.now() - NEWSLETTER_DELIVERY_RETENTION
+    ).delete()
+    return deleted
@@ -0,0 +1,128 @@
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+
+from store.cache import CATALOG_NAMESPACE, get_cache_version
+from store.importers import BookImporter, read_rows
+from store.models import Book, Genre, PendingBookNotification
+
+CSV_DATA = """title,author,description,price,discounted_price,stock_quantity,genres
+Imported One,Author A,First,10.00,,5,Fiction;Drama
+Imported Two,Author B,Second,20.00,15.00,0,Fiction
+Broken Discount,Author C,Third,10.00,12.00,1,
+,Author D,No title,5.00,,1,
+"""
+
+
+@pytest.mark.django_db
+class TestBookImporter:
+    def test_csv_import_creates_books_with_one_batch_side_effect(
+        self, django_capture_on_commit_callbacks, skip_index_flush
+    ):
+        version = get_cache_version(CATALOG_NAMESPACE)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            result = BookImporter(chunk_size=2).run(
+                read_rows(io.StringIO(CSV_DATA), "csv")
+            )
+
+        assert (result.created, result.updated) == (2, 0)
+        assert [line for line, _ in result.errors] == [4, 5]
+
+        book = Book.objects.get(slug="imported-one")
+        assert set(book.genre.values_list("name", flat=True)) == {"Fiction", "Drama"}
+        assert Genre.objects.filter(name="Fiction").count() == 1
+
+        assert sorted(
+            PendingBookNotification.objects.values_list("book_id", flat=True)
+        ) == sorted(Book.objects.values_list("pk", flat=True))
+        assert get_cache_version(CATALOG_NAMESPACE) == version + 1
+
+    def test_jsonl_import_updates_existing_by_slug(
+        self, create_book, django_capture_on_commit_callbacks, skip_index_flush
+    ):
+        book = create_book(
+            title="Known Book",
+            slug="known-book",
+            price=30.00,
+            stock_quantity=42,
+            pages=300,
+            isbn="9780000000001",
+        )
+        PendingBookNotification.objects.all().delete()
+        rows = [
+            {"title": "Known Book", "author": "X", "description": "D", "price": "25"},
+            {"title": "Another", "author": "Y", "description": "D", "price": "9.5"},
+        ]
+        stream = io.StringIO(
+            "\n".join(json.dumps(row) for row in rows) + "\nnot json\n"
+        )
+
+        with django_capture_on_commit_callbacks(execute=True):
+            result = BookImporter().run(read_rows(stream, "jsonl"))
+
+        assert (result.created, result.updated) == (1, 1)
+        assert len(result.errors) == 1
+        book.refresh_from_db()
+        assert str(book.price) == "25.00"
+        assert book.author == "X"
+        # Колонки, которых нет в строке, не сбрасываются
+        assert book.stock_quantity == 42
+        assert book.pages == 300
+        assert book.isbn == "9780000000001"
+        assert list(
+            PendingBookNotification.objects.values_list("book__slug", flat=True)
+        ) == ["another"]
+
+    def test_lower_price_below_stored_discount_is_row_error(self, create_book):
+        book = create_book(
+            title="Known Book", slug="known-book", price=30.00, discounted_price=20.00
+        )
+        rows = [
+            {"title": "Known Book", "author": "X", "description": "D", "price": "15"},
+            {"title": "Another", "author": "Y", "description": "D", "price": "9.5"},
+        ]
+
+        result = BookImporter().run(enumerate(rows, start=1))
+
+        assert (result.created, result.updated) == (1, 0)
+        assert [line for line, _ in result.errors] == [1]
+        book.refresh_from_db()
+        assert str(book.price) == "30.00"
+        assert str(book.discounted_price) == "20.00"
+
+    def test_empty_cell_clears_nullable_field(self, create_book):
+        book = create_book(
+            title="Known Book",
+            slug="known-book",
+            price=30.00,
+            discounted_price=20.00,
+            isbn="9780000000001",
+            pages=300,
+        )
+        data = (
+            "title,author,description,price,discounted_price,isbn\n"
+            "Known Book,X,D,30.00,,\n"
+        )
+
+        result = BookImporter().run(read_rows(io.StringIO(data), "csv"))
+
+        assert result.updated == 1
+        book.refresh_from_db()
+        assert book.discounted_price is None
+        assert book.isbn is None
+        # Колонки pages в файле нет — значение сохраняется
+        assert book.pages == 300
+
+    def test_import_books_command(self, tmp_path):
+        path = tmp_path / "books.csv"
+        path.write_text(CSV_DATA, encoding="utf-8")
+        out, err = io.StringIO(), io.StringIO()
+
+        call_command("import_books", str(path), stdout=out, stderr=err)
+
+        assert "Создано: 2" in out.getvalue()
+        assert "Строка 4" in err.getvalue()
+        assert Book.objects.count() == 2
@@ -0,0 +1,262 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.core.management import CommandError, call_command
+from elasticsearch import ConnectionError as ESConnectionError
+
+from store.indexing import (
+    IndexSyncError,
+    flush_index_queue,
+    reconcile_index,
+)
+from reviews.models import Review
+from store.models import Book, Genre, PendingBookIndex
+
+
+@pytest.fixture
+def autosync(settings):
+    settings.ELASTICSEARCH_DSL_AUTOSYNC = True
+
+
+@pytest.mark.django_db
+class TestQueuedSignalProcessor:
+    def test_save_delete_and_genres_enqueue_book(self, autosync, create_book):
+        book = create_book(slug="queued-book")
+        book_id = book.pk
+        assert list(PendingBookIndex.objects.values_list("book_id", flat=True)) == [
+            book_id
+        ]
+
+        book.genre.add(Genre.objects.create(name="Drama"))
+        book.delete()
+
+        assert PendingBookIndex.objects.filter(book_id=book_id).count() == 3
+
+    def test_genre_change_and_rating_change_enqueue_books(
+        self, autosync, create_book, existing_user
+    ):
+        book = create_book(slug="queued-book")
+        genre = Genre.objects.create(name="Drama")
+        book.genre.add(genre)
+        PendingBookIndex.objects.all().delete()
+
+        genre.name = "Tragedy"
+        genre.save()
+        Review.objects.create(book=book, user=existing_user, rating=5, text="Ok")
+        genre.delete()
+
+        assert (
+            list(PendingBookIndex.objects.values_list("book_id", flat=True))
+            == [book.pk] * 3
+        )
+
+    def test_reverse_genre_clear_enqueues_books(self, autosync, create_book):
+        genre = Genre.objects.create(name="Drama")
+        books = [create_book(slug=f"clear-{i}") for i in range(2)]
+        genre.book_set.add(*books)
+        PendingBookIndex.objects.all().delete()
+
+        genre.book_set.clear()
+
+        assert sorted(PendingBookIndex.objects.values_list("book_id", flat=True)) == [
+            book.pk for book in books
+        ]
+
+    def test_nothing_enqueued_without_autosync(self, settings, create_book):
+        settings.ELASTICSEARCH_DSL_AUTOSYNC = False
+        create_book(slug="not-queued")
+        assert not PendingBookIndex.objects.exists()
+
+
+@pytest.mark.django_db
+class TestFlushIndexQueue:
+    def test_flush_indexes_existing_and_deletes_missing(self, autosync, create_book):
+        book = create_book(slug="indexed-book")
+        PendingBookIndex.objects.create(book_id=book.pk)  # повтор того же id
+        PendingBookIndex.objects.create(book_id=999999)  # книга удалена
+
+        with patch("elasticsearch.helpers.bulk", return_value=(2, [])) as bulk:
+            assert flush_index_queue() == 2
+
+        actions = bulk.call_args.args[1]
+        assert [(a["_op_type"], a["_id"]) for a in actions] == [
+            ("index", book.pk),
+            ("delete", 999999),
+        ]
+        assert not PendingBookIndex.objects.exists()
+
+    def test_failed_bulk_keeps_queue(self, autosync, create_book):
+        create_book(slug="indexed-book")
+
+        errors = [{"index": {"_id": "1", "status": 429}}]
+        with patch("elasticsearch.helpers.bulk", return_value=(0, errors)):
+            with pytest.raises(IndexSyncError):
+                flush_index_queue()
+        with patch("elasticsearch.helpers.bulk", side_effect=ESConnectionError("down")):
+            with pytest.raises(ESConnectionError):
+                flush_index_queue()
+
+        assert PendingBookIndex.objects.count() == 1
+
+    def test_missing_document_delete_is_not_an_error(self, autosync):
+        PendingBookIndex.objects.create(book_id=999999)
+
+        errors = [{"delete": {"_id": "999999", "status": 404}}]
+        with patch("elasticsearch.helpers.bulk", return_value=(0, errors)):
+            assert flush_index_queue() == 1
+
+        assert not PendingBookIndex.objects.exists()
+
+
+@pytest.mark.django_db
+class TestReconcileIndex:
+    def test_reconcile_enqueues_missing_and_outdated_documents(
+        self, autosync, create_book
+    ):
+        fresh = create_book(slug="fresh")
+        outdated = create_book(slug="outdated")
+        missing = create_book(slug="missing")
+        PendingBookIndex.objects.all().delete()
+
+        client = MagicMock()
+        client.mget.return_value = {
+            "docs": [
+                {
+                    "_id": str(fresh.pk),
+                    "found": True,
+                    "_source": {"time_update": fresh.time_update.isoformat()},
+                },
+                {
+                    "_id": str(outdated.pk),
+                    "found": True,
+                    "_source": {
+                        "time_update": (
+                            outdated.time_update - timedelta(minutes=1)
+                        ).isoformat()
+                    },
+                },
+                {"_id": str(missing.pk), "found": False},
+            ]
+        }
+        # Документов столько же, сколько книг: вместо missing в индексе сирота
+        orphan_id = missing.pk + 100
+        hits = [{"_id": str(pk)} for pk in (fresh.pk, outdated.pk, orphan_id)]
+
+        client.count.return_value = {"count": Book.objects.count()}
+
+        with (
+            patch(
+                "django_elasticsearch_dsl.Document._get_connection",
+                return_value=client,
+            ),
+            patch("elasticsearch.helpers.scan", return_value=iter(hits)) as scan,
+        ):
+            # Частая сверка не просматривает индекс, пока количества совпадают
+            assert reconcile_index() == 2
+            scan.assert_not_called()
+            reconcile_index(sweep_orphans=True)
+
+        scan.assert_called_once()
+        assert set(PendingBookIndex.objects.values_list("book_id", flat=True)) == {
+            outdated.pk,
+            missing.pk,
+            orphan_id,
+        }
+
+    def test_extra_documents_trigger_orphan_sweep(self, autosync, create_book):
+        book = create_book(slug="kept")
+        PendingBookIndex.objects.all().delete()
+        client = MagicMock()
+        client.mget.return_value = {
+            "docs": [
+                {
+                    "_id": str(book.pk),
+                    "found": True,
+                    "_source": {"time_update": book.time_update.isoformat()},
+                }
+            ]
+        }
+        client.count.return_value = {"count": 2}
+        hits = [{"_id": str(book.pk)}, {"_id": str(book.pk + 1)}]
+
+        with (
+            patch(
+                "django_elasticsearch_dsl.Document._get_connection",
+                return_value=client,
+            ),
+            patch("elasticsearch.helpers.scan", return_value=iter(hits)),
+        ):
+            assert reconcile_index() == 1
+
+        assert list(PendingBookIndex.objects.values_list("book_id", flat=True)) == [
+            book.pk + 1
+        ]
+
+
+@pytest.mark.django_db
+class TestReindexBooks:
+    def test_reindex_loads_new_index_and_swaps_alias(self, autosync, create_book):
+        books = [create_book(slug=f"book-{i}") for i in range(3)]
+        client = MagicMock()
+        client.indices.exists_alias.return_value = True
+        client.indices.get_alias.return_value = {"books-20260101000000": {}}
+        created = []
+
+        def fake_parallel_bulk(client, actions, **kwargs):
+            for action in actions:
+                created.append(action)
+                yield True, {}
+
+        with (
+            patch(
+                "django_elasticsearch_dsl.Document._get_connection",
+                return_value=client,
+            ),
+            patch("elasticsearch_dsl.Index.create") as create_index,
+            patch("elasticsearch.helpers.parallel_bulk", fake_parallel_bulk),
+        ):
+            out = StringIO()
+            call_command("reindex_books", "--chunk-size=2", stdout=out)
+
+        create_index.assert_called_once()
+        assert [a["_id"] for a in created] == [book.pk for book in books]
+        new_index = created[0]["_index"]
+        assert new_index.startswith("books-") and new_index != "books"
+
+        client.indices.put_settings.assert_called_once_with(
+            index=new_index,
+            settings={"refresh_interval": "1s", "number_of_replicas": 0},
+        )
+        client.indices.update_aliases.assert_called_once_with(
+            actions=[
+                {"add": {"index": new_index, "alias": "books"}},
+                {"remove": {"index": "books-20260101000000", "alias": "books"}},
+            ]
+        )
+        client.indices.delete.assert_called_once_with(
+            index="books-20260101000000", ignore_unavailable=True
+        )
+        assert "3 документов" in out.getvalue()
+
+    def test_reindex_with_errors_keeps_old_alias(self, autosync, create_book):
+        create_book(slug="book")
+        client = MagicMock()
+
+        def failing_parallel_bulk(client, actions, **kwargs):
+            for _ in actions:
+                yield False, {"index": {"status": 400}}
+
+        with (
+            patch(
+                "django_elasticsearch_dsl.Document._get_connection",
+                return_value=client,
+            ),
+            patch("elasticsearch_dsl.Index.create"),
+            patch("elasticsearch.helpers.parallel_bulk", failing_parallel_bulk),
+            pytest.raises(CommandError),
+        ):
+            call_command("reindex_books", stdout=StringIO())
+
+        client.indices.update_aliases.assert_not_called()
@@ -0,0 +1,123 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cart.models import Cart, CartItem
+from reviews.models import Review
+from store.models import Book, BookRanking
+from store.rankings import (
+    RANKING_WATERMARK_KEY,
+    refresh_rankings,
+    refresh_stale_rankings,
+    stale_ranking_ids,
+)
+from store.tasks import refresh_book_rankings_task
+from user_profile.models import UserProfile
+
+
+def review(book, rating, **kwargs):
+    user = User.objects.create_user(username=f"reader-{User.objects.count()}")
+    return Review.objects.create(book=book, user=user, rating=rating, **kwargs)
+
+
+@pytest.mark.django_db
+class TestBookRankings:
+    def test_new_book_gets_empty_ranking(self, create_book):
+        book = create_book(slug="fresh")
+
+        ranking = BookRanking.objects.get(book=book)
+        assert ranking.popularity_score == 0
+        assert ranking.refreshed_at is None
+
+    def test_bayesian_rating_ranks_many_reviews_above_single(self, create_book):
+        single = create_book(slug="single")
+        review(single, 5)
+        steady = create_book(slug="steady")
+        for rating in (5, 5, 5, 4, 5, 5, 4, 5, 5, 5):
+            review(steady, rating)
+        poor = create_book(slug="poor")
+        review(poor, 1)
+
+        assert refresh_rankings() == 3
+
+        assert [book.slug for book in Book.objects.ranked("rating_score")] == [
+            "steady",
+            "single",
+            "poor",
+        ]
+        assert [book.slug for book in Book.objects.rated_high(4.6)] == ["steady"]
+
+    def test_popularity_combines_recent_activity_and_favorites(
+        self, create_book, existing_user
+    ):
+        old = create_book(slug="old")
+        for _ in range(3):
+            review(old, 4)
+        Review.objects.filter(book=old).update(
+            created_at=timezone.now() - timedelta(days=200)
+        )
+        trending = create_book(slug="trending")
+        review(trending, 4)
+        cart = Cart.objects.create(user=existing_user)
+        CartItem.objects.create(cart=cart, book=trending)
+        favorite = create_book(slug="favorite")
+        UserProfile.objects.create(user=existing_user).favorite_books.add(favorite)
+        create_book(slug="quiet")
+
+        refresh_rankings()
+
+        assert [book.slug for book in Book.objects.popular(3)] == [
+            "trending",
+            "favorite",
+            "old",
+        ]
+        trending_ranking = BookRanking.objects.get(book=trending)
+        assert trending_ranking.activity_score > 0
+        assert BookRanking.objects.get(book=old).activity_score == 0
+        assert BookRanking.objects.get(book=favorite).favorites_count == 1
+
+    def test_lists_read_ranking_table_only(self, create_book):
+        book = create_book(slug="ranked")
+        review(book, 5)
+        refresh_rankings()
+
+        with CaptureQueriesContext(connection) as queries:
+            assert list(Book.objects.popular(5)) == [book]
+            assert list(Book.objects.rated_high(1)) == [book]
+
+        sql = " ".join(q["sql"] for q in queries.captured_queries)
+        assert "reviews_review" not in sql
+        assert "store_bookranking" in sql
+        assert "LIMIT 5" in sql
+
+    def test_incremental_refresh_picks_touched_books(self, create_book, existing_user):
+        idle = create_book(slug="idle")
+        busy = create_book(slug="busy")
+        assert refresh_stale_rankings() == 2
+        since = timezone.now() - timedelta(seconds=1)
+
+        assert stale_ranking_ids(since) == set()
+
+        CartItem.objects.create(cart=Cart.objects.create(user=existing_user), book=busy)
+        assert stale_ranking_ids(since) == {busy.pk}
+        assert refresh_book_rankings_task() == 1
+        assert BookRanking.objects.get(book=busy).popularity_score > 0
+        assert BookRanking.objects.get(book=idle).popularity_score == 0
+
+        # Окна сдвигаются: книга с недавней активностью пересчитывается каждый раз
+        assert refresh_book_rankings_task() == 1
+        assert refresh_book_rankings_task(full=True) == 2
+
+    def test_missing_watermark_means_full_refresh(self, create_book):
+        from django.core.cache import cache
+
+        create_book(slug="one")
+        create_book(slug="two")
+        refresh_stale_rankings()
+        cache.delete(RANKING_WATERMARK_KEY)
+
+        assert refresh_stale_rankings() == 2
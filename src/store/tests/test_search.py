@@ -1,5 +1,32 @@
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
 import pytest
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.backends.postgresql.base import (
+    DatabaseWrapper as PostgresDatabaseWrapper,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from elasticsearch_dsl import Search
+from elasticsearch_dsl.response import Response
+
+from store.models import Book
+from store.search import (
+    es_breaker,
+    find_books,
+    get_search_metrics,
+    normalize_query,
+    search_cache_key,
+)
+from store.search_backends import (
+    IContainsSearchBackend,
+    PostgresSearchBackend,
+    get_search_backend,
+)
 
 
 @pytest.mark.django_db
@@ -50,3 +77,199 @@ class TestSearch:
         assert response.status_code == 200
         assert "books" in response.context
         assert list(response.context["books"]) == []
+
+    def test_search_cache_stores_ids_under_normalized_key(self, client, create_book):
+        book = create_book(title="Python 101", slug="python-101")
+        url = reverse("book-search")
+
+        client.get(url, {"query": "  PYTHON  "})
+
+        cached = cache.get(search_cache_key(normalize_query("python")))
+        assert cached is not None
+        book_ids, payload = cached
+        assert book_ids == [book.pk]
+        assert json.loads(payload)["results"][0]["url"] == book.get_absolute_url()
+
+    def test_search_json_served_from_cache_without_queries(self, client, create_book):
+        create_book(title="Python 101", slug="python-101")
+        url = reverse("book-search")
+        client.get(url, {"format": "json", "query": "python"})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, {"format": "json", "query": "Python"})
+
+        assert not any("store_book" in q["sql"] for q in queries.captured_queries)
+        assert response.json()["results"][0]["title"] == "Python 101"
+
+    def test_search_renders_from_index_hits_without_queries(self, client):
+        raw = {
+            "hits": {
+                "total": {"value": 1, "relation": "eq"},
+                "hits": [
+                    {
+                        "_id": "7",
+                        "_score": 1.0,
+                        "_source": {
+                            "slug": "indexed-book",
+                            "title": "Indexed Book",
+                            "author": "Author",
+                            "price": 20.0,
+                            "discounted_price": 15.5,
+                            "photo": "book_covers/cover.jpg",
+                        },
+                    }
+                ],
+            }
+        }
+
+        with patch.object(
+            Search,
+            "execute",
+            autospec=True,
+            side_effect=lambda search: Response(search, raw),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(reverse("book-search"), {"query": "indexed"})
+
+        assert not any("store_book" in q["sql"] for q in queries.captured_queries)
+        [book] = response.context["books"]
+        assert (book.pk, book.title, str(book.discounted_price)) == (
+            7,
+            "Indexed Book",
+            "15.50",
+        )
+        assert b"/media/book_covers/cover.jpg" in response.content
+
+
+@pytest.mark.django_db
+class TestSearchCircuitBreaker:
+    def test_breaker_opens_after_repeated_failures(self, client, create_book, settings):
+        create_book(title="Python 101", slug="python-101")
+        url = reverse("book-search")
+
+        with patch(
+            "store.search.search_books_es", side_effect=ConnectionError
+        ) as es_search:
+            for i in range(es_breaker.threshold):
+                response = client.get(url, {"format": "json", "query": f"python {i}"})
+                assert response.status_code == 200
+            assert es_breaker.is_open()
+
+            # Пока цепь разомкнута, ES не вызывается, ответ приходит из БД
+            response = client.get(url, {"format": "json", "query": "python"})
+            assert es_search.call_count == es_breaker.threshold
+
+        assert response.json()["results"][0]["title"] == "Python 101"
+        metrics = dict((name, values) for name, _, _, values in get_search_metrics())
+        assert metrics["search_breaker_open"] == [({}, 1)]
+        assert ({"reason": "breaker_open"}, 1) in metrics["search_fallback_total"]
+
+    def test_single_probe_after_cooldown(self, create_book):
+        create_book(title="Python 101", slug="python-101")
+        es_breaker.open()
+        assert not es_breaker.allow_request()
+
+        # Охлаждение прошло: пропускается только один пробный запрос
+        cache.set(es_breaker.open_until_key, time.time() - 1)
+        assert [es_breaker.allow_request() for _ in range(3)] == [True, False, False]
+
+        # Проба неудачна — цепь снова разомкнута для всех
+        es_breaker.record_failure()
+        assert es_breaker.is_open()
+        assert not es_breaker.allow_request()
+
+        cache.set(es_breaker.open_until_key, time.time() - 1)
+        with patch("store.search.search_books_es", return_value=[]) as es_search:
+            assert find_books("python") == []
+        es_search.assert_called_once()
+        # Успешная проба замыкает цепь
+        assert [es_breaker.allow_request() for _ in range(3)] == [True] * 3
+
+    def test_async_view_falls_back_on_deadline(self, client, create_book, settings):
+        settings.SEARCH_ES_TIMEOUT = 0.05
+        create_book(title="Python 101", slug="python-101")
+
+        async def slow_search(query):
+            await asyncio.sleep(1)
+
+        with patch("store.search.asearch_books_es", side_effect=slow_search):
+            response = client.get(
+                reverse("book-search-async"), {"format": "json", "query": "Python"}
+            )
+
+        assert response.status_code == 200
+        assert response.json()["results"][0]["title"] == "Python 101"
+        assert cache.get("metrics:search_fallback_total:reason=timeout") == 1
+
+    def test_async_view_renders_html(self, client, create_book):
+        create_book(title="Python 101", slug="python-101")
+
+        response = client.get(reverse("book-search-async"), {"query": "Python"})
+
+        assert response.status_code == 200
+        assert [book.title for book in response.context["books"]] == ["Python 101"]
+
+    def test_metrics_view_requires_staff(self, client, admin_client):
+        url = reverse("search-metrics")
+
+        assert client.get(url).status_code == 302
+        response = admin_client.get(url)
+        assert response.status_code == 200
+        assert b"search_breaker_open 0" in response.content
+
+
+@pytest.mark.django_db
+class TestSearchBackends:
+    def test_backend_selected_in_settings(self, settings):
+        settings.SEARCH_DB_BACKEND = "store.search_backends.PostgresSearchBackend"
+        assert isinstance(get_search_backend(), PostgresSearchBackend)
+
+        settings.SEARCH_DB_BACKEND = "store.search_backends.IContainsSearchBackend"
+        assert isinstance(get_search_backend(), IContainsSearchBackend)
+
+    def test_book_save_does_not_write_search_vector(self, create_book):
+        book = create_book(title="Python 101", slug="python-101")
+        book = Book.objects.get(pk=book.pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            book.save()
+
+        assert "search_vector" not in queries.captured_queries[-1]["sql"]
+        assert "search_vector" in book.get_deferred_fields()
+
+    def test_postgres_backend_sql_uses_search_vector_and_trigrams(self):
+        # Запрос компилируется диалектом PostgreSQL без подключения к серверу
+        pg_settings = {
+            **connections.settings[DEFAULT_DB_ALIAS],
+            "ENGINE": "django.db.backends.postgresql",
+        }
+        pg_connection = PostgresDatabaseWrapper(pg_settings, alias="postgres-sql")
+        queryset = PostgresSearchBackend().book_ids("pythn")
+
+        sql, params = queryset.query.get_compiler(connection=pg_connection).as_sql()
+
+        assert '"store_book"."search_vector" @@ (websearch_to_tsquery(' in sql
+        assert 'UPPER("store_book"."title") %%> %s' in sql
+        assert "ts_rank(" in sql and "WORD_SIMILARITY(" in sql
+        assert sql.endswith("DESC, 1 ASC")
+        assert "PYTHN" in params
+
+    @pytest.mark.skipif(
+        connection.vendor != "postgresql",
+        reason="Нужен PostgreSQL: tsvector, pg_trgm и триггер из миграции 0011",
+    )
+    def test_postgres_backend_ranks_and_matches_typos(self, create_book):
+        title_match = create_book(title="Python Cookbook", author="Beazley")
+        description_match = create_book(
+            title="Scripting Tips", author="Lutz", description="python one-liners"
+        )
+        create_book(title="Java Basics", author="Schildt", description="jvm")
+        backend = PostgresSearchBackend()
+
+        # Совпадение в названии весит больше, чем в описании
+        assert list(backend.book_ids("python")) == [
+            title_match.pk,
+            description_match.pk,
+        ]
+        # Опечатка находится через триграммы
+        assert list(backend.book_ids("Pythn")) == [title_match.pk]
@@ -1,42 +1,71 @@
 import pytest
-from unittest.mock import patch
+from django.core import mail
 from django.core.cache import cache
-from store.models import Book, Subscription
+from store.cache import CATALOG_NAMESPACE, get_cache_version, versioned_key
+from reviews.models import Review
+from store.models import Book, PendingBookNotification, Subscription
 from django.db import transaction
 
 
 @pytest.mark.django_db
 class TestSignal:
-    def test_clear_book_cache_signal(self, create_book):
-        # Устанавливаем значения в кэш
-        cache.set("all_books", "cached_books")
-
-        # Для тестов проверяем только конкретные ключи, которые точно очищаются
-        cache.set("search_specific_test", "cached_search")
-
-        # Убедимся, что кэш установлен
-        assert cache.get("search_specific_test") == "cached_search"
-        assert cache.get("all_books") == "cached_books"
+    def test_clear_book_cache_signal(
+        self,
+        create_book,
+        django_capture_on_commit_callbacks,
+        skip_index_flush,
+    ):
+        search_key = versioned_key(CATALOG_NAMESPACE, "search", "specific_test")
+        all_books_key = versioned_key(CATALOG_NAMESPACE, "all_books_with_ratings")
+        cache.set(search_key, "cached_search")
+        cache.set(all_books_key, "cached_books")
+        cache.set("unrelated_key", "keep me")
 
         # Создаем книгу, чтобы вызвать сигнал
-        book = create_book()
+        with django_capture_on_commit_callbacks(execute=True):
+            book = create_book()
 
-        # Удаляем книгу, чтобы вызвать сигнал post_delete
-        book.delete()
+        # Ключи текущей версии каталога больше не совпадают со старыми
+        assert (
+            cache.get(versioned_key(CATALOG_NAMESPACE, "search", "specific_test"))
+            is None
+        ), "Search cache was not invalidated."
 
-        # Проверяем, что конкретные ключи очищены
-        # (только те, которые мы точно знаем, что будут очищены)
-        assert cache.get("all_books") is None, "All books cache was not cleared."
+        # Удаляем книгу, чтобы вызвать сигнал post_delete
+        version = get_cache_version(CATALOG_NAMESPACE)
+        with django_capture_on_commit_callbacks(execute=True):
+            book.delete()
+        assert get_cache_version(CATALOG_NAMESPACE) == version + 1
 
-        # Для search ключей проверяем только те, которые мы установили конкретно
         assert (
-            cache.get("search_specific_test") is None
-        ), "Search cache was not cleared."
+            cache.get(versioned_key(CATALOG_NAMESPACE, "all_books_with_ratings"))
+            is None
+        ), "All books cache was not invalidated."
+
+        # Посторонние ключи (сессии, лимиты) не затрагиваются
+        assert cache.get("unrelated_key") == "keep me"
 
-    @patch("store.tasks.send_new_book_notification_task.delay")
-    def test_send_new_book_notification_signal(
-        self, mock_send_task, create_subscription, create_book
+    def test_cache_version_bumped_only_after_commit(
+        self,
+        create_book,
+        existing_user,
+        django_capture_on_commit_callbacks,
+        skip_index_flush,
     ):
+        version = get_cache_version(CATALOG_NAMESPACE)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            book = create_book()
+            Review.objects.create(book=book, user=existing_user, rating=4)
+            # До коммита читатель видит прежнюю версию: данные, прочитанные
+            # сейчас, не попадут в кэш под новой версией
+            assert get_cache_version(CATALOG_NAMESPACE) == version
+            cache.set(versioned_key(CATALOG_NAMESPACE, "book", book.pk), "stale")
+
+        assert get_cache_version(CATALOG_NAMESPACE) > version
+        assert cache.get(versioned_key(CATALOG_NAMESPACE, "book", book.pk)) is None
+
+    def test_send_new_book_notification_signal(self, create_subscription, create_book):
         # Создаем подписчиков c коммитом в БД
         with transaction.atomic():
             create_subscription(email="user1@example.com")
@@ -46,8 +75,12 @@ class TestSignal:
         # Убедитесь, что подписчики действительно существуют
         assert Subscription.objects.count() == 3, "Subscriptions were not created."
 
-        # Создаем книгу
+        # Создаем книгу и сохраняем её повторно
         book = create_book(title="New Book")
+        book.save()
 
-        # Проверяем, что задача Celery вызвана ровно один раз с ID книги
-        mock_send_task.assert_called_once_with(book.pk)
+        # Рассылка не уходит сразу: книга один раз попадает в очередь дайджеста
+        assert not mail.outbox
+        assert list(
+            PendingBookNotification.objects.values_list("book_id", flat=True)
+        ) == [book.pk]
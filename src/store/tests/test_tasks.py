@@ -0,0 +1,153 @@
+from smtplib import SMTPException
+from unittest.mock import patch
+
+import pytest
+from django.core import mail
+from django.utils import timezone
+
+from store.models import (
+    NewBooksDigest,
+    NewsletterDelivery,
+    PendingBookNotification,
+    Subscription,
+)
+from store.tasks import (
+    send_new_book_notification_task,
+    send_new_books_digest_task,
+    send_newsletter_chunk_task,
+    send_to_subscribers,
+)
+
+
+@pytest.mark.django_db
+class TestNewsletterTasks:
+    @patch("store.tasks.NEWSLETTER_CHUNK_SIZE", 1)
+    def test_notification_sent_in_chunks(self, create_book, create_subscription):
+        book = create_book(title="Chunked Book")
+        mail.outbox.clear()
+        active = [
+            create_subscription(email="a@example.com", is_active=True),
+            create_subscription(email="b@example.com", is_active=True),
+        ]
+        create_subscription(email="off@example.com", is_active=False)
+
+        with patch("store.tasks.send_newsletter_chunk_task.delay") as mock_chunk:
+            mock_chunk.side_effect = send_newsletter_chunk_task
+            count = send_to_subscribers(f"New Book Added: {book.title}", "Body")
+
+        assert count == 2
+        assert mock_chunk.call_count == 2
+        assert sorted(m.to[0] for m in mail.outbox) == [
+            "a@example.com",
+            "b@example.com",
+        ]
+        assert all("?t=" in m.body for m in mail.outbox)
+        for subscription in active:
+            subscription.refresh_from_db()
+            assert subscription.last_sent is not None
+        assert Subscription.objects.get(email="off@example.com").last_sent is None
+
+    def test_chunk_retry_is_idempotent(self, create_subscription):
+        first = create_subscription(email="c@example.com", is_active=True)
+        last = create_subscription(email="d@example.com", is_active=True)
+        args = ("campaign", "Subject", "Body", first.pk, last.pk)
+
+        assert send_newsletter_chunk_task(*args) == 2
+        assert send_newsletter_chunk_task(*args) == 0
+        assert len(mail.outbox) == 2
+
+    def test_chunk_retry_after_smtp_error_skips_delivered(self, create_subscription):
+        from django.core.mail.backends.locmem import EmailBackend
+
+        subscriptions = [
+            create_subscription(email=f"r{i}@example.com", is_active=True)
+            for i in range(3)
+        ]
+        args = (
+            "campaign",
+            "Subject",
+            "Body",
+            subscriptions[0].pk,
+            subscriptions[-1].pk,
+        )
+        send = EmailBackend.send_messages
+
+        def fail_on_second(backend, messages):
+            if len(mail.outbox) == 1:
+                raise SMTPException("connection dropped")
+            return send(backend, messages)
+
+        with patch.object(EmailBackend, "send_messages", fail_on_second):
+            with pytest.raises(SMTPException):
+                send_newsletter_chunk_task(*args)
+        assert [m.to[0] for m in mail.outbox] == ["r0@example.com"]
+        assert NewsletterDelivery.objects.filter(campaign_id="campaign").count() == 1
+
+        # Повтор задачи шлёт только тем, кто письма ещё не получил
+        assert send_newsletter_chunk_task(*args) == 2
+        assert sorted(m.to[0] for m in mail.outbox) == [
+            "r0@example.com",
+            "r1@example.com",
+            "r2@example.com",
+        ]
+
+
+@pytest.mark.django_db
+class TestNewBooksDigest:
+    def test_digest_coalesces_window_and_is_sent_once(
+        self, create_book, create_subscription
+    ):
+        create_subscription(email="a@example.com", is_active=True)
+        create_subscription(email="b@example.com", is_active=True)
+        books = [create_book(title=f"Digest Book {i}") for i in range(3)]
+        assert PendingBookNotification.objects.count() == 3
+
+        with patch("store.tasks.send_newsletter_chunk_task.delay") as mock_chunk:
+            mock_chunk.side_effect = send_newsletter_chunk_task
+            assert send_new_books_digest_task() == 2
+            # Повторный запуск без новых книг ничего не шлёт
+            assert send_new_books_digest_task() == 0
+
+        assert len(mail.outbox) == 2
+        assert all(book.title in mail.outbox[0].body for book in books)
+        assert not PendingBookNotification.objects.exists()
+
+        digest = NewBooksDigest.objects.get()
+        assert (digest.books_count, digest.recipients_count) == (3, 2)
+        assert digest.queued_at is not None
+
+    def test_deprecated_notification_task_queues_book_for_digest(self, create_book):
+        book = create_book(title="Queued Earlier")
+        PendingBookNotification.objects.all().delete()
+
+        assert send_new_book_notification_task(book.pk) == 0
+        assert send_new_book_notification_task(book.pk + 1) == 0
+
+        assert not mail.outbox
+        assert list(
+            PendingBookNotification.objects.values_list("book_id", flat=True)
+        ) == [book.pk]
+
+    def test_resumed_digest_skips_subscribers_who_received_it(
+        self, create_book, create_subscription
+    ):
+        book = create_book(title="Resumed Book")
+        create_subscription(email="done@example.com", is_active=True)
+        create_subscription(email="todo@example.com", is_active=True)
+        digest = NewBooksDigest.objects.create(window_start=timezone.now())
+        digest.books.add(book)
+        PendingBookNotification.objects.all().delete()
+        NewsletterDelivery.objects.create(
+            campaign_id=f"digest-{digest.pk}",
+            subscription=Subscription.objects.get(email="done@example.com"),
+        )
+        # Письмо другой рассылки не исключает подписчика из дайджеста
+        Subscription.objects.filter(email="todo@example.com").update(
+            last_sent=timezone.now()
+        )
+
+        with patch("store.tasks.send_newsletter_chunk_task.delay") as mock_chunk:
+            mock_chunk.side_effect = send_newsletter_chunk_task
+            assert send_new_books_digest_task() == 1
+
+        assert [m.to[0] for m in mail.outbox] == ["todo@example.com"]
@@ -0,0 +1,37 @@
+import pytest
+from django.core.cache import cache
+
+from store.models import Book, Quote
+from store.utils import (
+    RANDOM_PICK_KEYS,
+    get_random_book,
+    get_random_quote,
+    pick_random,
+)
+
+
+@pytest.mark.django_db
+class TestRandomPick:
+    def test_random_book_from_catalog(self, create_three_books):
+        books = create_three_books()
+
+        assert get_random_book() in books
+
+    def test_empty_tables_return_none(self):
+        assert get_random_book() is None
+        assert get_random_quote() is None
+
+    def test_bounds_reset_on_create(self, create_book):
+        first = create_book()
+        assert get_random_book() == first
+        assert cache.get(RANDOM_PICK_KEYS[Book]) == (first.pk, first.pk)
+
+        second = create_book()
+        assert cache.get(RANDOM_PICK_KEYS[Book]) is None
+        assert get_random_book() in (first, second)
+
+    def test_stale_bounds_fall_back_to_lower_pk(self):
+        quote = Quote.objects.create(quote="q", author_quote="a")
+        cache.set(RANDOM_PICK_KEYS[Quote], (quote.pk + 10, quote.pk + 10))
+
+        assert pick_random(Quote.objects.all()) == quote
@@ -1,6 +1,12 @@
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 import pytest
 from django.urls import reverse
+from django.contrib.auth.models import User
+
+from cart.models import Cart, CartItem
+from reviews.models import Review
 
 
 @pytest.mark.django_db
@@ -25,6 +31,29 @@ class TestHomepageView:
         random_book = response.context["random_book"]
         assert random_book is not None, "Random book was not selected."
 
+    def test_homepage_blocks_cached_and_invalidated(
+        self,
+        client,
+        create_three_books,
+        create_book,
+        django_capture_on_commit_callbacks,
+        skip_index_flush,
+    ):
+        create_three_books()
+        url = reverse("home")
+        client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        assert not any("store_book" in q["sql"] for q in queries.captured_queries)
+        assert len(response.context["pop_books"]) == 3
+        assert len(response.context["feature_books"]) == 3
+
+        with django_capture_on_commit_callbacks(execute=True):
+            new_book = create_book(title="Fresh Book")
+        response = client.get(url)
+        assert new_book in response.context["pop_books"]
+
 
 @pytest.mark.django_db
 class TestBookDetailView:
@@ -39,6 +68,60 @@ class TestBookDetailView:
             response.context["book"] == book
         ), "BookDetailView did not pass correct book to context."
 
+    def test_book_detail_rating_histogram(self, client, create_book):
+        book = create_book(slug="histogram-book")
+        for number, rating in enumerate((5, 5, 4, 1), start=1):
+            user = User.objects.create_user(username=f"h{number}", password="p")
+            Review.objects.create(book=book, user=user, rating=rating)
+
+        response = client.get(reverse("book-detail", kwargs={"book_slug": book.slug}))
+
+        assert [
+            (row["rating"], row["count"], row["percent"])
+            for row in response.context["rating_histogram"]
+        ] == [(5, 2, 50), (4, 1, 25), (3, 0, 0), (2, 0, 0), (1, 1, 25)]
+        assert b"rating-histogram" in response.content
+
+    def test_book_detail_user_state_bounded_queries(
+        self,
+        authenticated_client,
+        existing_user,
+        create_book,
+        create_cart,
+        create_user_profile,
+    ):
+        book = create_book(title="Test Book", slug="test-book")
+        create_book(title="Other Book", slug="other-book")
+        create_user_profile().favorite_books.add(book)
+        cart = create_cart(user=existing_user)
+        CartItem.objects.create(cart=cart, book=book, quantity=2, price=book.price)
+        review = Review.objects.create(book=book, user=existing_user, rating=4)
+        url = reverse("book-detail", kwargs={"book_slug": book.slug})
+
+        authenticated_client.get(url)  # прогрев публичной части
+        carts_before = Cart.objects.count()
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.get(url)
+
+        # сессия, пользователь, счётчик корзины и одно состояние пользователя
+        assert len(queries.captured_queries) <= 4
+        assert response.context["book_in_favorites"] is True
+        assert response.context["cart_quantity"] == 2
+        assert response.context["user_review_id"] == review.pk
+        assert response.context["review_form"] is None
+        assert list(response.context["reviews"]) == [review]
+        assert Cart.objects.count() == carts_before
+
+    def test_book_detail_does_not_create_cart(self, authenticated_client, create_book):
+        book = create_book(slug="test-book")
+        url = reverse("book-detail", kwargs={"book_slug": book.slug})
+
+        response = authenticated_client.get(url)
+
+        assert response.status_code == 200
+        assert response.context["in_cart"] is False
+        assert not Cart.objects.exists()
+
 
 @pytest.mark.django_db
 class TestFavoriteView:
@@ -4,6 +4,8 @@ from .views import (
     BookDetailView,
     ToggleFavoriteView,
     BookSearchView,
+    AsyncBookSearchView,
+    SearchMetricsView,
     AllBooks,
     UnsubscribeView,
 )
@@ -11,6 +13,8 @@ from .views import (
 urlpatterns = [
     path("", HomePage.as_view(), name="home"),
     path("search/", BookSearchView.as_view(), name="book-search"),
+    path("search/async/", AsyncBookSearchView.as_view(), name="book-search-async"),
+    path("search/metrics/", SearchMetricsView.as_view(), name="search-metrics"),
     path("book/<slug:book_slug>/", BookDetailView.as_view(), name="book-detail"),
     path(
         "book/<slug:book_slug>/add-to-favorites/",
@@ -0,0 +1,104 @@
+import random
+
+from django.core.cache import cache
+from django.db.models import Max, Min, Prefetch
+
+from .models import Book, Genre, Quote
+
+RANDOM_PICK_TIMEOUT = 60 * 60
+RANDOM_PICK_KEYS = {
+    Book: "random_pick_bounds_book",
+    Quote: "random_pick_bounds_quote",
+}
+
+
+def get_pk_bounds(model):
+    """
+    Возвращает (min_pk, max_pk) модели из кэша.
+    Границы сбрасываются сигналами store при создании/удалении записей.
+    """
+    cache_key = RANDOM_PICK_KEYS[model]
+    bounds = cache.get(cache_key)
+    if bounds is None:
+        agg = model.objects.aggregate(low=Min("pk"), high=Max("pk"))
+        bounds = (agg["low"], agg["high"])
+        cache.set(cache_key, bounds, RANDOM_PICK_TIMEOUT)
+    return bounds
+
+
+def invalidate_random_pick(model):
+    """Сбрасывает закэшированные границы первичного ключа модели."""
+    cache.delete(RANDOM_PICK_KEYS[model])
+
+
+GENRE_INDEX_KEY = "genre_name_index"
+GENRE_INDEX_TIMEOUT = 60 * 60
+
+# Фильтр по нескольким жанрам: книга в любом из них или во всех
+GENRE_MATCH_ANY = "any"
+GENRE_MATCH_ALL = "all"
+
+
+def get_genre_index():
+    """
+    Список (id, название в нижнем регистре, название) всех жанров из кэша.
+    Сбрасывается сигналами store при изменении жанров.
+    """
+    index = cache.get(GENRE_INDEX_KEY)
+    if index is None:
+        index = [
+            (pk, name.casefold(), name)
+            for pk, name in Genre.objects.order_by("name").values_list("pk", "name")
+        ]
+        cache.set(GENRE_INDEX_KEY, index, GENRE_INDEX_TIMEOUT)
+    return index
+
+
+def invalidate_genre_index():
+    cache.delete(GENRE_INDEX_KEY)
+
+
+def resolve_genres(term):
+    """
+    Жанры, в названии которых встречается term (как icontains), в виде
+    {id: название}. Поиск идёт по индексу из кэша, без запроса к БД.
+    """
+    term = term.strip().casefold()
+    return {pk: name for pk, folded, name in get_genre_index() if term in folded}
+
+
+def resolve_genre_terms(terms):
+    """Для каждого непустого значения фильтра — {id: название} подходящих жанров."""
+    return [resolve_genres(term) for term in terms or () if term.strip()]
+
+
+def pick_random(queryset):
+    """
+    Выбирает случайную запись одним индексным запросом по первичному ключу:
+    берём случайное значение в диапазоне [min_pk, max_pk] и первую запись с pk >= него.
+    Пропуски в последовательности pk дают небольшой перекос, для витрины это допустимо.
+    """
+    low, high = get_pk_bounds(queryset.model)
+    if low is None:
+        return None
+
+    pivot = random.randint(low, high)
+    obj = queryset.filter(pk__gte=pivot).order_by("pk").first()
+    if obj is None:
+        # Границы устарели (удалили последнюю запись) — берём ближайшую снизу
+        obj = queryset.filter(pk__lt=pivot).order_by("-pk").first()
+    return obj
+
+
+def get_random_book():
+    """Случайная книга для главной страницы."""
+    return pick_random(
+        Book.objects.only(
+            "title", "description", "price", "photo", "discounted_price", "slug"
+        ).prefetch_related(Prefetch("genre", queryset=Genre.objects.only("name")))
+    )
+
+
+def get_random_quote():
+    """Случайная цитата для главной страницы."""
+    return pick_random(Quote.objects.only("quote", "author_quote"))
@@ -1,26 +1,35 @@
+from asgiref.sync import sync_to_async
 from django.contrib import messages
-from random import choice
 
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.db.models import Avg, Count, Prefetch, Q
+from django.db.models import Exists, OuterRef, Prefetch, Q, Subquery
 from django.views import View
 from django.views.generic import ListView, DetailView
 
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from django.core.cache import cache
 
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 
-from user_profile.forms import FavoriteBooksForm
 from user_profile.models import UserProfile
 from .forms import BookSearchForm, SubscriptionForm
 
-from .models import Book, Genre, Quote, Subscription
+from .cache import (
+    CATALOG_NAMESPACE,
+    HOME_BOOKS_NAMESPACE,
+    HOME_QUOTE_NAMESPACE,
+    catalog_cache_page,
+    versioned_key,
+)
+from .models import Book, Genre, Subscription
+from .metrics import render_prometheus
+from .search import asearch_books, get_search_metrics, search_books
+from .utils import get_random_book, get_random_quote
 
-from cart.models import Cart, CartItem
+from cart.models import CartItem
 
 from reviews.forms import ReviewForm
 from reviews.models import Review
@@ -35,6 +44,10 @@ class HomePage(ListView):
     template_name = "store/home.html"
     form_class = SubscriptionForm
 
+    # Блоки главной страницы общие для всех пользователей и кэшируются по отдельности
+    block_timeout = 60 * 15
+    random_book_timeout = 60
+
     def post(self, request, *args, **kwargs):
         form = self.form_class(request.POST)
         if form.is_valid():
@@ -61,12 +74,24 @@ class HomePage(ListView):
 
     # Получение случайной книги
     def get_random_book(self):
-        books_with_related_data = self.get_books_with_related_data()
-        return choice(books_with_related_data)
+        return get_random_book()
 
     # Получение случайной цитаты
     def get_random_quote(self):
-        return Quote.objects.order_by("?").only("quote", "author_quote").first()
+        return get_random_quote()
+
+    # Блоки "Popular" и "Featured" читают предрасчитанные рейтинги
+    def get_popular_books(self):
+        return list(Book.objects.popular(12))
+
+    def get_top_rated_books(self):
+        return list(Book.objects.ranked("rating_score")[:8])
+
+    def get_cached_block(self, namespace, name, factory, timeout=None):
+        """Блок страницы из кэша; ключ меняется при инвалидации сигналами."""
+        return cache.get_or_set(
+            versioned_key(namespace, name), factory, timeout or self.block_timeout
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -86,10 +111,21 @@ class HomePage(ListView):
             else:
                 context["books"] = Book.objects.all()
 
-        context["pop_books"] = Book.objects.with_ratings()[:12]
-        context["feature_books"] = Book.objects.with_ratings()[:8]
-        context["random_book"] = self.get_random_book()
-        context["random_quote"] = self.get_random_quote()
+        context["pop_books"] = self.get_cached_block(
+            HOME_BOOKS_NAMESPACE, "popular_books", self.get_popular_books
+        )
+        context["feature_books"] = self.get_cached_block(
+            HOME_BOOKS_NAMESPACE, "top_rated_books", self.get_top_rated_books
+        )
+        context["random_book"] = self.get_cached_block(
+            HOME_BOOKS_NAMESPACE,
+            "random_book",
+            self.get_random_book,
+            self.random_book_timeout,
+        )
+        context["random_quote"] = self.get_cached_block(
+            HOME_QUOTE_NAMESPACE, "random_quote", self.get_random_quote
+        )
 
         return context
 
@@ -101,6 +137,73 @@ class BookDetailView(DetailView):
     slug_field = "slug"
     slug_url_kwarg = "book_slug"
 
+    public_timeout = 900  # книга и страницы отзывов общие для всех пользователей
+    reviews_per_page = 10
+
+    def get_queryset(self):
+        return Book.objects.prefetch_related("genre")
+
+    def get_object(self, queryset=None):
+        # Публичная часть страницы кэшируется в версии каталога:
+        # любое изменение книги, жанров или отзывов делает ключ недостижимым
+        cache_key = versioned_key(
+            CATALOG_NAMESPACE, "book-detail", self.kwargs[self.slug_url_kwarg]
+        )
+        book = cache.get(cache_key)
+        if book is None:
+            book = super().get_object(queryset)
+            cache.set(cache_key, book, self.public_timeout)
+        return book
+
+    def get_reviews_page(self, book):
+        """Страница отзывов без COUNT(*): число отзывов хранится в Book.rating_count."""
+        reviews_qs = book.reviews.select_related("user").order_by("-created_at")
+        paginator = Paginator(reviews_qs, self.reviews_per_page)
+        paginator.count = book.rating_count
+
+        # направляет на ?reviews_page=2, некорректный номер обрабатывается безопасно
+        reviews_page = paginator.get_page(self.request.GET.get("reviews_page"))
+
+        cache_key = versioned_key(
+            CATALOG_NAMESPACE, "book-detail", book.slug, "reviews", reviews_page.number
+        )
+        reviews = cache.get(cache_key)
+        if reviews is None:
+            reviews = list(reviews_page.object_list)
+            cache.set(cache_key, reviews, self.public_timeout)
+        reviews_page.object_list = reviews
+        return reviews_page
+
+    def get_user_state(self, book):
+        """
+        Состояние книги для текущего пользователя одним запросом:
+        избранное, количество в активной корзине и собственный отзыв.
+        """
+        state = {"in_favorites": False, "cart_quantity": None, "user_review_id": None}
+        user = self.request.user
+        if not user.is_authenticated:
+            return state
+
+        favorites = UserProfile.favorite_books.through.objects.filter(
+            userprofile__user=user, book=OuterRef("pk")
+        )
+        cart_items = CartItem.objects.filter(
+            cart__user=user, cart__is_active=True, book=OuterRef("pk")
+        )
+        reviews = Review.objects.filter(user=user, book=OuterRef("pk"))
+
+        row = (
+            Book.objects.filter(pk=book.pk)
+            .annotate(
+                in_favorites=Exists(favorites),
+                cart_quantity=Subquery(cart_items.values("quantity")[:1]),
+                user_review_id=Subquery(reviews.values("pk")[:1]),
+            )
+            .values(*state)
+            .first()
+        )
+        return row or state
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         book = self.object  # Текущая книга
@@ -111,61 +214,35 @@ class BookDetailView(DetailView):
         context["discounted_price"] = book.discounted_price or book.price
 
         # Отзывы книги
-        reviews_qs = book.reviews.select_related("user").order_by("-created_at")
-
-        page_number = self.request.GET.get(
-            "reviews_page"
-        )  # направляет на ?reviews_page=2
-        paginator = Paginator(reviews_qs, 10)  # 10 отзывов на странице
-        reviews_page = paginator.get_page(page_number)  # получаем безопасно страницу
-
+        reviews_page = self.get_reviews_page(book)
         context["reviews_page"] = reviews_page  # объект страницы
         context["reviews"] = reviews_page.object_list  # элементы текущей страницы
 
-        # Текущий отзыв пользователя и форма
-        user_review = None
-        if self.request.user.is_authenticated:
-            user_review = Review.objects.filter(
-                book=book, user=self.request.user
-            ).first()
-        context["user_review"] = user_review
+        # Средний рейтинг книги и количества отзывов (денормализованы в Book)
+        context["avg_rating"] = round(book.average_rating or 0, 1)
+        context["reviews_count"] = book.rating_count
+        context["rating_histogram"] = [
+            {
+                "rating": rating,
+                "count": count,
+                "percent": (
+                    round(count * 100 / book.rating_count) if book.rating_count else 0
+                ),
+            }
+            for rating, count in book.get_rating_histogram().items()
+        ]
+
+        # Данные текущего пользователя: без записи в БД и без загрузки каталога
+        state = self.get_user_state(book)
+        context["user_review_id"] = state["user_review_id"]
         context["review_form"] = (
             ReviewForm()
-            if self.request.user.is_authenticated and not user_review
+            if self.request.user.is_authenticated and not state["user_review_id"]
             else None
         )
-
-        # Средний рейтинг книги и количества отзывов
-        agg = book.reviews.aggregate(avg=Avg("rating"), cnt=Count("id"))
-        context["avg_rating"] = round(agg["avg"] or 0, 1)
-        context["reviews_count"] = agg["cnt"] or 0
-
-        # Если пользователь авторизован, добавляем данные корзины и избранного
-        if self.request.user.is_authenticated:
-            try:
-                user_profile = self.request.user.userprofile
-            except UserProfile.DoesNotExist:
-                user_profile = None  # Профиль отсутствует
-
-            if user_profile:
-                # Проверка книги в избранных
-                context["book_in_favorites"] = user_profile.favorite_books.filter(
-                    pk=book.id
-                ).exists()
-
-                # Форма для избранных
-                context["favorite_books_form"] = FavoriteBooksForm(
-                    instance=user_profile, initial={"favorite_books": [book.id]}
-                )
-
-            # Получение корзины пользователя
-            cart, _ = Cart.objects.get_or_create(user=self.request.user, is_active=True)
-
-            # Проверка книги в корзине
-            cart_item = CartItem.objects.filter(cart=cart, book=book).first()
-            context["cart"] = cart
-            context["cart_item"] = cart_item
-            context["in_cart"] = cart_item is not None
+        context["book_in_favorites"] = state["in_favorites"]
+        context["cart_quantity"] = state["cart_quantity"]
+        context["in_cart"] = state["cart_quantity"] is not None
 
         return context
 
@@ -229,96 +306,49 @@ class BookSearchView(View):
     form_class = BookSearchForm
 
     def get(self, request, *args, **kwargs):
-        query = request.GET.get("query", "").strip()
-        cache_key = f"search_{query}"
-
-        # Если пустой запрос — возвращаем пустой список без обращений
-        if not query:
-            if request.GET.get("format") == "json":
-                return JsonResponse({"results": []})
-            return render(request, self.template_name, {"books": []})
-
-        # Попробуем вытянуть из кэша готовые книги
-        cached_books = cache.get(cache_key)
-        if cached_books is not None:
-            if request.GET.get("format") == "json":
-                return JsonResponse(
-                    {
-                        "results": [
-                            {
-                                "title": b.title,
-                                "author": b.author,
-                                "url": b.get_absolute_url(),
-                            }
-                            for b in cached_books
-                        ]
-                    }
-                )
-            return render(request, self.template_name, {"books": cached_books})
-
-        # Пытаемся использовать Elasticsearch, с откатом на БД при ошибке
-        books: list[Book]
-        try:
-            from .documents import BookDocument
-
-            # Продвинутый запрос с бустами и опечатками
-            search = BookDocument.search().query(
-                "bool",
-                should=[
-                    {"match": {"title": {"query": query, "boost": 5}}},
-                    {"match": {"author": {"query": query, "boost": 3}}},
-                    {"fuzzy": {"title": {"value": query, "fuzziness": "AUTO"}}},
-                    {"fuzzy": {"author": {"value": query, "fuzziness": "AUTO"}}},
-                    {"wildcard": {"title": {"value": f"*{query}*", "boost": 2}}},
-                    {"wildcard": {"author": {"value": f"*{query}*", "boost": 2}}},
-                    {"match": {"description": {"query": query, "boost": 1}}},
-                ],
-                minimum_should_match=1,
-            )[:20]
-
-            response = search.execute()
-
-            # Достаём слаги и сохраняем порядок по score
-            hits = list(response)
-            slugs_in_order = [
-                getattr(h, "slug", None) for h in hits if getattr(h, "slug", None)
-            ]
-
-            if slugs_in_order:
-                slug_to_pos = {slug: i for i, slug in enumerate(slugs_in_order)}
-                qs = Book.objects.filter(slug__in=slugs_in_order)
-                books = sorted(qs, key=lambda b: slug_to_pos.get(b.slug, 10**9))
-            else:
-                books = []
-
-        except Exception:
-            # Фоллбек на обычный поиск по БД
-            books = list(
-                Book.objects.filter(
-                    Q(title__icontains=query) | Q(author__icontains=query)
-                )
-            )
+        # Пустой запрос обслуживается без обращений к кэшу и БД
+        result = search_books(request.GET.get("query", ""))
+
+        if request.GET.get("format") == "json":
+            # Готовый JSON из кэша: ни одной модели не создаётся
+            return HttpResponse(result.json_payload, content_type="application/json")
+
+        return render(request, self.template_name, {"books": result.books})
 
-        cache.set(cache_key, books, 60 * 5)
+
+class AsyncBookSearchView(View):
+    """
+    Асинхронный вариант BookSearchView для ASGI (core/asgi.py): запрос к ES
+    идёт через асинхронный клиент со строгим дедлайном и circuit breaker.
+    """
+
+    template_name = "store/search_result.html"
+
+    async def get(self, request, *args, **kwargs):
+        result = await asearch_books(request.GET.get("query", ""))
 
         if request.GET.get("format") == "json":
-            return JsonResponse(
-                {
-                    "results": [
-                        {
-                            "title": b.title,
-                            "author": b.author,
-                            "url": b.get_absolute_url(),
-                        }
-                        for b in books
-                    ]
-                }
-            )
+            return HttpResponse(result.json_payload, content_type="application/json")
 
-        return render(request, self.template_name, {"books": books})
+        books = await result.aget_books()
+        # Контекст-процессоры шаблона обращаются к БД синхронно
+        return await sync_to_async(render)(
+            request, self.template_name, {"books": books}
+        )
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class SearchMetricsView(View):
+    """Метрики поиска (breaker, фоллбеки) в текстовом формате Prometheus."""
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(
+            render_prometheus(get_search_metrics()),
+            content_type="text/plain; version=0.0.4",
+        )
 
 
-@method_decorator(cache_page(60 * 15), name="dispatch")
+@method_decorator(catalog_cache_page(60 * 15), name="dispatch")
 class AllBooks(ListView):
     """Отображение всех книг."""
 
@@ -328,11 +358,11 @@ class AllBooks(ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        cache_key = "all_books_with_ratings"
+        cache_key = versioned_key(CATALOG_NAMESPACE, "all_books_with_ratings")
         books = cache.get(cache_key)
 
-        if not books:
-            books = Book.objects.with_ratings()
+        if books is None:
+            books = list(Book.objects.with_ratings())
             cache.set(cache_key, books, 60 * 15)
 
         context["title"] = "All Books"